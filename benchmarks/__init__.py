@@ -0,0 +1 @@
+"""Performance benchmarks on synthetic documents (see ``benchmarks.run``)."""
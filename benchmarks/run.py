@@ -0,0 +1,239 @@
+"""Times the hot paths of the pipeline on synthetic documents.
+
+Usage:
+
+    python -m benchmarks.run [--sizes small medium] [--repeat 3] [--output results.json]
+    python -m benchmarks.run --compare baseline.json [--threshold 0.2] [--output results.json]
+    python -m benchmarks.run --compare baseline.json --current results.json
+
+Every case runs on a document from ``benchmarks.synthetic`` of each selected
+size and reports the best-of-``repeat`` wall time:
+
+* ``pdf_to_images`` renders the synthetic PDF (skipped without PyMuPDF);
+* ``run_ocr`` runs the ensemble, voting and CSV output with three
+  deterministic ``SyntheticEngine`` members, so it measures everything but
+  the model itself;
+* ``remove_cjk_spaces``, ``calculate_cer``, ``calculate_iou`` and
+  ``match_boxes`` run over all lines of the document.
+
+With ``--compare`` the results (measured now, or read from ``--current``)
+are checked against a baseline JSON; the command exits with status 1 when a
+case got slower by more than ``threshold`` (relative) and ``--min-seconds``
+(absolute, to ignore timer noise), or when a run misses an SDD target
+(``pdf_to_images`` + ``run_ocr`` over 300 s per 50 pages, peak RSS over 8 GB).
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import SyntheticEngine, fitz, generate_document, recognize_document, write_pdf
+from scripts.accuracy_reviewer import match_boxes
+from scripts.calculate_cer import calculate_cer
+from scripts.calculate_iou import calculate_iou
+from src.ocr_poc import _remove_redundant_cjk_spaces, pdf_to_images, run_ocr
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+RESULT_VERSION = 1
+SIZES = {
+    "small": {"pages": 5, "lines": 20, "length": 10},
+    "medium": {"pages": 20, "lines": 40, "length": 20},
+    "large": {"pages": 50, "lines": 80, "length": 40},
+}
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_SECONDS = 0.005
+# SDD 9: 50 pages per CPU within 5 minutes, peak RSS <= 8 GB.
+TARGET_SECONDS_PER_50_PAGES = 300.0
+TARGET_PEAK_RSS_MB = 8 * 1024
+
+
+def _best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _quiet(function):
+    """Runs ``function`` with the pipeline's progress prints swallowed."""
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return function()
+    return run
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_cases(size_name, repeat, work_dir):
+    """Returns ``{case name: result dict}`` for one document size."""
+    size = SIZES[size_name]
+    pages = generate_document(size["pages"], size["lines"], size["length"], seed=1)
+    hypotheses = recognize_document(pages, seed=2)
+    pairs = [(gt, ocr) for gt_lines, ocr_lines in zip(pages, hypotheses) for gt, ocr in zip(gt_lines, ocr_lines)]
+    texts = [gt['text'] for gt, _ in pairs]
+    ocr_pages = [[{'bbox': [line['bbox'][0][0], line['bbox'][0][1], line['bbox'][2][0], line['bbox'][2][1]],
+                   'text': line['text']} for line in lines] for lines in hypotheses]
+    line_count = len(pairs)
+
+    results = {}
+
+    def record(case, seconds, items, unit):
+        results[f"{case}[{size_name}]"] = {"case": case, "size": size_name, "seconds": seconds,
+                                           "items": items, "unit": unit}
+
+    if fitz is not None:
+        pdf_path = os.path.join(work_dir, f"{size_name}.pdf")
+        write_pdf(pages, pdf_path)
+        image_dir = os.path.join(work_dir, f"{size_name}_images")
+        record("pdf_to_images", _best_time(_quiet(lambda: pdf_to_images(pdf_path, image_dir)), repeat),
+               size["pages"], "pages")
+    else:
+        results[f"pdf_to_images[{size_name}]"] = {"case": "pdf_to_images", "size": size_name,
+                                                  "skipped": "PyMuPDF is not installed"}
+
+    engines = [SyntheticEngine(f"synthetic-{index}", pages, error_rate=0.02 * (index + 1), seed=index)
+               for index in range(3)]
+    csv_path = os.path.join(work_dir, f"{size_name}.csv")
+    record("run_ocr", _best_time(_quiet(lambda: run_ocr(list(range(len(pages))), csv_path, engines)), repeat),
+           size["pages"], "pages")
+    record("remove_cjk_spaces", _best_time(lambda: [_remove_redundant_cjk_spaces(t) for t in texts], repeat),
+           line_count, "lines")
+    record("calculate_cer", _best_time(lambda: [calculate_cer(gt['text'], ocr['text']) for gt, ocr in pairs],
+                                       repeat), line_count, "lines")
+    gt_boxes = [gt['bbox'] for gt, _ in pairs]
+    ocr_boxes = [[line['bbox'][0][0], line['bbox'][0][1], line['bbox'][2][0], line['bbox'][2][1]]
+                 for _, line in pairs]
+    record("calculate_iou", _best_time(lambda: [calculate_iou(a, b) for a, b in zip(gt_boxes, ocr_boxes)],
+                                       repeat), line_count, "lines")
+    for method in ("greedy", "hungarian"):
+        record(f"match_boxes_{method}",
+               _best_time(lambda: [match_boxes(gt, ocr, 0.5, method) for gt, ocr in zip(pages, ocr_pages)],
+                          repeat), line_count, "lines")
+    return results
+
+
+def run_benchmarks(sizes, repeat=3):
+    """Runs every case for every size and returns the JSON-serializable report."""
+    results = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size_name in sizes:
+            results.update(run_cases(size_name, repeat, work_dir))
+    return {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "peak_rss_mb": _peak_rss_mb(),
+        "results": results,
+    }
+
+
+def check_targets(report):
+    """Returns the SDD targets ``report`` misses, as messages."""
+    failures = []
+    peak = report.get("peak_rss_mb")
+    if peak is not None and peak > TARGET_PEAK_RSS_MB:
+        failures.append(f"peak RSS {peak:.0f} MB exceeds {TARGET_PEAK_RSS_MB} MB")
+    for size_name in SIZES:
+        timed = [report["results"].get(f"{case}[{size_name}]") for case in ("pdf_to_images", "run_ocr")]
+        timed = [result for result in timed if result and "seconds" in result]
+        if not timed:
+            continue
+        per_50_pages = sum(result["seconds"] / result["items"] for result in timed) * 50
+        if per_50_pages > TARGET_SECONDS_PER_50_PAGES:
+            failures.append(f"{size_name}: {per_50_pages:.1f} s per 50 pages exceeds "
+                            f"{TARGET_SECONDS_PER_50_PAGES:.0f} s")
+    return failures
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_THRESHOLD, min_seconds=DEFAULT_MIN_SECONDS):
+    """Returns ``(rows, regressions)`` comparing the cases present in both reports.
+
+    ``rows`` holds ``(name, baseline seconds, current seconds, ratio)``; a
+    case regresses when it is more than ``threshold`` slower relative to the
+    baseline and more than ``min_seconds`` slower in absolute terms.
+    """
+    rows, regressions = [], []
+    for name, result in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if not base or "seconds" not in base or "seconds" not in result:
+            continue
+        ratio = result["seconds"] / base["seconds"] if base["seconds"] > 0 else float("inf")
+        rows.append((name, base["seconds"], result["seconds"], ratio))
+        if ratio > 1 + threshold and result["seconds"] - base["seconds"] > min_seconds:
+            regressions.append(name)
+    return rows, regressions
+
+
+def _load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get("version") != RESULT_VERSION:
+        raise RuntimeError(f"Unsupported benchmark result version in {path}: {report.get('version')}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmarks on synthetic Japanese documents.")
+    parser.add_argument("--sizes", nargs="+", choices=sorted(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline results JSON to compare against.")
+    parser.add_argument("--current", type=str, default=None,
+                        help="Compare these results JSON instead of running the benchmarks.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown that counts as a regression.")
+    parser.add_argument("--min-seconds", type=float, default=DEFAULT_MIN_SECONDS,
+                        help="Absolute slowdown below which differences are ignored.")
+    args = parser.parse_args()
+
+    report = _load_report(args.current) if args.current else run_benchmarks(args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Benchmark results saved to {args.output}")
+
+    print(f"{'case':<32} {'seconds':>10} {'per item [us]':>14}")
+    for name, result in report["results"].items():
+        if "seconds" in result:
+            print(f"{name:<32} {result['seconds']:>10.4f} {result['seconds'] / result['items'] * 1e6:>14.1f}")
+        else:
+            print(f"{name:<32} {'skipped':>10} ({result['skipped']})")
+    if report.get("peak_rss_mb") is not None:
+        print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+    failures = check_targets(report)
+    if args.compare:
+        rows, regressions = compare_reports(_load_report(args.compare), report, args.threshold, args.min_seconds)
+        print(f"\n{'case':<32} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for name, base_seconds, seconds, ratio in rows:
+            flag = "  REGRESSION" if name in regressions else ""
+            print(f"{name:<32} {base_seconds:>10.4f} {seconds:>10.4f} {ratio:>7.2f}{flag}")
+        failures += [f"{name} regressed beyond {args.threshold:.0%}" for name in regressions]
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
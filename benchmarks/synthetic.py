@@ -0,0 +1,157 @@
+"""Synthetic Japanese documents for the benchmark suite.
+
+Usage:
+
+    python -m benchmarks.synthetic output_dir [--pages 50] [--lines 40] [--length 20] [--seed 0]
+
+A document is a list of pages, each a list of ``{'bbox': [x0, y0, x1, y1],
+'text': str}`` lines laid out top to bottom in PDF points (the pixel
+coordinates of a 72 dpi render, the default ``--dpi``).  Texts mix kana,
+kanji, ASCII digits and the occasional half- or full-width space between
+CJK characters, which the OCR post-processing removes.
+
+``write_pdf`` renders a document with PyMuPDF's built-in CJK font,
+``write_ground_truth`` writes the JSON read by
+``scripts.accuracy_reviewer.load_ground_truth``, and ``SyntheticEngine`` is
+a deterministic ensemble member that "recognizes" a page by returning its
+lines with seeded character errors and box jitter.
+"""
+
+import argparse
+import json
+import os
+import random
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - optional dependency
+    fitz = None
+
+ALPHABET = ("あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん"
+            "アイウエオカキクケコサシスセソタチツテト日本語手書文字認識精度漢字検査用紙氏名住所電話番号"
+            "0123456789")
+PAGE_SIZE = (595, 842)  # A4 in points
+MARGIN = 36
+
+
+def generate_document(page_count, lines_per_page, text_length, seed=0, space_rate=0.05):
+    """Returns ``page_count`` pages of ``lines_per_page`` lines of about ``text_length`` characters."""
+    rng = random.Random(seed)
+    width, height = PAGE_SIZE
+    line_height = (height - 2 * MARGIN) / max(1, lines_per_page)
+    font_size = min(line_height * 0.8, (width - 2 * MARGIN) / max(1, text_length))
+    pages = []
+    for _ in range(page_count):
+        lines = []
+        for line_index in range(lines_per_page):
+            length = max(1, text_length + rng.randint(-text_length // 4, text_length // 4))
+            chars = []
+            for _ in range(length):
+                chars.append(rng.choice(ALPHABET))
+                if rng.random() < space_rate:
+                    chars.append(rng.choice(" 　"))
+            text = "".join(chars).strip()
+            x0 = MARGIN + rng.uniform(0, font_size)
+            y0 = MARGIN + line_index * line_height
+            lines.append({'bbox': [round(x0, 2), round(y0, 2), round(x0 + font_size * len(text), 2),
+                                   round(y0 + font_size, 2)],
+                          'text': text})
+        pages.append(lines)
+    return pages
+
+
+def write_ground_truth(pages, path):
+    """Writes ``{"1": [{"bbox", "text"}, ...], ...}`` with 1-based page keys, as in the OCR CSV."""
+    data = {str(page_num + 1): lines for page_num, lines in enumerate(pages)}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def write_pdf(pages, path):
+    """Renders the lines of ``pages`` into a PDF with real (extractable) Japanese text."""
+    if fitz is None:
+        raise RuntimeError("PyMuPDF (fitz) is required to write synthetic PDFs but is not installed.")
+    doc = fitz.open()
+    width, height = PAGE_SIZE
+    for lines in pages:
+        page = doc.new_page(width=width, height=height)
+        for line in lines:
+            x0, y0, x1, y1 = line['bbox']
+            fontsize = y1 - y0
+            page.insert_text((x0, y1 - 0.15 * fontsize), line['text'], fontname="japan", fontsize=fontsize)
+    doc.save(path)
+    doc.close()
+
+
+def corrupt_text(rng, text, error_rate):
+    """Applies about ``error_rate * len(text)`` random substitutions, insertions and deletions."""
+    chars = list(text)
+    for _ in range(int(round(len(chars) * error_rate))):
+        position = rng.randrange(len(chars) + 1)
+        operation = rng.randrange(3)
+        if operation == 0 or not chars:
+            chars.insert(position, rng.choice(ALPHABET))
+        elif operation == 1:
+            del chars[min(position, len(chars) - 1)]
+        else:
+            chars[min(position, len(chars) - 1)] = rng.choice(ALPHABET)
+    return "".join(chars)
+
+
+def recognize_document(pages, error_rate=0.05, jitter=2.0, seed=0):
+    """Returns per page the ``LineResult`` list an imperfect engine would produce."""
+    rng = random.Random(seed)
+    results = []
+    for lines in pages:
+        page_lines = []
+        for line in lines:
+            x0, y0, x1, y1 = (value + rng.uniform(-jitter, jitter) for value in line['bbox'])
+            page_lines.append({'bbox': ((x0, y0), (x1, y0), (x1, y1), (x0, y1)),
+                               'text': corrupt_text(rng, line['text'], error_rate),
+                               'confidence': round(rng.uniform(0.5, 1.0), 4)})
+        results.append(page_lines)
+    return results
+
+
+class SyntheticEngine:
+    """Ensemble member that returns precomputed lines for a page index.
+
+    ``run_ocr`` passes page "images" to the engines unchanged, so the
+    benchmark feeds page numbers instead of rendered pages.
+    """
+
+    releases_gil = True
+
+    def __init__(self, name, pages, weight=1.0, error_rate=0.05, seed=0):
+        self.name = name
+        self.weight = weight
+        self._results = recognize_document(pages, error_rate, seed=seed)
+
+    def infer(self, image):
+        return [dict(line) for line in self._results[image]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic Japanese PDF and its ground truth.")
+    parser.add_argument("output_dir", type=str)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=40, help="Lines per page.")
+    parser.add_argument("--length", type=int, default=20, help="Average characters per line.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    pages = generate_document(args.pages, args.lines, args.length, args.seed)
+    gt_path = os.path.join(args.output_dir, "synthetic_gt.json")
+    write_ground_truth(pages, gt_path)
+    print(f"Ground truth written to {gt_path}")
+    if fitz is not None:
+        pdf_path = os.path.join(args.output_dir, "synthetic.pdf")
+        write_pdf(pages, pdf_path)
+        print(f"PDF written to {pdf_path}")
+    else:
+        print("PyMuPDF is not installed; no PDF written.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,175 @@
 import argparse
 import csv
 import json
+import logging
+import os
+import sys
+from array import array
 from collections import defaultdict
+from collections.abc import Sequence
 from typing import Dict, List
 from scripts.calculate_cer import calculate_cer
-from scripts.calculate_iou import calculate_iou
+from scripts.columnar_results import is_columnar_file, load_columnar_results
+from scripts.calculate_iou import calculate_iou_batch
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # pragma: no cover - optional dependency
+    linear_sum_assignment = None
 
 REQUIRED_OCR_COLUMNS = {"page", "block_id", "x0", "y0", "x1", "y1", "text", "confidence"}
 
+MATCH_METHODS = ("greedy", "hungarian")
+
+logger = logging.getLogger(__name__)
+
+
+def _columnar_sibling(csv_path):
+    """Returns the columnar file written next to ``csv_path`` if it is at least as new as the CSV."""
+    try:
+        csv_mtime = os.path.getmtime(csv_path)
+    except OSError:
+        return None
+    stem = os.path.splitext(csv_path)[0]
+    for extension in (".parquet", ".npz"):
+        candidate = stem + extension
+        if os.path.exists(candidate) and os.path.getmtime(candidate) >= csv_mtime and is_columnar_file(candidate):
+            return candidate
+    return None
+
+class PageResults(Sequence):
+    """OCR lines of one page, stored as columns.
+
+    Boxes and confidences live in flat ``array('d')`` columns and texts are
+    shared with every other row holding the same string, so a line costs
+    about 50 bytes instead of a dict, a bbox list and five float objects.
+    Indexing and iteration still yield the ``{'bbox', 'text', 'confidence'}``
+    dicts of the original API; they are built on access.
+    """
+
+    __slots__ = ('_bboxes', '_confidences', '_texts')
+
+    def __init__(self):
+        self._bboxes = array('d')
+        self._confidences = array('d')
+        self._texts = []
+
+    def append(self, bbox, text, confidence):
+        self._bboxes.extend(bbox)
+        self._texts.append(text)
+        self._confidences.append(confidence)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("PageResults index out of range")
+        return {'bbox': self._bboxes[4 * index:4 * index + 4].tolist(), 'text': self._texts[index],
+                'confidence': self._confidences[index]}
+
+    def __eq__(self, other):
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"PageResults({list(self)!r})"
+
+    def bbox_list(self):
+        """All boxes as ``[x0, y0, x1, y1]`` lists, without building the row dicts."""
+        bboxes = self._bboxes.tolist()
+        return [bboxes[i:i + 4] for i in range(0, len(bboxes), 4)]
+
+def _load_columnar_ocr_results(path):
+    columns, texts = load_columnar_results(path)
+    pages = columns['page']
+    order = np.argsort(pages, kind='stable')
+    page_numbers, starts = np.unique(pages[order], return_index=True)
+    bboxes = np.stack([columns[name][order] for name in ('x0', 'y0', 'x1', 'y1')], axis=1).astype(np.float64)
+    confidences = columns['confidence'][order].astype(np.float64)
+    interned = {}
+    ordered_texts = [interned.setdefault(texts[i], texts[i]) for i in order.tolist()]
+
+    results: Dict[int, PageResults] = defaultdict(PageResults)
+    bounds = starts.tolist() + [len(order)]
+    for page, start, end in zip(page_numbers.tolist(), bounds, bounds[1:]):
+        page_results = PageResults()
+        page_results._bboxes.frombytes(bboxes[start:end].tobytes())
+        page_results._confidences.frombytes(confidences[start:end].tobytes())
+        page_results._texts = ordered_texts[start:end]
+        results[page] = page_results
+    return results
 
-def load_ocr_results(csv_path):
+def load_ocr_results(csv_path, prefer_columnar=True):
     """
     Loads OCR results from a CSV file.
     Expected CSV format: page,block_id,x0,y0,x1,y1,text,confidence
+
+    Returns a ``defaultdict`` of ``{page: PageResults}``, so a page without
+    lines reads as empty.  Rows are streamed from the file straight into the
+    per-page columns; identical texts are stored once.
+
+    ``csv_path`` may also be a columnar result file (see
+    ``scripts.columnar_results``); with ``prefer_columnar`` an up-to-date one
+    written next to the CSV is read instead of the CSV.  The file actually
+    read is logged at INFO.  Columnar boxes and confidences are float32.
     """
-    results: Dict[int, List[dict]] = defaultdict(list)
+    if is_columnar_file(csv_path):
+        logger.info("Reading OCR results from %s.", csv_path)
+        return _load_columnar_ocr_results(csv_path)
+    columnar_path = _columnar_sibling(csv_path) if prefer_columnar else None
+    if columnar_path is not None:
+        logger.info("Reading OCR results from %s, the columnar copy of %s.", columnar_path, csv_path)
+        return _load_columnar_ocr_results(columnar_path)
+    logger.info("Reading OCR results from %s.", csv_path)
+
+    results: Dict[int, PageResults] = defaultdict(PageResults)
+    interned = {}
 
     try:
         with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+            reader = csv.reader(csvfile)
 
-            if reader.fieldnames is None:
+            fieldnames = next(reader, None)
+            if fieldnames is None:
                 raise RuntimeError("OCR結果CSVのヘッダーが読み取れませんでした。")
 
-            missing_columns = REQUIRED_OCR_COLUMNS.difference(reader.fieldnames)
+            missing_columns = REQUIRED_OCR_COLUMNS.difference(fieldnames)
             if missing_columns:
                 missing = ", ".join(sorted(missing_columns))
                 raise RuntimeError(f"OCR結果CSVに必要な列がありません: {missing}")
 
+            column_index = {name: index for index, name in enumerate(fieldnames)}
+            columns = [column_index[name] for name in ('page', 'x0', 'y0', 'x1', 'y1', 'text', 'confidence')]
+            width = max(columns) + 1
+            page_col, x0_col, y0_col, x1_col, y1_col, text_col, confidence_col = columns
+
             for row in reader:
+                if not row:
+                    continue
                 try:
-                    page = int(row['page'])
-                    bbox = [
-                        float(row['x0']),
-                        float(row['y0']),
-                        float(row['x1']),
-                        float(row['y1'])
-                    ]
-                    text = row['text']
-                    confidence = float(row['confidence'])
+                    if len(row) < width:
+                        missing_index = min(index for index in columns if index >= len(row))
+                        raise KeyError(fieldnames[missing_index])
+                    page = int(row[page_col])
+                    bbox = (
+                        float(row[x0_col]),
+                        float(row[y0_col]),
+                        float(row[x1_col]),
+                        float(row[y1_col])
+                    )
+                    text = row[text_col]
+                    confidence = float(row[confidence_col])
                 except KeyError as exc:
                     raise RuntimeError(
                         f"OCR結果CSVの行から必須列 '{exc.args[0]}' を取得できませんでした。"
@@ -48,7 +179,7 @@ def load_ocr_results(csv_path):
                         f"OCR結果CSVの数値が不正です: {exc}"
                     ) from exc
 
-                results[page].append({'bbox': bbox, 'text': text, 'confidence': confidence})
+                results[page].append(bbox, interned.setdefault(text, text), confidence)
     except FileNotFoundError as exc:
         raise RuntimeError(f"OCR結果CSVファイルが見つかりません: {csv_path}") from exc
 
@@ -89,82 +220,237 @@ def load_ground_truth(json_path):
 
     return converted
 
-def match_boxes(gt_boxes, ocr_boxes, iou_threshold=0.5):
+def _grid_candidates(gt_bboxes, ocr_bboxes):
+    """Returns ``(gt_idx, ocr_idx)`` pairs whose boxes overlap with positive area.
+
+    OCR boxes are bucketed into a uniform grid about one box height wide, so
+    each GT box is only compared with the OCR boxes in the cells it covers.
+    Pairs are returned ordered by GT index, then OCR index.
+    """
+    heights = sorted(b[3] - b[1] for b in ocr_bboxes if b[3] > b[1])
+    cell = max(1.0, heights[len(heights) // 2]) if heights else 1.0
+    grid = defaultdict(list)
+    for ocr_idx, (x0, y0, x1, y1) in enumerate(ocr_bboxes):
+        if x1 <= x0 or y1 <= y0:
+            continue  # no positive area: its IoU with anything is 0
+        for gx in range(int(x0 // cell), int(x1 // cell) + 1):
+            for gy in range(int(y0 // cell), int(y1 // cell) + 1):
+                grid[(gx, gy)].append(ocr_idx)
+
+    pairs = []
+    for gt_idx, (x0, y0, x1, y1) in enumerate(gt_bboxes):
+        if x1 <= x0 or y1 <= y0:
+            continue
+        candidates = set()
+        for gx in range(int(x0 // cell), int(x1 // cell) + 1):
+            for gy in range(int(y0 // cell), int(y1 // cell) + 1):
+                candidates.update(grid.get((gx, gy), ()))
+        for ocr_idx in sorted(candidates):
+            ox0, oy0, ox1, oy1 = ocr_bboxes[ocr_idx]
+            if min(x1, ox1) > max(x0, ox0) and min(y1, oy1) > max(y0, oy0):
+                pairs.append((gt_idx, ocr_idx))
+    return pairs
+
+
+def _pair_ious(gt_bboxes, ocr_bboxes, pairs):
+    """IoU of each ``(gt_idx, ocr_idx)`` pair, computed in one batch."""
+    if not pairs:
+        return []
+    ious = calculate_iou_batch([gt_bboxes[g] for g, _ in pairs], [ocr_bboxes[o] for _, o in pairs])
+    return ious.tolist() if np is not None else ious
+
+
+def _hungarian(weights):
+    """Maximum-weight assignment for a dense ``n x m`` matrix with ``n <= m``.
+
+    Returns ``assignment[row] = column``.  Shortest augmenting path variant of
+    the Hungarian algorithm, O(n^2 m); only used for the small connected
+    components of the candidate graph when SciPy is not installed.
+    """
+    n, m = len(weights), len(weights[0])
+    inf = float('inf')
+    u = [0.0] * (n + 1)
+    v = [0.0] * (m + 1)
+    owner = [0] * (m + 1)  # owner[column] = row (1-based), 0 = free
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        min_slack = [inf] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            delta, next_column = inf, 0
+            for j in range(1, m + 1):
+                if used[j]:
+                    continue
+                slack = -weights[current_row - 1][j - 1] - u[current_row] - v[j]
+                if slack < min_slack[j]:
+                    min_slack[j] = slack
+                    way[j] = column
+                if min_slack[j] < delta:
+                    delta, next_column = min_slack[j], j
+            for j in range(m + 1):
+                if used[j]:
+                    u[owner[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    assignment = [0] * n
+    for j in range(1, m + 1):
+        if owner[j]:
+            assignment[owner[j] - 1] = j - 1
+    return assignment
+
+
+def _optimal_assignment(edges):
+    """Maximizes the summed IoU over ``{(gt_idx, ocr_idx): iou}`` edges.
+
+    The candidate graph is split into connected components, which are tiny on
+    real pages, and each component is solved as a dense assignment problem.
+    """
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for g, o in edges:
+        parent[find(('g', g))] = find(('o', o))
+    components = defaultdict(list)
+    for g, o in edges:
+        components[find(('g', g))].append((g, o))
+
+    matches = []
+    for component in components.values():
+        rows = sorted({g for g, _ in component})
+        cols = sorted({o for _, o in component})
+        weights = [[edges.get((g, o), 0.0) for o in cols] for g in rows]
+        transposed = len(rows) > len(cols)
+        if transposed:
+            weights = [list(column) for column in zip(*weights)]
+        if linear_sum_assignment is not None:
+            row_ind, col_ind = linear_sum_assignment(np.asarray(weights), maximize=True)
+            assignment = dict(zip(row_ind.tolist(), col_ind.tolist()))
+        else:
+            assignment = dict(enumerate(_hungarian(weights)))
+        for r, c in assignment.items():
+            g, o = (rows[c], cols[r]) if transposed else (rows[r], cols[c])
+            if (g, o) in edges:
+                matches.append((g, o))
+    return sorted(matches)
+
+
+def match_boxes(gt_boxes, ocr_boxes, iou_threshold=0.5, method="greedy", with_iou=False):
     """
     Matches OCR bounding boxes to ground truth bounding boxes based on IoU.
-    Returns a list of tuples: (gt_box_info, ocr_box_info) for matched pairs.
+    Returns a list of tuples: (gt_box_info, ocr_box_info) for matched pairs,
+    or (gt_box_info, ocr_box_info, iou) with ``with_iou``.
+
+    ``method="greedy"`` walks the GT boxes in order and takes the unmatched
+    OCR box with the highest IoU (the first one on ties).  ``"hungarian"``
+    maximizes the summed IoU of all pairs with IoU >= ``iou_threshold``.
+    Candidate pairs come from a spatial grid, so only overlapping boxes are
+    ever compared.
     """
-    matched_pairs = []
-    matched_ocr_indices = set()
-
-    for gt_idx, gt_box_info in enumerate(gt_boxes):
-        best_iou = -1
-        best_ocr_idx = -1
-
-        for ocr_idx, ocr_box_info in enumerate(ocr_boxes):
-            if ocr_idx in matched_ocr_indices: # Skip already matched OCR boxes
-                continue
-            
-            iou = calculate_iou(gt_box_info['bbox'], ocr_box_info['bbox'])
-            if iou > best_iou:
-                best_iou = iou
-                best_ocr_idx = ocr_idx
-        
-        if best_iou >= iou_threshold and best_ocr_idx != -1:
-            matched_pairs.append((gt_box_info, ocr_boxes[best_ocr_idx]))
-            matched_ocr_indices.add(best_ocr_idx)
-    
-    return matched_pairs
+    if method not in MATCH_METHODS:
+        raise RuntimeError(f"不明なマッチング方式です: {method}")
+    gt_bboxes = [gt_box_info['bbox'] for gt_box_info in gt_boxes]
+    if isinstance(ocr_boxes, PageResults):
+        ocr_bboxes = ocr_boxes.bbox_list()
+    else:
+        ocr_bboxes = [ocr_box_info['bbox'] for ocr_box_info in ocr_boxes]
 
-def main():
-    parser = argparse.ArgumentParser(description="OCR Accuracy Reviewer.")
-    parser.add_argument("--ocr_csv", type=str, required=True,
-                        help="Path to the OCR results CSV file.")
-    parser.add_argument("--ground_truth_json", type=str, required=True,
-                        help="Path to the ground truth JSON file.")
-    parser.add_argument("--iou_threshold", type=float, default=0.5,
-                        help="IoU threshold for matching bounding boxes.")
-    args = parser.parse_args()
+    if iou_threshold > 0:
+        # Pairs without overlap have IoU 0 and can never reach the threshold.
+        pairs = _grid_candidates(gt_bboxes, ocr_bboxes)
+    else:
+        pairs = [(g, o) for g in range(len(gt_bboxes)) for o in range(len(ocr_bboxes))]
+    ious = dict(zip(pairs, _pair_ious(gt_bboxes, ocr_bboxes, pairs)))
 
-    try:
-        ocr_results = load_ocr_results(args.ocr_csv)
-        ground_truth = load_ground_truth(args.ground_truth_json)
-    except RuntimeError as error:
-        raise SystemExit(str(error))
+    if method == "hungarian":
+        edges = {pair: iou for pair, iou in ious.items() if iou >= iou_threshold}
+        matches = _optimal_assignment(edges)
+    else:
+        candidates = defaultdict(list)
+        for (g, o), iou in ious.items():
+            candidates[g].append((o, iou))
+        matches = []
+        matched_ocr_indices = set()
+        for gt_idx in range(len(gt_bboxes)):
+            best_iou = -1
+            best_ocr_idx = -1
+            for ocr_idx, iou in candidates.get(gt_idx, ()):
+                if ocr_idx in matched_ocr_indices:  # Skip already matched OCR boxes
+                    continue
+                if iou > best_iou:
+                    best_iou = iou
+                    best_ocr_idx = ocr_idx
+            if best_iou >= iou_threshold and best_ocr_idx != -1:
+                matches.append((gt_idx, best_ocr_idx))
+                matched_ocr_indices.add(best_ocr_idx)
+
+    if with_iou:
+        return [(gt_boxes[g], ocr_boxes[o], ious[(g, o)]) for g, o in matches]
+    return [(gt_boxes[g], ocr_boxes[o]) for g, o in matches]
+
+def review_accuracy(ocr_csv, ground_truth_json, iou_threshold=0.5, match_method="greedy", out=None,
+                    prefer_columnar=True):
+    """
+    Prints the accuracy report for an OCR results CSV against ground truth JSON.
+    Raises RuntimeError when either input cannot be loaded.
+    ``match_method`` selects the box matching of ``match_boxes``; the report
+    goes to ``out`` (default: stdout).  ``prefer_columnar=False`` reads the
+    CSV even when a columnar copy sits next to it.
+    """
+    out = out or sys.stdout
+    ocr_results = load_ocr_results(ocr_csv, prefer_columnar)
+    ground_truth = load_ground_truth(ground_truth_json)
 
     total_cer = 0
     total_iou = 0
     total_matched_pairs = 0
     total_gt_texts = 0
 
-    print("\n--- OCR Accuracy Report ---")
+    print("\n--- OCR Accuracy Report ---", file=out)
 
     for page_num in sorted(ground_truth.keys()):
         gt_page_data = ground_truth[page_num]
         ocr_page_data = ocr_results.get(page_num, [])
 
         if not gt_page_data:
-            print(f"Page {page_num}: No ground truth data found.")
+            print(f"Page {page_num}: No ground truth data found.", file=out)
             continue
 
         if not ocr_page_data:
-            print(f"Page {page_num}: No OCR results found.")
+            print(f"Page {page_num}: No OCR results found.", file=out)
             # Calculate CER for missing OCR results (all insertions/deletions)
             for gt_item in gt_page_data:
                 total_cer += calculate_cer(gt_item['text'], "") * len(gt_item['text'])
                 total_gt_texts += len(gt_item['text'])
             continue
 
-        matched_pairs = match_boxes(gt_page_data, ocr_page_data, args.iou_threshold)
-        
+        matched_pairs = match_boxes(gt_page_data, ocr_page_data, iou_threshold,
+                                    method=match_method, with_iou=True)
+
         page_cer_sum = 0
         page_iou_sum = 0
         page_gt_char_count = 0
 
-        for gt_item, ocr_item in matched_pairs:
+        for gt_item, ocr_item, iou in matched_pairs:
             cer = calculate_cer(gt_item['text'], ocr_item['text'])
-            iou = calculate_iou(gt_item['bbox'], ocr_item['bbox'])
-            
+
             page_cer_sum += cer * len(gt_item['text'])
             page_iou_sum += iou
             page_gt_char_count += len(gt_item['text'])
@@ -172,29 +458,50 @@ def main():
 
         if page_gt_char_count > 0:
             avg_page_cer = page_cer_sum / page_gt_char_count
-            print(f"Page {page_num}: Average CER = {avg_page_cer:.4f}, Matched Boxes = {len(matched_pairs)}")
+            print(f"Page {page_num}: Average CER = {avg_page_cer:.4f}, Matched Boxes = {len(matched_pairs)}", file=out)
             total_cer += page_cer_sum
             total_gt_texts += page_gt_char_count
         else:
-            print(f"Page {page_num}: No ground truth characters for CER calculation.")
+            print(f"Page {page_num}: No ground truth characters for CER calculation.", file=out)
 
         if len(matched_pairs) > 0:
             avg_page_iou = page_iou_sum / len(matched_pairs)
-            print(f"Page {page_num}: Average IoU = {avg_page_iou:.4f}")
+            print(f"Page {page_num}: Average IoU = {avg_page_iou:.4f}", file=out)
             total_iou += page_iou_sum
 
-    print("\n--- Overall Metrics ---")
+    print("\n--- Overall Metrics ---", file=out)
     if total_gt_texts > 0:
         overall_cer = total_cer / total_gt_texts
-        print(f"Overall Average CER: {overall_cer:.4f}")
+        print(f"Overall Average CER: {overall_cer:.4f}", file=out)
     else:
-        print("Overall Average CER: N/A (No ground truth text found)")
+        print("Overall Average CER: N/A (No ground truth text found)", file=out)
 
     if total_matched_pairs > 0:
         overall_iou = total_iou / total_matched_pairs
-        print(f"Overall Average IoU: {overall_iou:.4f}")
+        print(f"Overall Average IoU: {overall_iou:.4f}", file=out)
     else:
-        print("Overall Average IoU: N/A (No matched bounding boxes found)")
+        print("Overall Average IoU: N/A (No matched bounding boxes found)", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR Accuracy Reviewer.")
+    parser.add_argument("--ocr_csv", type=str, required=True,
+                        help="Path to the OCR results CSV file (or its columnar .parquet/.npz file).")
+    parser.add_argument("--ground_truth_json", type=str, required=True,
+                        help="Path to the ground truth JSON file.")
+    parser.add_argument("--iou_threshold", type=float, default=0.5,
+                        help="IoU threshold for matching bounding boxes.")
+    parser.add_argument("--match_method", choices=MATCH_METHODS, default="greedy",
+                        help="Box matching: greedy (GT order) or hungarian (optimal total IoU).")
+    parser.add_argument("--no-columnar", action="store_true",
+                        help="Read the CSV even when an up-to-date .parquet/.npz copy sits next to it.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    try:
+        review_accuracy(args.ocr_csv, args.ground_truth_json, args.iou_threshold, args.match_method,
+                        prefer_columnar=not args.no_columnar)
+    except RuntimeError as error:
+        raise SystemExit(str(error))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+"""Benchmarks the built-in CER engines against the reference DP per string length.
+
+Usage:
+
+    python -m scripts.benchmark_cer [--lengths 10 100 1000] [--error-rate 0.1] [--repeat 3]
+
+For each length a ground truth string of Japanese characters and a
+hypothesis with ``error-rate`` random edits are generated; the table lists the
+best-of-``repeat`` time of the O(n*m) DP, the unbounded bit-parallel engine,
+and ``calculate_cer`` with ``max_cer = error-rate / 2``, which gives up early
+(the pair is known to be worse than the bound), with their speedups.
+"""
+
+import argparse
+import random
+import time
+
+from scripts.calculate_cer import _bit_parallel_distance, _dp_distance, calculate_cer
+
+_ALPHABET = "あいうえおかきくけこさしすせそ日本語手書文字認識精度漢字検査用紙"
+
+
+def _make_pair(rng, length, error_rate):
+    truth = [rng.choice(_ALPHABET) for _ in range(length)]
+    hypothesis = list(truth)
+    for _ in range(int(length * error_rate)):
+        position = rng.randrange(len(hypothesis) + 1)
+        operation = rng.randrange(3)
+        if operation == 0 or not hypothesis:
+            hypothesis.insert(position, rng.choice(_ALPHABET))
+        elif operation == 1:
+            del hypothesis[min(position, len(hypothesis) - 1)]
+        else:
+            hypothesis[min(position, len(hypothesis) - 1)] = rng.choice(_ALPHABET)
+    return "".join(truth), "".join(hypothesis)
+
+
+def _best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def run_benchmark(lengths, error_rate=0.1, repeat=3, seed=0):
+    """Returns one result dict per length (times in seconds)."""
+    rng = random.Random(seed)
+    rows = []
+    for length in lengths:
+        truth, hypothesis = _make_pair(rng, length, error_rate)
+        max_cer = error_rate / 2
+        dp_time, distance = _best_time(lambda: _dp_distance(truth, hypothesis), repeat)
+        bit_time, bit_distance = _best_time(lambda: _bit_parallel_distance(truth, hypothesis), repeat)
+        bounded_time, bounded_cer = _best_time(lambda: calculate_cer(truth, hypothesis, max_cer), repeat)
+        exact_cer = distance / length
+        if bit_distance != distance or (bounded_cer != exact_cer if exact_cer <= max_cer else bounded_cer <= max_cer):
+            raise RuntimeError(f"Engines disagree at length {length}.")
+        rows.append({"length": length, "distance": distance, "dp": dp_time,
+                     "bit_parallel": bit_time, "bounded": bounded_time})
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CER engine benchmark.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 50, 100, 500, 1000, 2000])
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'length':>7} {'dp [ms]':>10} {'bit [ms]':>10} {'bound [ms]':>10} {'bit x':>8} {'bound x':>8}")
+    for row in run_benchmark(args.lengths, args.error_rate, args.repeat):
+        print(f"{row['length']:>7} {row['dp'] * 1e3:>10.3f} {row['bit_parallel'] * 1e3:>10.3f} "
+              f"{row['bounded'] * 1e3:>10.3f} {row['dp'] / row['bit_parallel']:>8.1f} "
+              f"{row['dp'] / row['bounded']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,13 @@
+import multiprocessing
+
 try:
     import Levenshtein  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
     Levenshtein = None
 
 
-def _levenshtein_distance(s1: str, s2: str) -> int:
-    if Levenshtein:
-        return Levenshtein.distance(s1, s2)
-
-    # Fallback dynamic programming implementation
+def _dp_distance(s1: str, s2: str) -> int:
+    """Reference O(n*m) dynamic programming edit distance."""
     if len(s1) < len(s2):
         s1, s2 = s2, s1
 
@@ -23,17 +22,156 @@ def _levenshtein_distance(s1: str, s2: str) -> int:
         previous_row = current_row
     return previous_row[-1]
 
-def calculate_cer(s1, s2):
+
+# Bands at most this wide are cheaper to evaluate cell by cell than a
+# bit-parallel column step.
+_BANDED_MAX_WIDTH = 9
+
+
+def _bit_parallel_distance(s1: str, s2: str, max_distance=None) -> int:
+    """Edit distance with Myers' bit-vector algorithm (Hyyro's formulation).
+
+    The shorter string is the pattern; one DP column is held in the bits of
+    a Python integer, so each character of the longer string costs a handful
+    of big-integer operations instead of a loop over the pattern.  With
+    ``max_distance`` any larger distance is reported as ``max_distance + 1``,
+    and the scan stops as soon as the remaining characters can no longer bring
+    the distance within the bound.
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    m = len(s2)
+    if m == 0:
+        score = len(s1)
+        return score if max_distance is None or score <= max_distance else max_distance + 1
+    remaining = len(s1)
+
+    peq = {}
+    for i, c in enumerate(s2):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for c in s1:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & full) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        remaining -= 1
+        # Each further character lowers the last-row value by at most one.
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+    if max_distance is not None and score > max_distance:
+        return max_distance + 1
+    return score
+
+
+def _banded_distance(s1: str, s2: str, max_distance: int) -> int:
+    """Edit distance if it is at most ``max_distance``, otherwise ``max_distance + 1``.
+
+    Only the diagonal band of width ``2 * max_distance + 1`` is evaluated
+    (Ukkonen), and the computation stops as soon as every cell of a row
+    exceeds the bound.
+    """
+    n, m = len(s1), len(s2)
+    k = max_distance
+    if abs(n - m) > k:
+        return k + 1
+    beyond = k + 1
+    previous_row = [j if j <= k else beyond for j in range(m + 1)]
+    current_row = [beyond] * (m + 1)
+    for i in range(1, n + 1):
+        lo, hi = max(1, i - k), min(m, i + k)
+        c1 = s1[i - 1]
+        current_row[lo - 1] = i if lo == 1 and i <= k else beyond
+        row_min = current_row[lo - 1]
+        for j in range(lo, hi + 1):
+            value = previous_row[j - 1] + (c1 != s2[j - 1])
+            if previous_row[j] + 1 < value:
+                value = previous_row[j] + 1
+            if current_row[j - 1] + 1 < value:
+                value = current_row[j - 1] + 1
+            current_row[j] = value
+            if value < row_min:
+                row_min = value
+        if hi < m:
+            current_row[hi + 1] = beyond
+        if row_min > k:
+            return beyond
+        previous_row, current_row = current_row, previous_row
+    return min(previous_row[m], beyond)
+
+
+def _levenshtein_distance(s1: str, s2: str, max_distance=None) -> int:
+    """Edit distance; with ``max_distance`` any value above it is reported as ``max_distance + 1``."""
+    if Levenshtein:
+        distance = Levenshtein.distance(s1, s2)
+    elif max_distance is not None and 2 * max_distance + 1 <= _BANDED_MAX_WIDTH:
+        return _banded_distance(s1, s2, max_distance)
+    else:
+        distance = _bit_parallel_distance(s1, s2, max_distance)
+    if max_distance is not None and distance > max_distance:
+        return max_distance + 1
+    return distance
+
+
+def _max_distance(max_cer, length):
+    """Largest distance whose CER does not exceed ``max_cer`` (None when no bound applies)."""
+    k = int(max_cer * length)
+    # Settle float rounding so that k / length <= max_cer < (k + 1) / length.
+    while (k + 1) / length <= max_cer:
+        k += 1
+    while k >= 0 and k / length > max_cer:
+        k -= 1
+    return k if k >= 0 else None
+
+
+def calculate_cer(s1, s2, max_cer=None):
     """
     Calculates the Character Error Rate (CER) between two strings.
 
     Args:
         s1 (str): The ground truth string.
         s2 (str): The hypothesis string.
+        max_cer (float, optional): Stop early once the CER is known to exceed
+            this value. The result is then a lower bound above ``max_cer``
+            instead of the exact CER; results up to ``max_cer`` are exact.
 
     Returns:
         float: The Character Error Rate.
     """
     if len(s1) == 0:
         return 1.0 if len(s2) > 0 else 0.0
-    return _levenshtein_distance(s1, s2) / len(s1)
\ No newline at end of file
+    max_distance = None if max_cer is None else _max_distance(max_cer, len(s1))
+    return _levenshtein_distance(s1, s2, max_distance) / len(s1)
+
+
+def _cer_chunk(args):
+    pairs, max_cer = args
+    return [calculate_cer(s1, s2, max_cer) for s1, s2 in pairs]
+
+
+def calculate_cer_batch(pairs, max_cer=None, workers=1, chunk_size=256, mp_context=None):
+    """
+    Calculates ``calculate_cer(s1, s2, max_cer)`` for each ``(s1, s2)`` pair.
+
+    With ``workers > 1`` chunks of ``chunk_size`` pairs are evaluated in a
+    process pool (``mp_context`` defaults to ``spawn``); results keep the
+    input order.
+    """
+    pairs = list(pairs)
+    if workers <= 1 or len(pairs) <= chunk_size:
+        return _cer_chunk((pairs, max_cer))
+    chunks = [(pairs[start:start + chunk_size], max_cer) for start in range(0, len(pairs), chunk_size)]
+    mp_context = mp_context or multiprocessing.get_context("spawn")
+    with mp_context.Pool(processes=workers) as pool:
+        return [cer for chunk in pool.map(_cer_chunk, chunks) for cer in chunk]
@@ -1,3 +1,9 @@
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
 def calculate_iou(box1, box2):
     """Calculates the Intersection over Union (IoU) of two bounding boxes.
 
@@ -32,3 +38,238 @@ def calculate_iou(box1, box2):
     iou = intersection_area / union_area
 
     return iou
+
+
+def calculate_iou_batch(boxes_a, boxes_b):
+    """Calculates the IoU of each pair ``(boxes_a[i], boxes_b[i])``.
+
+    Args:
+        boxes_a, boxes_b: Sequences (or ``(N, 4)`` arrays) of [x0, y0, x1, y1] boxes of equal length.
+
+    Returns:
+        A float64 array of shape ``(N,)`` when NumPy is installed, otherwise a list.
+        The arithmetic mirrors ``calculate_iou``, so both paths return identical values.
+    """
+    if np is None:
+        return [calculate_iou(box1, box2) for box1, box2 in zip(boxes_a, boxes_b)]
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    if len(a) != len(b):
+        raise ValueError("calculate_iou_batch needs box sequences of equal length.")
+    intersection = (np.maximum(0, np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0])) *
+                    np.maximum(0, np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1])))
+    union = ((a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) +
+             (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - intersection)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union == 0, 0.0, intersection / union)
+
+
+def calculate_iou_matrix(boxes_a, boxes_b):
+    """Calculates the IoU of every box in ``boxes_a`` against every box in ``boxes_b``.
+
+    Returns:
+        A float64 array of shape ``(len(boxes_a), len(boxes_b))`` when NumPy is
+        installed, otherwise a list of row lists with identical values.
+    """
+    if np is None:
+        return [[calculate_iou(box1, box2) for box2 in boxes_b] for box1 in boxes_a]
+    a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)[None, :, :]
+    # Broadcasting pairs every row of ``a`` with every column of ``b`` without
+    # materializing the len(a) * len(b) pairs of boxes.
+    intersection = (np.maximum(0, np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])) *
+                    np.maximum(0, np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])))
+    union = ((a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1]) +
+             (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1]) - intersection)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union == 0, 0.0, intersection / union)
+
+
+# --- Quadrilaterals -------------------------------------------------------
+#
+# PaddleOCR reports each line as four corner points; rotated or slanted
+# handwriting fills only part of its axis-aligned rectangle.  The functions
+# below compute the exact IoU of convex quadrilaterals by clipping one with
+# the other (Sutherland-Hodgman).  The NumPy path clips all pairs at once with
+# fixed-size vertex buffers and performs the same operations in the same
+# order as the scalar path, so both return identical values.
+
+_MAX_CLIP_VERTICES = 8  # a convex quadrilateral clipped by another has at most 8 vertices
+
+
+def _signed_area(points):
+    area = 0.0
+    count = len(points)
+    for i in range(count):
+        x1, y1 = points[i]
+        x2, y2 = points[(i + 1) % count]
+        area += x1 * y2 - x2 * y1
+    return area / 2.0
+
+
+def _counter_clockwise(quad):
+    points = [(float(x), float(y)) for x, y in quad]
+    return points[::-1] if _signed_area(points) < 0 else points
+
+
+def _bounds_overlap(points1, points2):
+    """False when the axis-aligned bounds are disjoint, i.e. the intersection is empty."""
+    return (min(x for x, _ in points1) < max(x for x, _ in points2) and
+            min(x for x, _ in points2) < max(x for x, _ in points1) and
+            min(y for _, y in points1) < max(y for _, y in points2) and
+            min(y for _, y in points2) < max(y for _, y in points1))
+
+
+def _clipped_area(subject, clip):
+    polygon = subject
+    for i in range(4):
+        ax, ay = clip[i]
+        bx, by = clip[(i + 1) % 4]
+        ex, ey = bx - ax, by - ay
+        clipped = []
+        count = len(polygon)
+        for j in range(count):
+            px, py = polygon[j - 1] if j else polygon[count - 1]
+            cx, cy = polygon[j]
+            d_prev = ex * (py - ay) - ey * (px - ax)
+            d_cur = ex * (cy - ay) - ey * (cx - ax)
+            if (d_cur >= 0) != (d_prev >= 0):
+                t = d_prev / (d_prev - d_cur)
+                clipped.append((px + t * (cx - px), py + t * (cy - py)))
+            if d_cur >= 0:
+                clipped.append((cx, cy))
+        polygon = clipped[:_MAX_CLIP_VERTICES]
+        if not polygon:
+            return 0.0
+    return abs(_signed_area(polygon)) if len(polygon) >= 3 else 0.0
+
+
+def calculate_quad_iou(quad1, quad2):
+    """Calculates the exact IoU of two convex quadrilaterals.
+
+    Args:
+        quad1, quad2: Four (x, y) corner points each, in either winding order.
+
+    Returns:
+        float: The IoU value, a float between 0 and 1.
+    """
+    subject = _counter_clockwise(quad1)
+    clip = _counter_clockwise(quad2)
+    intersection_area = _clipped_area(subject, clip) if _bounds_overlap(subject, clip) else 0.0
+    union_area = abs(_signed_area(subject)) + abs(_signed_area(clip)) - intersection_area
+    if union_area == 0:
+        return 0.0
+    return intersection_area / union_area
+
+
+def _batch_signed_area(xs, ys, counts):
+    """Shoelace area of polygons stored column-wise: vertex ``i`` of polygon ``k`` is ``(xs[i, k], ys[i, k])``."""
+    area = np.zeros(xs.shape[1])
+    columns = np.arange(xs.shape[1])
+    for i in range(xs.shape[0]):
+        nxt = np.where(i + 1 < counts, i + 1, 0)
+        term = xs[i] * ys[nxt, columns] - xs[nxt, columns] * ys[i]
+        area = np.where(i < counts, area + term, area)
+    return area / 2.0
+
+
+def _batch_counter_clockwise(quads):
+    xs, ys = quads[:, :, 0].T.copy(), quads[:, :, 1].T.copy()
+    clockwise = _batch_signed_area(xs, ys, np.full(xs.shape[1], 4)) < 0
+    return np.where(clockwise, xs[::-1], xs), np.where(clockwise, ys[::-1], ys)
+
+
+def _batch_clipped_area(sx, sy, cx, cy):
+    n = sx.shape[1]
+    columns = np.arange(n)
+    xs = np.zeros((_MAX_CLIP_VERTICES, n))
+    ys = np.zeros((_MAX_CLIP_VERTICES, n))
+    xs[:4], ys[:4] = sx, sy
+    counts = np.full(n, 4)
+    for i in range(4):
+        ax, ay = cx[i], cy[i]
+        ex, ey = cx[(i + 1) % 4] - ax, cy[(i + 1) % 4] - ay
+        # Every input vertex emits up to two output points: the edge crossing
+        # (slot 2j) and the vertex itself (slot 2j + 1).
+        out_x = np.zeros((2 * _MAX_CLIP_VERTICES, n))
+        out_y = np.zeros((2 * _MAX_CLIP_VERTICES, n))
+        keep = np.zeros((2 * _MAX_CLIP_VERTICES, n), dtype=bool)
+        for j in range(int(counts.max(initial=0))):
+            valid = j < counts
+            prev = counts - 1 if j == 0 else np.full(n, j - 1)
+            px, py = xs[np.maximum(prev, 0), columns], ys[np.maximum(prev, 0), columns]
+            qx, qy = xs[j], ys[j]
+            d_prev = ex * (py - ay) - ey * (px - ax)
+            d_cur = ex * (qy - ay) - ey * (qx - ax)
+            crosses = valid & ((d_cur >= 0) != (d_prev >= 0))
+            t = d_prev / np.where(crosses, d_prev - d_cur, 1.0)
+            out_x[2 * j] = px + t * (qx - px)
+            out_y[2 * j] = py + t * (qy - py)
+            out_x[2 * j + 1], out_y[2 * j + 1] = qx, qy
+            keep[2 * j] = crosses
+            keep[2 * j + 1] = valid & (d_cur >= 0)
+        # Compact the kept points to the front, preserving their order.
+        order = np.argsort(~keep, axis=0, kind='stable')[:_MAX_CLIP_VERTICES]
+        xs = np.take_along_axis(out_x, order, axis=0)
+        ys = np.take_along_axis(out_y, order, axis=0)
+        counts = np.minimum(keep.sum(axis=0), _MAX_CLIP_VERTICES)
+    return np.where(counts >= 3, np.abs(_batch_signed_area(xs, ys, counts)), 0.0)
+
+
+def calculate_quad_iou_batch(quads_a, quads_b):
+    """Calculates the exact IoU of each pair of convex quadrilaterals ``(quads_a[i], quads_b[i])``.
+
+    Args:
+        quads_a, quads_b: Sequences (or ``(N, 4, 2)`` arrays) of quadrilaterals of equal length.
+
+    Returns:
+        A float64 array of shape ``(N,)`` when NumPy is installed, otherwise a list;
+        the values are identical to ``calculate_quad_iou``.
+    """
+    if np is None:
+        return [calculate_quad_iou(quad1, quad2) for quad1, quad2 in zip(quads_a, quads_b)]
+    a = np.asarray(quads_a, dtype=np.float64).reshape(-1, 4, 2)
+    b = np.asarray(quads_b, dtype=np.float64).reshape(-1, 4, 2)
+    if len(a) != len(b):
+        raise ValueError("calculate_quad_iou_batch needs quadrilateral sequences of equal length.")
+    sx, sy = _batch_counter_clockwise(a)
+    cx, cy = _batch_counter_clockwise(b)
+    four = np.full(len(a), 4)
+    areas = np.abs(_batch_signed_area(sx, sy, four)) + np.abs(_batch_signed_area(cx, cy, four))
+    # Only pairs whose bounds overlap are clipped; the others intersect in nothing.
+    active = np.flatnonzero((sx.min(axis=0) < cx.max(axis=0)) & (cx.min(axis=0) < sx.max(axis=0)) &
+                            (sy.min(axis=0) < cy.max(axis=0)) & (cy.min(axis=0) < sy.max(axis=0)))
+    intersection = np.zeros(len(a))
+    if len(active):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intersection[active] = _batch_clipped_area(sx[:, active], sy[:, active],
+                                                       cx[:, active], cy[:, active])
+    union = areas - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union == 0, 0.0, intersection / union)
+
+
+def calculate_quad_iou_matrix(quads_a, quads_b):
+    """Calculates the exact IoU of every quadrilateral in ``quads_a`` against every one in ``quads_b``."""
+    if np is None:
+        return [[calculate_quad_iou(quad1, quad2) for quad2 in quads_b] for quad1 in quads_a]
+    a = np.asarray(quads_a, dtype=np.float64).reshape(-1, 4, 2)
+    b = np.asarray(quads_b, dtype=np.float64).reshape(-1, 4, 2)
+    # Orientation and area are computed once per quadrilateral and broadcast
+    # over the pairs; only pairs whose bounds overlap are gathered for clipping.
+    sx, sy = _batch_counter_clockwise(a)
+    cx, cy = _batch_counter_clockwise(b)
+    areas = (np.abs(_batch_signed_area(sx, sy, np.full(len(a), 4)))[:, None] +
+             np.abs(_batch_signed_area(cx, cy, np.full(len(b), 4)))[None, :])
+    overlap = ((sx.min(axis=0)[:, None] < cx.max(axis=0)[None, :]) &
+               (cx.min(axis=0)[None, :] < sx.max(axis=0)[:, None]) &
+               (sy.min(axis=0)[:, None] < cy.max(axis=0)[None, :]) &
+               (cy.min(axis=0)[None, :] < sy.max(axis=0)[:, None]))
+    rows, cols = np.nonzero(overlap)
+    intersection = np.zeros((len(a), len(b)))
+    if len(rows):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intersection[rows, cols] = _batch_clipped_area(sx[:, rows], sy[:, rows], cx[:, cols], cy[:, cols])
+    union = areas - intersection
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union == 0, 0.0, intersection / union)
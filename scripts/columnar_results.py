@@ -0,0 +1,180 @@
+"""Typed columnar storage of OCR result rows, written alongside the CSV.
+
+Re-reading large result sets through ``csv.DictReader`` parses every field
+of every row in Python.  The columnar file holds the same rows as typed
+columns instead:
+
+* ``page`` (1-based, as in the CSV) and ``block_id`` as int32,
+* ``x0``, ``y0``, ``x1``, ``y1`` and ``confidence`` as float32,
+* ``text`` through a table of distinct strings (form text repeats a lot).
+
+Two encodings exist.  ``.parquet`` files need ``pyarrow`` and use Parquet's
+dictionary encoding for the text.  ``.npz`` files need only NumPy; besides
+the numeric columns they hold ``text_index`` (int32 into the string table),
+the string table as one UTF-8 blob with code-point ``text_offsets``, and a
+``format`` marker, so the file describes itself.
+"""
+
+import logging
+import os
+import zipfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+    pq = None
+
+FORMAT_NAME = "ocr-results-v1"
+INT_COLUMNS = ("page", "block_id")
+FLOAT_COLUMNS = ("x0", "y0", "x1", "y1", "confidence")
+PARQUET_ROW_GROUP = 65536
+_PARQUET_MAGIC = b"PAR1"
+
+logger = logging.getLogger(__name__)
+
+
+def default_columnar_path(csv_path):
+    """Columnar path next to ``csv_path``: Parquet when pyarrow is installed, NPZ otherwise."""
+    extension = ".parquet" if pq is not None else ".npz"
+    return os.path.splitext(csv_path)[0] + extension
+
+
+def is_columnar_file(path):
+    """True for Parquet files and for NPZ archives written by ``ColumnarResultWriter``."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read(4) == _PARQUET_MAGIC:
+                return True
+        if not zipfile.is_zipfile(path):
+            return False
+        with zipfile.ZipFile(path) as archive:
+            return "format.npy" in archive.namelist()
+    except OSError:
+        return False
+
+
+class ColumnarResultWriter:
+    """Appends result rows page by page, like ``CsvResultWriter``.
+
+    Rows keep their 0-based ``page`` in memory; the 1-based page number is
+    stored.  Parquet output is flushed in row groups; NPZ output is kept in
+    compact typed arrays and written on ``close``.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.rows_written = 0
+        self.parquet = output_path.endswith(".parquet")
+        if self.parquet and pq is None:
+            raise RuntimeError("pyarrow is required for Parquet output but is not installed.")
+        if not self.parquet and np is None:
+            raise RuntimeError("NumPy is required for NPZ output but is not installed.")
+        self._columns = {name: array('i') for name in INT_COLUMNS}
+        self._columns.update({name: array('f') for name in FLOAT_COLUMNS})
+        self._texts = []
+        self._text_index = array('i')
+        self._text_ids = {}
+        self._parquet_writer = None
+        self._closed = False
+
+    def write_page(self, page_results):
+        columns = self._columns
+        for res in page_results:
+            columns['page'].append(res['page'] + 1)
+            columns['block_id'].append(res['block_id'])
+            for name in FLOAT_COLUMNS:
+                columns[name].append(res[name])
+            if self.parquet:
+                self._texts.append(res['text'])
+            else:
+                text_id = self._text_ids.get(res['text'])
+                if text_id is None:
+                    text_id = self._text_ids[res['text']] = len(self._text_ids)
+                self._text_index.append(text_id)
+        self.rows_written += len(page_results)
+        if self.parquet and len(columns['page']) >= PARQUET_ROW_GROUP:
+            self._flush_parquet()
+
+    def _flush_parquet(self):
+        if not len(self._columns['page']) and self._parquet_writer is not None:
+            return
+        table = pa.table({
+            **{name: pa.array(self._columns[name], type=pa.int32()) for name in INT_COLUMNS},
+            **{name: pa.array(self._columns[name], type=pa.float32()) for name in FLOAT_COLUMNS},
+            'text': pa.array(self._texts, type=pa.string()),
+        })
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.output_path, table.schema, use_dictionary=['text'])
+        self._parquet_writer.write_table(table)
+        for column in self._columns.values():
+            del column[:]
+        self._texts = []
+
+    def _write_npz(self):
+        table = "".join(self._text_ids)
+        offsets = array('q', [0])
+        for text in self._text_ids:
+            offsets.append(offsets[-1] + len(text))
+        with open(self.output_path, 'wb') as f:
+            np.savez(
+                f,
+                format=np.array(FORMAT_NAME),
+                text_index=np.frombuffer(self._text_index, dtype=np.int32),
+                text_blob=np.frombuffer(table.encode('utf-8'), dtype=np.uint8),
+                text_offsets=np.frombuffer(offsets, dtype=np.int64),
+                **{name: np.frombuffer(self._columns[name], dtype=np.int32) for name in INT_COLUMNS},
+                **{name: np.frombuffer(self._columns[name], dtype=np.float32) for name in FLOAT_COLUMNS},
+            )
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self.parquet:
+            self._flush_parquet()
+            self._parquet_writer.close()
+        else:
+            self._write_npz()
+        logger.info("Columnar OCR results saved to %s", self.output_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_columnar_results(path):
+    """Reads a columnar result file.
+
+    Returns ``(columns, texts)``: ``columns`` maps every numeric column name
+    to a NumPy array and ``texts`` is the list of row texts, in file order.
+    """
+    with open(path, 'rb') as f:
+        parquet = f.read(4) == _PARQUET_MAGIC
+    if parquet:
+        if pq is None:
+            raise RuntimeError("pyarrow is required to read Parquet results but is not installed.")
+        table = pq.read_table(path)
+        columns = {name: table.column(name).to_numpy() for name in INT_COLUMNS + FLOAT_COLUMNS}
+        return columns, table.column('text').to_pylist()
+
+    if np is None:
+        raise RuntimeError("NumPy is required to read NPZ results but is not installed.")
+    with np.load(path, allow_pickle=False) as data:
+        if "format" not in data.files or str(data["format"]) != FORMAT_NAME:
+            raise RuntimeError(f"Unsupported columnar results file: {path}")
+        columns = {name: data[name] for name in INT_COLUMNS + FLOAT_COLUMNS}
+        table = data["text_blob"].tobytes().decode('utf-8')
+        offsets = data["text_offsets"].tolist()
+        distinct = [table[start:end] for start, end in zip(offsets, offsets[1:])]
+        texts = [distinct[index] for index in data["text_index"].tolist()]
+    return columns, texts
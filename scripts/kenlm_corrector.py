@@ -1,24 +1,293 @@
-# import kenlm
+"""Language-model rescoring of the ensemble's n-best candidates (SDD 5.3).
+
+Every voted line carries the losing engines' texts as ``alternatives``.
+``KenLMCorrector`` scores the voted text and its alternatives with an n-gram
+language model and replaces the voted text only when the best-scoring
+alternative beats it by more than ``tau`` (log10 probability):
+
+    delta = score(best alternative) - score(voted text)
+    if delta > tau: choose the alternative, else keep the voted text
+
+Lines without a differing alternative are never scored.  Sentence scores are
+kept in an LRU cache, because form text repeats heavily across pages, and the
+pure-Python backends additionally cache n-gram lookups.  The ``kenlm``
+module is used when installed; without it, ARPA models are read by
+``ArpaModel``.  Models converted with ``scripts.lm_binary`` are memory-mapped
+and shared by all worker processes.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import kenlm  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    kenlm = None
+
+DEFAULT_TAU = 1.0
+DEFAULT_CACHE_SIZE = 65536
+UNIT_CHAR = "char"
+UNIT_WORD = "word"
+UNKNOWN_LOGPROB = -100.0  # what KenLM assigns to <unk> when the model lacks it
+
+logger = logging.getLogger(__name__)
+
+
+class _LruCache:
+    """Bounded mapping that evicts the least recently used entry.
+
+    A corrector may be shared by the threads of several documents (see
+    ``src.pipeline_manager``), so every operation holds a lock: lookups
+    reorder the entries too.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class BackoffModel:
+    """Scores sentences with a back-off n-gram model, like ``kenlm.Model.score``.
+
+    Subclasses provide ``order``, ``unknown_logprob`` and ``_entry(words)``,
+    which returns ``(log10 probability, log10 backoff)`` of an n-gram or None.
+    """
+
+    def __init__(self, cache_size=DEFAULT_CACHE_SIZE):
+        self._ngram_cache = _LruCache(cache_size)
+
+    def _entry(self, words):
+        raise NotImplementedError
+
+    def _ngram_score(self, context, word):
+        key = (context, word)
+        cached = self._ngram_cache.get(key)
+        if cached is not None:
+            return cached
+        score = 0.0
+        while True:
+            entry = self._entry(context + (word,))
+            if entry is not None:
+                score += entry[0]
+                break
+            if not context:
+                score += self.unknown_logprob
+                break
+            context_entry = self._entry(context)
+            if context_entry is not None:
+                score += context_entry[1]
+            context = context[1:]
+        self._ngram_cache.put(key, score)
+        return score
+
+    def score(self, sentence, bos=True, eos=True):
+        """log10 probability of the whitespace-separated tokens of ``sentence``."""
+        words = sentence.split()
+        if eos:
+            words.append("</s>")
+        context = ("<s>",) if bos else ()
+        keep = self.order - 1
+        total = 0.0
+        for word in words:
+            total += self._ngram_score(context, word)
+            context = (context + (word,))[-keep:] if keep else ()
+        return total
+
+
+def iter_arpa(path):
+    """Yields ``(order, words, log10 probability, log10 backoff)`` per n-gram of an ARPA file, in file order."""
+    order = None
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if not line or line.startswith("ngram ") or line == "\\data\\":
+                continue
+            if line == "\\end\\":
+                break
+            if line.startswith("\\") and line.endswith("-grams:"):
+                order = int(line[1:-len("-grams:")])
+                continue
+            if order is None:
+                continue
+            fields = line.split()
+            if len(fields) < order + 1:
+                raise RuntimeError(f"Malformed {order}-gram line in {path}: {line}")
+            backoff = float(fields[order + 1]) if len(fields) > order + 1 else 0.0
+            yield order, tuple(fields[1:order + 1]), float(fields[0]), backoff
+
+
+def read_arpa(path):
+    """Returns ``(order, {(w1, ..., wn): (log10 probability, log10 backoff)})`` of an ARPA file."""
+    ngrams = {}
+    max_order = 0
+    for order, words, logprob, backoff in iter_arpa(path):
+        max_order = max(max_order, order)
+        ngrams[words] = (logprob, backoff)
+    if not max_order:
+        raise RuntimeError(f"No n-grams found in ARPA file: {path}")
+    return max_order, ngrams
+
+
+class ArpaModel(BackoffModel):
+    """Back-off n-gram model held in memory after reading an ARPA file."""
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        super().__init__(cache_size)
+        self.path = path
+        self.order, self.ngrams = read_arpa(path)
+        unknown = self.ngrams.get(("<unk>",))
+        self.unknown_logprob = unknown[0] if unknown else UNKNOWN_LOGPROB
+
+    def _entry(self, words):
+        return self.ngrams.get(words)
+
+
+def load_language_model(model_path, cache_size=DEFAULT_CACHE_SIZE):
+    """Loads ``model_path`` with the backend that fits its format.
+
+    ``.lmbin`` files are memory-mapped (see ``scripts.lm_binary``); other
+    files are opened with KenLM when installed and read as ARPA otherwise.
+    """
+    from scripts.lm_binary import MappedModel, is_binary_model
+    if is_binary_model(model_path):
+        return MappedModel(model_path, cache_size)
+    if kenlm is not None:
+        return kenlm.Model(model_path)
+    return ArpaModel(model_path, cache_size)
+
 
 class KenLMCorrector:
-    def __init__(self, model_path):
+    """Rescores voted lines against their alternatives with an n-gram model.
+
+    ``unit`` selects the LM tokens: ``"char"`` (default) scores each
+    non-space character as a token, as Japanese models usually are;
+    ``"word"`` uses the whitespace-separated words of the text.  A model
+    that cannot be loaded raises ``RuntimeError`` instead of silently
+    disabling the correction.
+    """
+
+    def __init__(self, model_path, tau=DEFAULT_TAU, cache_size=DEFAULT_CACHE_SIZE, unit=UNIT_CHAR):
+        self.model_path = model_path
+        self.tau = tau
+        self.cache_size = cache_size
+        self.unit = unit
+        self._scores = _LruCache(cache_size)
         try:
-            self.model = kenlm.Model(model_path)
-            print(f"DEBUG: KenLM model loaded from {model_path}")
-        except Exception as e:
-            self.model = None
-            print(f"ERROR: Could not load KenLM model from {model_path}: {e}")
-
-    def correct(self, text):
-        if not self.model:
-            return text # Return original text if model not loaded
-
-        # This is a simplified example. Real KenLM correction involves more complex logic
-        # like generating n-best lists from OCR and re-scoring them with the LM.
-        # For demonstration, we'll just return the original text for now.
-        # In a real scenario, you would use self.model.score(text) and compare scores
-        # of different hypotheses.
-        return text
+            self.model = load_language_model(model_path, cache_size)
+        except Exception as exc:
+            logger.error("Could not load language model from %s: %s", model_path, exc)
+            raise RuntimeError(f"Could not load language model from {model_path}: {exc}") from exc
+        logger.debug("Language model loaded from %s", model_path)
+
+    def __getstate__(self):
+        # Models do not pickle; worker processes load their own copy.
+        return {'model_path': self.model_path, 'tau': self.tau,
+                'cache_size': self.cache_size, 'unit': self.unit}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def clear_caches(self):
+        """Empties the sentence and n-gram score caches; returns whether anything was cached."""
+        caches = [self._scores] + [getattr(self.model, name) for name in ('_ngram_cache', '_word_ids')
+                                   if isinstance(getattr(self.model, name, None), _LruCache)]
+        cached = any(len(cache) for cache in caches)
+        for cache in caches:
+            cache.clear()
+        return cached
+
+    def settings(self):
+        """Identifies everything that influences the corrected text (for cache keys)."""
+        settings = {'model': self.model_path, 'tau': self.tau, 'unit': self.unit}
+        if os.path.exists(self.model_path):
+            stat = os.stat(self.model_path)
+            settings['model_size'] = stat.st_size
+            settings['model_mtime_ns'] = stat.st_mtime_ns
+        return settings
+
+    def _tokens(self, text):
+        if self.unit == UNIT_CHAR:
+            return " ".join(char for char in text if not char.isspace())
+        return " ".join(text.split())
+
+    def score(self, text):
+        """log10 probability of ``text`` as a full sentence."""
+        return self.score_batch([text])[0]
+
+    def score_batch(self, texts):
+        """Scores ``texts``; each distinct text not in the cache is scored once."""
+        texts = list(texts)
+        scores = {}
+        for text in texts:
+            if text in scores:
+                continue
+            cached = self._scores.get(text)
+            if cached is None:
+                cached = self.model.score(self._tokens(text), bos=True, eos=True)
+                self._scores.put(text, cached)
+            scores[text] = cached
+        return [scores[text] for text in texts]
+
+    def choose(self, text, alternatives=()):
+        """Index of the chosen candidate: 0 keeps ``text``, ``i`` picks ``alternatives[i - 1]``."""
+        return self.choose_batch([(text, alternatives)])[0]
+
+    def choose_batch(self, candidates):
+        """Applies the margin rule to ``(text, alternatives)`` pairs, scoring all texts together."""
+        candidates = [(text, list(alternatives)) for text, alternatives in candidates]
+        choices = [0] * len(candidates)
+        contested = [index for index, (text, alternatives) in enumerate(candidates)
+                     if any(alternative and alternative != text for alternative in alternatives)]
+        scores = iter(self.score_batch(
+            candidate
+            for index in contested
+            for candidate in [candidates[index][0]] + candidates[index][1]
+        ))
+        for index in contested:
+            text, alternatives = candidates[index]
+            base = next(scores)
+            best, best_score = 0, base
+            for position, alternative in enumerate(alternatives, start=1):
+                alternative_score = next(scores)
+                if alternative and alternative != text and alternative_score > best_score:
+                    best, best_score = position, alternative_score
+            if best and best_score - base > self.tau:
+                choices[index] = best
+        return choices
+
+    def correct(self, text, alternatives=()):
+        """Returns the chosen text among ``text`` and its ``alternatives``."""
+        choice = self.choose(text, alternatives)
+        return text if choice == 0 else list(alternatives)[choice - 1]
 
 # Example usage (for testing purposes)
 if __name__ == "__main__":
@@ -35,5 +304,5 @@ if __name__ == "__main__":
     print(f"Original: {test_text}, Corrected: {corrected_text}")
 
     test_text_typo = "これはてすとです"
-    corrected_text_typo = corrector.correct(test_text_typo)
+    corrected_text_typo = corrector.correct(test_text_typo, ["これはテストです"])
     print(f"Original: {test_text_typo}, Corrected: {corrected_text_typo}")
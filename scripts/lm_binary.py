@@ -0,0 +1,262 @@
+"""Compact, memory-mapped n-gram model format for ``KenLMCorrector``.
+
+Usage:
+
+    python -m scripts.lm_binary model.arpa model.lmbin
+
+Loading an ARPA file builds Python dicts in every process that uses it, so
+``N`` OCR workers hold ``N`` private copies of the model.  The ``.lmbin``
+format produced by ``convert_arpa`` is instead read in place through a
+read-only ``mmap``: opening it only parses a fixed-size header, and the page
+cache keeps one physical copy that every worker process shares.  The
+conversion itself streams the ARPA file one order at a time, so it needs
+memory for the vocabulary and the largest single table, not the whole model.
+
+Layout (little endian):
+
+* header: magic, version, order, ``<unk>`` log10 probability, vocabulary size;
+* one section descriptor ``(slot count, table offset, strings offset)`` for
+  the vocabulary and one ``(slot count, table offset)`` per n-gram order;
+* the vocabulary: an open-addressing hash table of ``(string offset, string
+  length, word id)`` slots over a blob of UTF-8 words;
+* per order ``n``: an open-addressing hash table of ``(id_1 .. id_n,
+  log10 probability, log10 backoff)`` slots.
+
+Both tables hash with CRC32 (of the UTF-8 word, or of the packed word ids)
+and probe linearly; empty slots hold ``EMPTY`` as their id.  Probabilities
+are stored as float32, which keeps ARPA's precision.
+
+When the ``kenlm`` module is installed, KenLM's own ``build_binary`` output is
+memory-mapped by ``kenlm.Model`` in the same way and should be preferred.
+"""
+
+import argparse
+import mmap
+import struct
+import zlib
+
+from scripts.kenlm_corrector import (
+    DEFAULT_CACHE_SIZE,
+    UNKNOWN_LOGPROB,
+    BackoffModel,
+    _LruCache,
+    iter_arpa,
+)
+
+MAGIC = b"OCRLMB\x00\x01"
+FORMAT_VERSION = 1
+EMPTY = 0xFFFFFFFF
+LOAD_FACTOR = 0.6
+
+_HEADER = struct.Struct("<8sIIdI")
+_VOCAB_SECTION = struct.Struct("<QQQ")
+_NGRAM_SECTION = struct.Struct("<QQ")
+_VOCAB_SLOT = struct.Struct("<III")
+
+
+def _ngram_slot(order):
+    return struct.Struct(f"<{order}Iff")
+
+
+def _id_key(ids):
+    return struct.pack(f"<{len(ids)}I", *ids)
+
+
+def _slot_count(entries):
+    return max(1, int(entries / LOAD_FACTOR) + 1)
+
+
+def is_binary_model(path):
+    """True when ``path`` starts with the ``.lmbin`` magic."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _arpa_counts(path):
+    """Returns ``{order: n-gram count}`` from the ``\\data\\`` header of an ARPA file."""
+    counts = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            line = raw_line.strip()
+            if line.startswith("\\") and line.endswith("-grams:"):
+                break
+            if line.startswith("ngram "):
+                order, _, count = line[len("ngram "):].partition("=")
+                counts[int(order)] = int(count)
+    if not counts or sorted(counts) != list(range(1, max(counts) + 1)):
+        raise RuntimeError(f"Missing or incomplete \\data\\ header in ARPA file: {path}")
+    return counts
+
+
+def _vocabulary_table(vocabulary):
+    strings = bytearray()
+    slots = _slot_count(len(vocabulary))
+    table = bytearray(_VOCAB_SLOT.pack(0, 0, EMPTY) * slots)
+    for word_id, word in enumerate(vocabulary):
+        encoded = word.encode('utf-8')
+        slot = zlib.crc32(encoded) % slots
+        while _VOCAB_SLOT.unpack_from(table, slot * _VOCAB_SLOT.size)[2] != EMPTY:
+            slot = (slot + 1) % slots
+        _VOCAB_SLOT.pack_into(table, slot * _VOCAB_SLOT.size, len(strings), len(encoded), word_id)
+        strings += encoded
+    return slots, table, strings
+
+
+class _NgramTable:
+    """Hash table of one order, sized from the ARPA header count."""
+
+    def __init__(self, order, count):
+        self.order = order
+        self.count = count
+        self.entries = 0
+        self.record = _ngram_slot(order)
+        self.slots = _slot_count(count)
+        self.table = bytearray(self.record.pack(*([EMPTY] * order), 0.0, 0.0) * self.slots)
+
+    def add(self, ids, logprob, backoff):
+        if self.entries == self.count:
+            raise RuntimeError(f"More {self.order}-grams than the {self.count} declared in the ARPA header.")
+        self.entries += 1
+        slot = zlib.crc32(_id_key(ids)) % self.slots
+        while struct.unpack_from("<I", self.table, slot * self.record.size)[0] != EMPTY:
+            slot = (slot + 1) % self.slots
+        self.record.pack_into(self.table, slot * self.record.size, *ids, logprob, backoff)
+
+
+def convert_arpa(arpa_path, output_path):
+    """Converts an ARPA file to the memory-mapped format; returns the n-gram count.
+
+    The ARPA file is streamed: only the unigrams (the vocabulary) and the hash
+    table of the order being read are held in memory.  Each table is sized
+    from the ``\\data\\`` counts, so every section offset is known once the
+    vocabulary is, and a table is written out as soon as its order ends.
+    """
+    counts = _arpa_counts(arpa_path)
+    order = max(counts)
+    ngrams = iter_arpa(arpa_path)
+    unigrams = []
+    pending = None
+    for entry in ngrams:
+        if entry[0] != 1:
+            pending = entry
+            break
+        unigrams.append(entry)
+    vocabulary = sorted({words[0] for _, words, _, _ in unigrams})
+    word_ids = {word: index for index, word in enumerate(vocabulary)}
+    unknown = next((logprob for _, words, logprob, _ in unigrams if words == ("<unk>",)), UNKNOWN_LOGPROB)
+    vocab_slots, vocab_table, strings = _vocabulary_table(vocabulary)
+
+    vocab_offset = _HEADER.size + _VOCAB_SECTION.size + _NGRAM_SECTION.size * order
+    strings_offset = vocab_offset + len(vocab_table)
+    offset = strings_offset + len(strings)
+    total = 0
+    with open(output_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, order, unknown, len(vocabulary)))
+        f.write(_VOCAB_SECTION.pack(vocab_slots, vocab_offset, strings_offset))
+        for n in range(1, order + 1):
+            f.write(_NGRAM_SECTION.pack(_slot_count(counts[n]), offset))
+            offset += _slot_count(counts[n]) * _ngram_slot(n).size
+        f.write(vocab_table)
+        f.write(strings)
+
+        table = _NgramTable(1, counts[1])
+        for _, words, logprob, backoff in unigrams:
+            table.add([word_ids[words[0]]], logprob, backoff)
+        del unigrams
+        for n in range(1, order + 1):
+            if n > 1:
+                table = _NgramTable(n, counts[n])
+            while pending is not None and pending[0] == n:
+                _, words, logprob, backoff = pending
+                try:
+                    ids = [word_ids[word] for word in words]
+                except KeyError as exc:
+                    raise RuntimeError(f"{n}-gram word {exc.args[0]!r} is not among the unigrams of {arpa_path}.") from exc
+                table.add(ids, logprob, backoff)
+                pending = next(ngrams, None)
+            if pending is not None and pending[0] < n:
+                raise RuntimeError(f"ARPA sections of {arpa_path} are not in increasing order.")
+            f.write(table.table)
+            total += table.entries
+        if pending is not None:
+            raise RuntimeError(f"{pending[0]}-grams in {arpa_path} exceed the orders of its \\data\\ header.")
+    return total
+
+
+class MappedModel(BackoffModel):
+    """Back-off n-gram model read in place from a memory-mapped ``.lmbin`` file."""
+
+    def __init__(self, path, cache_size=DEFAULT_CACHE_SIZE):
+        super().__init__(cache_size)
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.order, self.unknown_logprob, self.vocabulary_size = \
+            _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._map.close()
+            raise RuntimeError(f"Not a version {FORMAT_VERSION} binary language model: {path}")
+        position = _HEADER.size
+        self._vocab_slots, self._vocab_offset, self._strings_offset = \
+            _VOCAB_SECTION.unpack_from(self._map, position)
+        position += _VOCAB_SECTION.size
+        self._tables = []
+        for n in range(1, self.order + 1):
+            slots, offset = _NGRAM_SECTION.unpack_from(self._map, position)
+            position += _NGRAM_SECTION.size
+            self._tables.append((slots, offset, _ngram_slot(n)))
+        self._word_ids = _LruCache(cache_size)
+
+    def close(self):
+        self._map.close()
+
+    def _word_id(self, word):
+        cached = self._word_ids.get(word)
+        if cached is not None:
+            return cached
+        encoded = word.encode('utf-8')
+        slot = zlib.crc32(encoded) % self._vocab_slots
+        word_id = EMPTY
+        while True:
+            offset, length, candidate = _VOCAB_SLOT.unpack_from(
+                self._map, self._vocab_offset + slot * _VOCAB_SLOT.size)
+            if candidate == EMPTY:
+                break
+            start = self._strings_offset + offset
+            if length == len(encoded) and self._map[start:start + length] == encoded:
+                word_id = candidate
+                break
+            slot = (slot + 1) % self._vocab_slots
+        self._word_ids.put(word, word_id)
+        return word_id
+
+    def _entry(self, words):
+        ids = [self._word_id(word) for word in words]
+        if EMPTY in ids:
+            return None
+        slots, table_offset, record = self._tables[len(ids) - 1]
+        slot = zlib.crc32(_id_key(ids)) % slots
+        count = len(ids)
+        while True:
+            values = record.unpack_from(self._map, table_offset + slot * record.size)
+            if values[0] == EMPTY:
+                return None
+            if list(values[:count]) == ids:
+                return values[count], values[count + 1]
+            slot = (slot + 1) % slots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert an ARPA n-gram model to the memory-mapped format.")
+    parser.add_argument("arpa_path", type=str, help="Input ARPA file.")
+    parser.add_argument("output_path", type=str, help="Output .lmbin file.")
+    args = parser.parse_args()
+    count = convert_arpa(args.arpa_path, args.output_path)
+    print(f"Wrote {count} n-grams to {args.output_path}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 #![cfg_attr(not(debug_assertions), windows_subsystem = "windows")]
 
-use tauri::api::process::{Command, CommandEvent};
-use tauri::Manager;
+use serde_json::{json, Value};
+use tauri::api::process::{kill_children, Command, CommandChild, CommandEvent};
+use tauri::async_runtime::{Mutex, Receiver};
+use tauri::{Manager, RunEvent, State};
 
 // Learn more about Tauri commands at https://tauri.app/v1/guides/features/command
 #[tauri::command]
@@ -9,79 +11,153 @@ fn greet(name: &str) -> String {
     format!("Hello, {}! You've been greeted from Rust!", name)
 }
 
-#[tauri::command]
-async fn run_ocr_process(pdf_path: String, output_folder: String, no_csv: bool) -> Result<String, String> {
-    let (mut rx, child) = Command::new("python")
-        .args(&[
-            "src/ocr_poc.py",
-            &pdf_path,
-            "--output_folder", &output_folder,
-            if no_csv { "--no-csv" } else { "" }
-        ])
-        .spawn()
-        .map_err(|e| format!("Failed to spawn python process: {}", e))?;
+/// Long-lived `python -m src.ocr_worker serve` process (JSON-RPC over stdio).
+/// It keeps the OCR engines loaded, so jobs skip the Python and model start-up.
+struct OcrWorker {
+    events: Receiver<CommandEvent>,
+    child: CommandChild,
+    next_id: u64,
+}
 
-    let mut output = String::new();
-    while let Some(event) = rx.recv().await {
-        match event {
-            CommandEvent::Stdout(line) => {
-                output.push_str(&line);
-                output.push_str("\n");
-            },
-            CommandEvent::Stderr(line) => {
-                output.push_str(&format!("ERROR: {}\n", line));
-            },
-            _ => {}
-        }
+enum CallError {
+    /// The worker answered with a JSON-RPC error; it keeps serving.
+    Job(String),
+    /// The worker is gone or unreachable; the next call starts a new one.
+    Worker(String),
+}
+
+impl OcrWorker {
+    fn spawn() -> Result<OcrWorker, String> {
+        let (events, child) = Command::new("python")
+            .args(&["-m", "src.ocr_worker", "serve"])
+            .spawn()
+            .map_err(|e| format!("Failed to spawn OCR worker: {}", e))?;
+        Ok(OcrWorker { events, child, next_id: 1 })
     }
 
-    let status = child.wait().await.map_err(|e| format!("Failed to wait for python process: {}", e))?;
+    async fn call(&mut self, method: &str, params: Value) -> Result<Value, CallError> {
+        let id = self.next_id;
+        self.next_id += 1;
+        let request = json!({"jsonrpc": "2.0", "id": id, "method": method, "params": params});
+        self.child
+            .write(format!("{}\n", request).as_bytes())
+            .map_err(|e| CallError::Worker(format!("Failed to send request to OCR worker: {}", e)))?;
 
-    if status.success() {
-        Ok(output)
-    } else {
-        Err(format!("Python process exited with error: {}\n{}", status, output))
+        let mut stderr = String::new();
+        while let Some(event) = self.events.recv().await {
+            match event {
+                CommandEvent::Stdout(line) => {
+                    let response: Value = match serde_json::from_str(&line) {
+                        Ok(response) => response,
+                        Err(_) => continue,
+                    };
+                    if response["id"] != json!(id) {
+                        continue;
+                    }
+                    if let Some(error) = response.get("error") {
+                        let output = error["data"]["output"].as_str().unwrap_or("");
+                        let message = error["message"].as_str().unwrap_or("OCR worker error");
+                        return Err(CallError::Job(format!("{}{}", output, message)));
+                    }
+                    return Ok(response["result"].clone());
+                }
+                CommandEvent::Stderr(line) => {
+                    stderr.push_str(&format!("ERROR: {}\n", line));
+                }
+                CommandEvent::Error(message) => {
+                    return Err(CallError::Worker(format!("OCR worker error: {}\n{}", message, stderr)));
+                }
+                CommandEvent::Terminated(payload) => {
+                    return Err(CallError::Worker(format!(
+                        "OCR worker exited with code {:?}\n{}",
+                        payload.code, stderr
+                    )));
+                }
+                _ => {}
+            }
+        }
+        Err(CallError::Worker(format!("OCR worker closed its output\n{}", stderr)))
     }
 }
 
-#[tauri::command]
-async fn run_accuracy_review(ocr_csv_path: String, ground_truth_json_path: String, iou_threshold: f64) -> Result<String, String> {
-    let (mut rx, child) = Command::new("python")
-        .args(&[
-            "scripts/accuracy_reviewer.py",
-            "--ocr_csv", &ocr_csv_path,
-            "--ground_truth_json", &ground_truth_json_path,
-            "--iou_threshold", &iou_threshold.to_string()
-        ])
-        .spawn()
-        .map_err(|e| format!("Failed to spawn python process: {}", e))?;
+#[derive(Default)]
+struct OcrWorkerState(Mutex<Option<OcrWorker>>);
 
-    let mut output = String::new();
-    while let Some(event) = rx.recv().await {
-        match event {
-            CommandEvent::Stdout(line) => {
-                output.push_str(&line);
-                output.push_str("\n");
-            },
-            CommandEvent::Stderr(line) => {
-                output.push_str(&format!("ERROR: {}\n", line));
-            },
-            _ => {}
+impl OcrWorkerState {
+    /// Sends one request, starting the worker first if it is not running.
+    async fn call(&self, method: &str, params: Value) -> Result<Value, String> {
+        let mut worker = self.0.lock().await;
+        if worker.is_none() {
+            *worker = Some(OcrWorker::spawn()?);
+        }
+        match worker.as_mut().unwrap().call(method, params).await {
+            Ok(result) => Ok(result),
+            Err(CallError::Job(message)) => Err(message),
+            Err(CallError::Worker(message)) => {
+                if let Some(dead) = worker.take() {
+                    let _ = dead.child.kill();
+                }
+                Err(message)
+            }
         }
     }
+}
 
-    let status = child.wait().await.map_err(|e| format!("Failed to wait for python process: {}", e))?;
+fn job_output(result: Value) -> String {
+    result["output"].as_str().unwrap_or("").to_string()
+}
 
-    if status.success() {
-        Ok(output)
-    } else {
-        Err(format!("Python process exited with error: {}\n{}", status, output))
-    }
+#[tauri::command]
+async fn run_ocr_process(
+    worker: State<'_, OcrWorkerState>,
+    pdf_path: String,
+    output_folder: String,
+    no_csv: bool,
+) -> Result<String, String> {
+    let params = json!({"pdf_path": pdf_path, "output_folder": output_folder, "no_csv": no_csv});
+    worker.call("ocr", params).await.map(job_output)
+}
+
+#[tauri::command]
+async fn run_accuracy_review(
+    worker: State<'_, OcrWorkerState>,
+    ocr_csv_path: String,
+    ground_truth_json_path: String,
+    iou_threshold: f64,
+) -> Result<String, String> {
+    let params = json!({
+        "ocr_csv": ocr_csv_path,
+        "ground_truth_json": ground_truth_json_path,
+        "iou_threshold": iou_threshold
+    });
+    worker.call("accuracy_review", params).await.map(job_output)
 }
 
 fn main() {
-    tauri::Builder::default()
+    let app = tauri::Builder::default()
+        .manage(OcrWorkerState::default())
+        .setup(|app| {
+            // Start the worker with the app so the engines are warm by the first job.
+            let handle = app.handle();
+            tauri::async_runtime::spawn(async move {
+                let state = handle.state::<OcrWorkerState>();
+                let mut worker = state.0.lock().await;
+                if worker.is_none() {
+                    match OcrWorker::spawn() {
+                        Ok(spawned) => *worker = Some(spawned),
+                        Err(message) => eprintln!("{}", message),
+                    }
+                }
+            });
+            Ok(())
+        })
         .invoke_handler(tauri::generate_handler![greet, run_ocr_process, run_accuracy_review])
-        .run(tauri::generate_context!())
+        .build(tauri::generate_context!())
         .expect("error while running tauri application");
+
+    app.run(|_, event| {
+        if let RunEvent::Exit = event {
+            kill_children();
+        }
+    });
 }
@@ -0,0 +1,150 @@
+"""Cross-page batched recognition of detected text lines.
+
+With line detection split from recognition (see ``src.multires``), every page
+contributes a ``CropBatch`` of line crops.  Recognizing them page by page
+keeps the recognizer's batches small, so ``RecognitionBatcher`` gathers the
+crops of many pages instead and groups them into buckets of similar aspect
+ratio.  Recognizers resize crops to a fixed height and pad them to the widest
+crop of the batch, so similar widths keep the padding small.
+
+A bucket is sent to the ensemble as soon as it holds ``batch_size`` crops.
+Whenever a page is added and the oldest waiting crop has waited longer than
+``max_latency`` seconds, every bucket is flushed regardless of its size.
+Each engine's lines are scattered back to their page and line, and pages are
+released in the order they were added once all of their lines are back.
+With ``max_pending_pages`` the buckets are also flushed once that many pages
+wait, which bounds the crops held in memory; ``shrink`` halves both limits
+when memory runs short (see ``src.memory_budget``).
+
+Crops may be zero-copy views of their page's pixmaps, so each waiting page
+keeps its batch's ``keepalive`` objects until it is released, and every
+recognizer batch carries those of the pages it draws crops from.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from src.engines import CropBatch
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_LATENCY = 2.0
+# Adjacent buckets differ in aspect ratio (width / height) by this factor.
+BUCKET_GROWTH = math.sqrt(2.0)
+
+
+def aspect_bucket(crop) -> int:
+    """Bucket index of a crop from its ``(height, width, ...)`` shape."""
+    shape = getattr(crop, "shape", None)
+    if not shape or len(shape) < 2 or not shape[0] or not shape[1]:
+        return 0
+    return int(math.floor(math.log(shape[1] / shape[0], BUCKET_GROWTH)))
+
+
+class _PendingPage:
+    def __init__(self, page_num, batch: CropBatch, context):
+        self.page_num = page_num
+        self.boxes = batch.boxes
+        # Owners of the crop buffers, e.g. pixmaps; dropped on release.
+        self.keepalive = batch.keepalive
+        self.context = context
+        self.lines: Dict[str, List[Optional[dict]]] = {}
+        self.remaining = len(batch)
+        self.partial = False
+
+
+class RecognitionBatcher:
+    """Recognizes the line crops of many pages in size-bucketed batches.
+
+    ``ensemble`` is an ``EnsembleRunner`` whose engines accept a
+    ``CropBatch``.  ``add_page`` and ``flush`` return the pages that became
+    complete as ``(page_num, responses, partial, context)`` tuples, where
+    ``responses`` holds ``(engine, lines)`` in the ensemble's format with one
+    line per crop of that page, and ``partial`` tells that an engine missed
+    the deadline for some of the page's lines.  ``context`` is passed through
+    from ``add_page`` unchanged.
+    """
+
+    def __init__(self, ensemble, batch_size=DEFAULT_BATCH_SIZE, max_latency=DEFAULT_MAX_LATENCY,
+                 clock=time.monotonic, max_pending_pages=None):
+        if batch_size < 1:
+            raise RuntimeError(f"Recognition batch size must be at least 1: {batch_size}")
+        self.ensemble = ensemble
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_pending_pages = max_pending_pages
+        self._clock = clock
+        self._pages: "OrderedDict[int, _PendingPage]" = OrderedDict()
+        # bucket -> list of (page, line index, crop, box, enqueued at)
+        self._buckets: Dict[int, list] = {}
+        self.batches = 0
+        self.lines = 0
+
+    def add_page(self, page_num, batch: CropBatch, context=None):
+        """Queues the crops of one page; returns the pages completed meanwhile."""
+        page = _PendingPage(page_num, batch, context)
+        self._pages[page_num] = page
+        now = self._clock()
+        for index, (crop, box) in enumerate(zip(batch.crops, batch.boxes)):
+            key = aspect_bucket(crop)
+            bucket = self._buckets.setdefault(key, [])
+            bucket.append((page, index, crop, box, now))
+            if len(bucket) >= self.batch_size:
+                self._run(self._buckets.pop(key))
+        if self.max_latency is not None and self._oldest_wait(now) > self.max_latency:
+            return self.flush()
+        if self.max_pending_pages is not None and len(self._pages) >= self.max_pending_pages:
+            return self.flush()
+        return self._release()
+
+    def shrink(self):
+        """Halves the batch size and the pages kept in flight; returns False once both are 1."""
+        pending_limit = self.max_pending_pages or max(1, len(self._pages))
+        if self.batch_size == 1 and pending_limit == 1:
+            return False
+        self.batch_size = max(1, self.batch_size // 2)
+        self.max_pending_pages = max(1, pending_limit // 2)
+        return True
+
+    def flush(self):
+        """Recognizes every queued crop and returns all remaining pages."""
+        for key in sorted(self._buckets):
+            self._run(self._buckets.pop(key))
+        return self._release()
+
+    def _oldest_wait(self, now):
+        waits = [now - bucket[0][4] for bucket in self._buckets.values() if bucket]
+        return max(waits, default=0.0)
+
+    def _run(self, items):
+        pages = list({id(item[0]): item[0] for item in items}.values())
+        batch = CropBatch([item[2] for item in items], [item[3] for item in items],
+                          keepalive=[owner for page in pages for owner in page.keepalive])
+        responses, timings = self.ensemble.infer(batch)
+        self.batches += 1
+        self.lines += len(items)
+        for engine, lines in responses:
+            for (page, index, _, _, _), line in zip(items, lines):
+                slots = page.lines.setdefault(engine.name, [None] * len(page.boxes))
+                slots[index] = line
+        partial = len(responses) < len(timings)
+        for page, _, _, _, _ in items:
+            page.remaining -= 1
+            page.partial = page.partial or partial
+
+    def _release(self):
+        completed = []
+        while self._pages:
+            page = next(iter(self._pages.values()))
+            if page.remaining > 0:
+                break
+            del self._pages[page.page_num]
+            page.keepalive = []
+            responses = []
+            for engine in self.ensemble.engines:
+                slots = page.lines.get(engine.name)
+                if slots is not None:
+                    responses.append((engine, [line for line in slots if line is not None]))
+            completed.append((page.page_num, responses, page.partial, page.context))
+        return completed
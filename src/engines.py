@@ -0,0 +1,332 @@
+"""Engine adapters and the shared engine pool (SDD 4.3).
+
+Engines are declared by ``EngineConfig`` (name, weight, kind, params).  The
+``EnginePool`` builds the underlying backend lazily on first use and shares a
+single instance between every config whose ``kind`` and ``params`` are
+identical, so an ensemble that lists the same model three times costs one load
+and one copy in RAM.  Instances stay alive across ``run_ocr`` calls and the
+least recently used ones no adapter still holds are evicted once the pool
+exceeds its memory budget.
+"""
+
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Mapping, Optional, Protocol, Tuple, TypedDict
+
+from src.instrumentation import current_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+
+class LineResult(TypedDict):
+    bbox: Tuple[Point, Point, Point, Point]
+    text: str
+    confidence: float
+
+
+class CropBatch:
+    """Line crops of one page for recognition-only inference.
+
+    ``crops[i]`` is an image of the line whose page-coordinate quadrilateral
+    is ``boxes[i]``.  ``keepalive`` holds objects that own the crop buffers.
+    """
+
+    def __init__(self, crops, boxes, keepalive=()):
+        self.crops = list(crops)
+        self.boxes = list(boxes)
+        self.keepalive = list(keepalive)
+
+    def __len__(self):
+        return len(self.crops)
+
+    def __getstate__(self):
+        # Buffer owners (pixmaps) do not pickle; the crops are copied anyway.
+        return {'crops': self.crops, 'boxes': self.boxes, 'keepalive': []}
+
+
+class EngineAdapter(Protocol):
+    name: str
+    weight: float
+    # Optional: ``releases_gil`` (bool) lets the ensemble runner use a thread
+    # instead of a process; ``config`` and ``pool`` are set by ``EnginePool.get``.
+    # ``infer`` may also receive a ``CropBatch``; adapters that support it
+    # return one line per crop, in order, with the crop's box.  ``detect``
+    # (image -> boxes) marks an adapter usable as the line detector.
+
+    def infer(self, image) -> List[LineResult]:
+        ...
+
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Declarative description of one ensemble member."""
+
+    name: str
+    weight: float = 1.0
+    kind: str = "paddleocr"
+    params: Mapping[str, Any] = field(default_factory=dict)
+
+    def instance_key(self) -> Tuple:
+        """Key under which backends are shared; name and weight do not matter."""
+        return (self.kind, json.dumps(dict(self.params), sort_keys=True, default=str))
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "EngineConfig":
+        if "name" not in data:
+            raise RuntimeError(f"Engine config is missing 'name': {data}")
+        return cls(
+            name=str(data["name"]),
+            weight=float(data.get("weight", 1.0)),
+            kind=str(data.get("kind", "paddleocr")),
+            params=dict(data.get("params", {})),
+        )
+
+
+def load_engine_configs(path) -> List[EngineConfig]:
+    """Loads a JSON list of engine configs (``name``, ``weight``, ``kind``, ``params``)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data:
+        raise RuntimeError(f"Engine config file must contain a non-empty list: {path}")
+    return [EngineConfig.from_dict(item) for item in data]
+
+
+def parse_paddle_result(raw_result) -> List[LineResult]:
+    """Converts PaddleOCR's ``[[bbox, (text, confidence)], ...]`` page output to LineResults."""
+    lines: List[LineResult] = []
+    if not raw_result or not raw_result[0]:
+        return lines
+    for line_info in raw_result[0]:
+        if not (isinstance(line_info, (list, tuple)) and len(line_info) == 2 and
+                isinstance(line_info[0], (list, tuple)) and
+                isinstance(line_info[1], (list, tuple)) and len(line_info[1]) == 2):
+            logger.debug("Skipping malformed line_info: %s", line_info)
+            continue
+        # Plain floats keep results JSON-serializable (cache, journal) even
+        # when the backend returns NumPy scalars.
+        bbox = tuple((float(point[0]), float(point[1])) for point in line_info[0])
+        text, confidence = line_info[1]
+        lines.append({'bbox': bbox, 'text': text, 'confidence': float(confidence)})
+    return lines
+
+
+class _PooledInstance:
+    def __init__(self, backend, memory_bytes):
+        self.backend = backend
+        self.memory_bytes = memory_bytes
+        # Backends such as PaddleOCR predictors are not safe to call from
+        # several threads at once, so shared instances serialize inference.
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        # Adapters handed out for this backend; while any is alive, evicting
+        # the pool entry would free nothing.
+        self.adapters = weakref.WeakSet()
+
+
+class PaddleOCREngine:
+    """EngineAdapter over a (possibly shared) PaddleOCR instance."""
+
+    # Paddle inference runs in native code without holding the GIL, so the
+    # ensemble runner can dispatch it on a thread.
+    releases_gil = True
+
+    def __init__(self, name, weight, instance):
+        self.name = name
+        self.weight = weight
+        self.config = None
+        self._instance = instance
+
+    @property
+    def backend(self):
+        return self._instance.backend
+
+    def infer(self, image) -> List[LineResult]:
+        if isinstance(image, CropBatch):
+            return self.recognize(image)
+        with self._instance.lock:
+            raw_result = self._instance.backend.ocr(image, cls=True)
+        return parse_paddle_result(raw_result)
+
+    def detect(self, image) -> List[Tuple[Point, Point, Point, Point]]:
+        """Runs only the text detector and returns line quadrilaterals."""
+        with self._instance.lock:
+            raw_result = self._instance.backend.ocr(image, det=True, rec=False, cls=False)
+        if not raw_result or not raw_result[0]:
+            return []
+        return [tuple((float(point[0]), float(point[1])) for point in box) for box in raw_result[0]]
+
+    def recognize(self, batch: CropBatch) -> List[LineResult]:
+        """Recognizes all crops of ``batch`` in one call; unreadable crops get empty text.
+
+        The crops go straight to PaddleOCR's angle classifier and text
+        recognizer, which split the list into batches of ``cls_batch_num`` and
+        ``rec_batch_num`` (so those params bound the tensor size).
+        ``PaddleOCR.ocr(..., det=False)`` is only a fallback for backends
+        without a ``text_recognizer``: some PaddleOCR versions treat each list
+        item there as a separate image and recognize the crops one by one.
+        """
+        if not batch.crops:
+            return []
+        crops = list(batch.crops)
+        backend = self._instance.backend
+        recognizer = getattr(backend, "text_recognizer", None)
+        with self._instance.lock:
+            if callable(recognizer):
+                classifier = getattr(backend, "text_classifier", None)
+                if getattr(backend, "use_angle_cls", False) and callable(classifier):
+                    crops, _, _ = classifier(crops)
+                recognized, _ = recognizer(crops)
+            else:
+                recognized = _per_crop_results(backend.ocr(crops, det=False, rec=True, cls=True), len(batch))
+        if len(recognized) != len(batch):
+            raise RuntimeError(f"Recognizer returned {len(recognized)} results for {len(batch)} crops.")
+        lines: List[LineResult] = []
+        for box, result in zip(batch.boxes, recognized):
+            text, confidence = result or ("", 0.0)
+            lines.append({'bbox': box, 'text': text, 'confidence': float(confidence)})
+        return lines
+
+
+def _per_crop_results(raw_result, count):
+    """Normalizes recognition-only output to one ``(text, confidence)`` (or None) per crop.
+
+    Depending on the PaddleOCR version a list of crops yields
+    ``[[(text, conf), ...]]`` or ``[[(text, conf)], ...]``.
+    """
+    if not raw_result:
+        return [None] * count
+    if len(raw_result) == 1 and raw_result[0] is not None and len(raw_result[0]) == count and \
+            all(_is_recognition(item) for item in raw_result[0]):
+        return list(raw_result[0])
+    if len(raw_result) == count:
+        return [item if _is_recognition(item) else (item[0] if item else None) for item in raw_result]
+    raise RuntimeError(f"Recognizer returned {len(raw_result)} results for {count} crops.")
+
+
+def _is_recognition(item):
+    return isinstance(item, (list, tuple)) and len(item) == 2 and isinstance(item[0], str)
+
+
+class EnginePool:
+    """Lazily builds, shares and evicts engine backends.
+
+    ``memory_budget_bytes`` bounds the summed footprint of pooled backends.  The
+    footprint of each backend is the RSS growth observed while building it
+    (Linux) unless the config declares ``memory_mb`` in its params.  Only
+    backends that no live adapter references are evicted, so the pool may
+    stay above its budget while the engines of running jobs are in use.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._builders: Dict[str, Callable[[Mapping[str, Any]], Any]] = {}
+        self._adapters: Dict[str, Callable[[str, float, _PooledInstance], EngineAdapter]] = {}
+        self._instances: "OrderedDict[Tuple, _PooledInstance]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.builds = 0
+        self.evictions = 0
+
+    def register(self, kind, builder, adapter_cls=PaddleOCREngine):
+        """Registers ``builder(params) -> backend`` for configs of ``kind``."""
+        with self._lock:
+            self._builders[kind] = builder
+            self._adapters[kind] = adapter_cls
+
+    def registration(self, kind):
+        """Returns the ``(builder, adapter_cls)`` registered for ``kind``."""
+        with self._lock:
+            if kind not in self._builders:
+                raise RuntimeError(f"Unknown engine kind: {kind}")
+            return self._builders[kind], self._adapters[kind]
+
+    def get(self, config: EngineConfig) -> EngineAdapter:
+        """Returns an adapter for ``config``, building its backend on first use."""
+        instance = self._get_instance(config)
+        adapter = self._adapters[config.kind](config.name, config.weight, instance)
+        adapter.config = config
+        adapter.pool = self
+        instance.adapters.add(adapter)
+        return adapter
+
+    def adapters(self, configs) -> List[EngineAdapter]:
+        return [self.get(config) for config in configs]
+
+    def _get_instance(self, config: EngineConfig) -> _PooledInstance:
+        key = config.instance_key()
+        with self._lock:
+            instance = self._instances.get(key)
+            if instance is None:
+                instance = self._build(config)
+                self._instances[key] = instance
+                self._evict_over_budget(keep=key)
+            self._instances.move_to_end(key)
+            instance.last_used = time.monotonic()
+            return instance
+
+    def _build(self, config: EngineConfig) -> _PooledInstance:
+        builder = self._builders.get(config.kind)
+        if builder is None:
+            raise RuntimeError(f"Unknown engine kind: {config.kind}")
+        params = dict(config.params)
+        declared_mb = params.pop("memory_mb", None)
+        rss_before = current_rss_bytes()
+        backend = builder(params)
+        rss_after = current_rss_bytes()
+        if declared_mb is not None:
+            memory_bytes = int(float(declared_mb) * 1024 * 1024)
+        elif rss_before is not None and rss_after is not None:
+            memory_bytes = max(0, rss_after - rss_before)
+        else:
+            memory_bytes = 0
+        self.builds += 1
+        return _PooledInstance(backend, memory_bytes)
+
+    def _evict_over_budget(self, keep):
+        if self.memory_budget_bytes is None:
+            return
+        for key in list(self._instances.keys()):
+            if self.memory_bytes() <= self.memory_budget_bytes:
+                break
+            if key == keep or len(self._instances[key].adapters):
+                continue
+            del self._instances[key]
+            self.evictions += 1
+
+    def evict_idle(self, keep=()) -> int:
+        """Drops every unreferenced pooled backend whose instance key is not in ``keep``; returns how many."""
+        with self._lock:
+            idle = [key for key, instance in self._instances.items()
+                    if key not in set(keep) and not len(instance.adapters)]
+            for key in idle:
+                del self._instances[key]
+            self.evictions += len(idle)
+            return len(idle)
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(instance.memory_bytes for instance in self._instances.values())
+
+    def reload(self):
+        """Rebuilds every pooled backend; old instances are dropped only after success."""
+        with self._lock:
+            rebuilt = OrderedDict()
+            for key, instance in self._instances.items():
+                kind, params_json = key
+                config = EngineConfig(name=kind, kind=kind, params=json.loads(params_json))
+                rebuilt[key] = self._build(config)
+            self._instances = rebuilt
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._instances)
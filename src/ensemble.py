@@ -0,0 +1,232 @@
+"""Concurrent dispatch of the ensemble engines for one page.
+
+Engines whose inference runs in native code and releases the GIL
+(``releases_gil = True``, e.g. ``PaddleOCREngine``) run on a dedicated thread
+each.  Other engines run in a dedicated single-process pool built from their
+``EngineConfig``, so pure-Python engines do not serialize on the GIL and a hung
+one can be terminated.  The child rebuilds the engine from the builder and
+adapter class registered for its ``kind`` in the parent's pool, so kinds
+registered at runtime work too; with the default ``spawn`` start method both
+must be picklable (module-level functions and classes, not lambdas).
+
+Members whose configs share one pooled backend (same adapter type, ``kind``
+and ``params``; see ``EnginePool``) would only queue on its lock, so the
+backend runs once per page and its lines are handed to each of them.
+
+Every engine shares the same per-page deadline (``timeout`` seconds after
+dispatch).  Engines that miss it are dropped from that page's vote and the
+page continues with the others.  A thread cannot be interrupted, so a thread
+engine whose call is still running counts as timed out on the following
+pages at once, until that call returns.  When no engine answers at all,
+``infer`` raises ``EnsembleTimeoutError`` rather than returning an empty
+page that would be journaled and written as if it were blank.
+"""
+
+import multiprocessing
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.instrumentation import METRICS
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+
+
+class EnsembleTimeoutError(RuntimeError):
+    """Every engine of the ensemble missed the deadline (or is still busy with an earlier page)."""
+
+
+@dataclass
+class EngineTiming:
+    name: str
+    seconds: float
+    status: str
+
+
+def _backend_key(engine):
+    config = getattr(engine, "config", None)
+    if config is None:
+        return None
+    return type(engine), config.instance_key()
+
+
+def _timed_infer(engine, image):
+    started = time.perf_counter()
+    lines = engine.infer(image)
+    return lines, time.perf_counter() - started
+
+
+def _still_busy(timeout):
+    raise FutureTimeoutError()
+
+
+class _ThreadDispatcher:
+    def __init__(self, engine):
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"engine-{engine.name}")
+        self._in_flight = None
+
+    def submit(self, image):
+        if self._in_flight is not None and not self._in_flight.done():
+            # The only worker thread still runs an abandoned call; queueing
+            # behind it would make this page wait for the whole deadline too.
+            return _still_busy
+        future = self._in_flight = self._executor.submit(_timed_infer, self.engine, image)
+        return lambda timeout: future.result(timeout=timeout)
+
+    def abandon(self):
+        # A thread cannot be interrupted; the late result is simply ignored.
+        # The call keeps its image argument (and the pixmap that array
+        # references, see ``pixmap_to_array``) alive until it returns, and
+        # ``submit`` reports the engine busy until then.
+        pass
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+_process_engine = None
+
+
+def _init_process_engine(config, builder, adapter_cls):
+    global _process_engine
+    from src.engines import EnginePool
+    pool = EnginePool()
+    pool.register(config.kind, builder, adapter_cls)
+    _process_engine = pool.get(config)
+
+
+def _process_engine_infer(image):
+    return _timed_infer(_process_engine, image)
+
+
+class _ProcessDispatcher:
+    def __init__(self, engine, mp_context):
+        self.engine = engine
+        self._mp_context = mp_context
+        self._pool = None
+
+    def _initargs(self):
+        config = self.engine.config
+        pool = getattr(self.engine, "pool", None)
+        if pool is None:
+            from src.ocr_poc import ENGINE_POOL
+            pool = ENGINE_POOL
+        initargs = (config,) + tuple(pool.registration(config.kind))
+        if self._mp_context.get_start_method() != "fork":
+            try:
+                pickle.dumps(initargs)
+            except Exception as e:
+                raise RuntimeError(
+                    f"Engine '{self.engine.name}' runs in a separate process, so the builder and adapter "
+                    f"class of kind '{config.kind}' must be picklable (module-level, not lambdas): {e}"
+                ) from e
+        return initargs
+
+    def submit(self, image):
+        if self._pool is None:
+            self._pool = self._mp_context.Pool(
+                processes=1, initializer=_init_process_engine, initargs=self._initargs()
+            )
+        async_result = self._pool.apply_async(_process_engine_infer, (image,))
+        return lambda timeout: async_result.get(timeout=timeout)
+
+    def abandon(self):
+        # Kill the hung engine; the next page starts a fresh process.
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+class EnsembleRunner:
+    """Runs every engine on a page concurrently and collects their LineResults."""
+
+    def __init__(self, engines, timeout: Optional[float] = None, mp_context=None):
+        self.engines = list(engines)
+        self.timeout = timeout
+        mp_context = mp_context or multiprocessing.get_context("spawn")
+        # One dispatcher per distinct backend, with the members it serves.
+        self._dispatchers = []
+        self._members = []
+        shared = {}
+        for engine in self.engines:
+            key = _backend_key(engine)
+            if key is not None and key in shared:
+                self._members[shared[key]].append(engine)
+                continue
+            if key is not None:
+                shared[key] = len(self._dispatchers)
+            if getattr(engine, "releases_gil", False) or getattr(engine, "config", None) is None:
+                self._dispatchers.append(_ThreadDispatcher(engine))
+            else:
+                self._dispatchers.append(_ProcessDispatcher(engine, mp_context))
+            self._members.append([engine])
+        self.total_seconds: Dict[str, float] = {engine.name: 0.0 for engine in self.engines}
+        self.timeouts: Dict[str, int] = {engine.name: 0 for engine in self.engines}
+
+    def infer(self, image) -> Tuple[List[Tuple[object, list]], List[EngineTiming]]:
+        """Returns ``(engine, lines)`` for engines that answered in time, plus per-engine timings.
+
+        Timings are the wall time of each engine's own ``infer`` call (or the
+        time until the deadline for engines that timed out); members sharing a
+        backend report the time of its single call.  Both lists follow the
+        order of ``engines``.  Raises ``EnsembleTimeoutError`` when no engine
+        answered.
+        """
+        started = time.perf_counter()
+        deadline = None if self.timeout is None else started + self.timeout
+        pending = [(dispatcher, dispatcher.submit(image)) for dispatcher in self._dispatchers]
+
+        answers = {}
+        timing_by_engine = {}
+        for (dispatcher, wait_for_result), members in zip(pending, self._members):
+            remaining = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                lines, elapsed = wait_for_result(remaining)
+                status = STATUS_OK
+            except (FutureTimeoutError, multiprocessing.TimeoutError):
+                dispatcher.abandon()
+                lines, elapsed, status = None, time.perf_counter() - started, STATUS_TIMEOUT
+            for index, engine in enumerate(members):
+                timing_by_engine[id(engine)] = EngineTiming(engine.name, elapsed, status)
+                self.total_seconds[engine.name] += elapsed
+                METRICS.record(f"infer.{engine.name}", elapsed)
+                if status == STATUS_TIMEOUT:
+                    self.timeouts[engine.name] += 1
+                    METRICS.count("engine_timeouts")
+                else:
+                    # Each member gets its own line dicts; voting annotates them.
+                    answers[id(engine)] = lines if index == 0 else [dict(line) for line in lines]
+        METRICS.record("infer", time.perf_counter() - started)
+        if self.engines and not answers:
+            raise EnsembleTimeoutError(f"No OCR engine answered within {self.timeout}s: "
+                                       f"{', '.join(engine.name for engine in self.engines)}.")
+        responses = [(engine, answers[id(engine)]) for engine in self.engines if id(engine) in answers]
+        return responses, [timing_by_engine[id(engine)] for engine in self.engines]
+
+    def close(self):
+        for dispatcher in self._dispatchers:
+            dispatcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def format_timings(timings: List[EngineTiming]) -> str:
+    return ", ".join(
+        f"{timing.name}={timing.seconds:.3f}s" + ("" if timing.status == STATUS_OK else f" ({timing.status})")
+        for timing in timings
+    )
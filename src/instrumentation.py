@@ -0,0 +1,323 @@
+"""Per-stage timing and counters of an OCR run.
+
+The pipeline records into the module-level ``METRICS``:
+
+* spans: the wall time of each call of a stage (``render``, ``detect``,
+  ``infer``, ``vote``, ``postprocess``, ``csv_write``, ...).  Sub-stages
+  are named ``stage.part`` (``infer.<engine>`` holds each ensemble
+  member's own time inside ``infer``) and are not bottleneck candidates,
+  since they overlap their parent;
+* page latencies: the time from starting a page to its result rows;
+* counters: pages, lines, cache hits, engine timeouts, ...;
+* memory peaks, once ``track_memory`` is enabled: the process RSS (and,
+  optionally, the tracemalloc peak of Python allocations) sampled at the
+  end of every top-level span, kept per stage, per page and overall with
+  the page and stage that set it.  ``listeners`` receive every sample;
+  ``src.memory_budget`` uses that to react to memory pressure.  Memory
+  tracking is process-wide, but the page a sample is attributed to
+  (``current_page``) is kept per thread, so documents processed by
+  concurrent threads do not mislabel each other's samples.
+
+``summary`` condenses them into throughput, p50/p95 latencies and the
+stage taking the most time; ``write_json`` and ``write_prometheus`` export
+that at the end of a run.  Worker processes record into their own
+``METRICS`` and hand ``snapshot()`` back to the parent, which merges it.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+PROMETHEUS_PREFIX = "ocr"
+QUANTILES = (0.5, 0.95)
+TOP_PAGES = 10
+
+
+def current_rss_bytes():
+    """Resident set size of this process (Linux), ``None`` where it cannot be read."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list (``None`` when empty)."""
+    if not sorted_values:
+        return None
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+def _distribution(values):
+    ordered = sorted(values)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "total_seconds": total,
+        "mean": total / len(ordered) if ordered else None,
+        "p50": percentile(ordered, 0.5),
+        "p95": percentile(ordered, 0.95),
+        "max": ordered[-1] if ordered else None,
+    }
+
+
+class Instrumentation:
+    """Collects spans, page latencies and counters; safe to record from several threads."""
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rss_reader = None
+        self._trace_python = False
+        self.listeners = []
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Starts a new run: clears everything and restarts the wall clock."""
+        with self._lock:
+            self.started = self._clock()
+            self.stages = {}
+            self.page_latencies = []
+            self.counters = {}
+            self.memory = {"rss": {}, "python": {}}
+            self.current_page = None
+
+    @property
+    def current_page(self):
+        """Page the calling thread is working on, used to label memory samples."""
+        return getattr(self._local, "page", None)
+
+    @current_page.setter
+    def current_page(self, page):
+        self._local.page = page
+
+    def track_memory(self, rss_reader=current_rss_bytes, trace_python=False):
+        """Samples memory at the end of every top-level span from now on.
+
+        With ``trace_python`` tracemalloc is started as well (it slows Python
+        allocations down noticeably) and its peak since the previous sample
+        is recorded.
+        """
+        self._rss_reader = rss_reader
+        self._trace_python = trace_python
+        if trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop_memory_tracking(self):
+        if self._trace_python and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._rss_reader = None
+        self._trace_python = False
+        self.listeners = []
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.stages.setdefault(stage, []).append(seconds)
+        if self._rss_reader is not None and "." not in stage:
+            self.sample_memory(stage)
+
+    def sample_memory(self, stage, page=None):
+        """Records the current RSS (and Python peak) for ``stage`` and notifies the listeners."""
+        page = self.current_page if page is None else page
+        rss = self._rss_reader() if self._rss_reader is not None else None
+        python_peak = None
+        if self._trace_python and tracemalloc.is_tracing():
+            python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        with self._lock:
+            for kind, value in (("rss", rss), ("python", python_peak)):
+                if value is not None:
+                    _note_peak(self.memory[kind], value, stage, page)
+        for listener in list(self.listeners):
+            listener(stage, page, rss)
+        return rss
+
+    @contextmanager
+    def span(self, stage):
+        """Records the wall time of the ``with`` body under ``stage``."""
+        started = self._clock()
+        try:
+            yield
+        finally:
+            self.record(stage, self._clock() - started)
+
+    def page_done(self, seconds):
+        with self._lock:
+            self.page_latencies.append(seconds)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Picklable copy of the recorded data (without the wall clock)."""
+        with self._lock:
+            return {
+                "stages": {stage: list(values) for stage, values in self.stages.items()},
+                "page_latencies": list(self.page_latencies),
+                "counters": dict(self.counters),
+                "memory": json.loads(json.dumps(self.memory)),
+            }
+
+    def merge(self, snapshot):
+        """Adds the data of another process's ``snapshot``."""
+        with self._lock:
+            for stage, values in snapshot["stages"].items():
+                self.stages.setdefault(stage, []).extend(values)
+            self.page_latencies.extend(snapshot["page_latencies"])
+            for name, value in snapshot["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            for kind, peaks in snapshot.get("memory", {}).items():
+                _merge_peaks(self.memory.setdefault(kind, {}), peaks)
+
+    def summary(self):
+        """Throughput, latency percentiles, per-stage totals and the bottleneck stage."""
+        snapshot = self.snapshot()
+        wall = self._clock() - self.started
+        stages = {stage: _distribution(values) for stage, values in sorted(snapshot["stages"].items())}
+        top_level = {stage: data for stage, data in stages.items() if "." not in stage}
+        stage_total = sum(data["total_seconds"] for data in top_level.values())
+        for data in top_level.values():
+            data["share"] = data["total_seconds"] / stage_total if stage_total else None
+        pages = snapshot["counters"].get("pages", len(snapshot["page_latencies"]))
+        return {
+            "wall_seconds": wall,
+            "pages": pages,
+            "pages_per_second": pages / wall if wall > 0 else None,
+            "page_latency": _distribution(snapshot["page_latencies"]),
+            "stages": stages,
+            "bottleneck": max(top_level, key=lambda stage: top_level[stage]["total_seconds"]) if top_level else None,
+            "counters": dict(sorted(snapshot["counters"].items())),
+            "memory": {kind: _peak_report(peaks) for kind, peaks in snapshot["memory"].items() if peaks},
+        }
+
+    def write_json(self, path, summary=None):
+        _write_atomically(path, json.dumps(summary or self.summary(), indent=2) + "\n")
+
+    def write_prometheus(self, path, summary=None):
+        """Writes the summary in the Prometheus text exposition format (for the textfile collector)."""
+        summary = summary or self.summary()
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_run_wall_seconds Wall time of the OCR run.",
+            f"# TYPE {p}_run_wall_seconds gauge",
+            f"{p}_run_wall_seconds {summary['wall_seconds']:.6f}",
+            f"# HELP {p}_pages_per_second Pages completed per second of wall time.",
+            f"# TYPE {p}_pages_per_second gauge",
+            f"{p}_pages_per_second {summary['pages_per_second'] or 0:.6f}",
+            f"# HELP {p}_page_latency_seconds Time from starting a page to its result rows.",
+            f"# TYPE {p}_page_latency_seconds summary",
+        ]
+        lines += _summary_lines(f"{p}_page_latency_seconds", "", summary["page_latency"])
+        lines += [
+            f"# HELP {p}_stage_seconds Wall time per pipeline stage call.",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, data in summary["stages"].items():
+            lines += _summary_lines(f"{p}_stage_seconds", f'stage="{_escape(stage)}"', data)
+        for name, value in summary["counters"].items():
+            metric = f"{p}_{_metric_name(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for kind, report in summary.get("memory", {}).items():
+            metric = f"{p}_{kind}_peak_bytes"
+            lines += [f"# HELP {metric} Peak {kind} memory sampled at the end of each stage.",
+                      f"# TYPE {metric} gauge", f"{metric} {report['peak_bytes']}"]
+            lines += [f'{metric}{{stage="{_escape(stage)}"}} {value}' for stage, value in report["stages"].items()]
+        _write_atomically(path, "\n".join(lines) + "\n")
+
+
+def _note_peak(peaks, value, stage, page):
+    if value > peaks.get("peak_bytes", -1):
+        peaks.update(peak_bytes=value, peak_stage=stage, peak_page=page)
+    stages = peaks.setdefault("stages", {})
+    stages[stage] = max(stages.get(stage, 0), value)
+    if page is not None:
+        pages = peaks.setdefault("pages", {})
+        # JSON object keys are strings; keep them so snapshots survive a round trip.
+        pages[str(page)] = max(pages.get(str(page), 0), value)
+
+
+def _merge_peaks(peaks, other):
+    if not other:
+        return
+    if other["peak_bytes"] > peaks.get("peak_bytes", -1):
+        peaks.update(peak_bytes=other["peak_bytes"], peak_stage=other["peak_stage"], peak_page=other["peak_page"])
+    for section in ("stages", "pages"):
+        merged = peaks.setdefault(section, {})
+        for key, value in other.get(section, {}).items():
+            merged[key] = max(merged.get(key, 0), value)
+
+
+def _peak_report(peaks):
+    """The overall peak with its page and stage, per-stage peaks and the pages with the highest peaks."""
+    pages = sorted(peaks.get("pages", {}).items(), key=lambda item: item[1], reverse=True)[:TOP_PAGES]
+    peak_page = peaks["peak_page"]
+    return {
+        "peak_bytes": peaks["peak_bytes"],
+        # Pages are reported 1-based, as in the CSV.
+        "peak_page": None if peak_page is None else peak_page + 1,
+        "peak_stage": peaks["peak_stage"],
+        "stages": dict(sorted(peaks.get("stages", {}).items())),
+        "top_pages": {str(int(page) + 1): value for page, value in pages},
+    }
+
+
+def _summary_lines(metric, labels, data):
+    separator = "," if labels else ""
+    lines = []
+    for quantile in QUANTILES:
+        value = data[f"p{int(quantile * 100)}"]
+        if value is not None:
+            lines.append(f'{metric}{{{labels}{separator}quantile="{quantile}"}} {value:.6f}')
+    braces = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{braces} {data['total_seconds']:.6f}")
+    lines.append(f"{metric}_count{braces} {data['count']}")
+    return lines
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name):
+    return "".join(char if char.isalnum() or char == "_" else "_" for char in name)
+
+
+def _write_atomically(path, text):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+def default_metrics_path(csv_path):
+    """JSON metrics path next to ``csv_path``; the Prometheus file uses the same stem with ``.prom``."""
+    return os.path.splitext(csv_path)[0] + "_metrics.json"
+
+
+def prometheus_path(metrics_path):
+    return os.path.splitext(metrics_path)[0] + ".prom"
+
+
+def export_metrics(metrics_path, instrumentation=None, extra=None):
+    """Writes the JSON summary to ``metrics_path`` and the Prometheus file next to it; returns the summary.
+
+    ``extra`` sections are added to the JSON summary.
+    """
+    instrumentation = instrumentation or METRICS
+    summary = instrumentation.summary()
+    summary.update(extra or {})
+    instrumentation.write_json(metrics_path, summary)
+    instrumentation.write_prometheus(prometheus_path(metrics_path), summary)
+    return summary
+
+
+METRICS = Instrumentation()
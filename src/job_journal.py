@@ -0,0 +1,128 @@
+"""Append-only per-page journal that makes OCR jobs resumable.
+
+Every line of the journal is ``<crc32 hex> <json>``.  The first record
+identifies the job (input file digest and OCR settings); each following
+record holds one completed page and its result rows, flagged when they were
+taken from the PDF's own text layer.  Records are flushed and
+fsynced as soon as a page completes.
+
+A process killed mid-write can only leave a torn last line.  Opening the
+journal verifies each record's checksum and truncates the file after the last
+intact record, so the journal always describes a prefix of finished pages.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _encode_record(record):
+    payload = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n".encode('utf-8')
+
+
+def _decode_record(line):
+    try:
+        text = line.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    if not text.endswith("\n") or len(text) < 10 or text[8] != " ":
+        return None
+    checksum, payload = text[:8], text[9:-1]
+    if f"{zlib.crc32(payload.encode('utf-8')):08x}" != checksum:
+        return None
+    try:
+        return json.loads(payload)
+    except json.JSONDecodeError:
+        return None
+
+
+class JobJournal:
+    """Records completed pages of one OCR job.
+
+    ``job`` is a JSON-serializable description of the job.  With
+    ``resume=True`` an existing journal for the same job is loaded and
+    extended; a journal written for a different job raises ``RuntimeError``.
+    Without ``resume`` any existing journal is replaced.
+
+    ``pages`` holds the rows of the pages loaded on resume; pages recorded
+    by this run are only written to disk and tracked in ``done``, so memory
+    does not grow with the document.  ``text_layer_pages`` lists the pages
+    whose rows came from the PDF's text layer.
+    """
+
+    def __init__(self, path, job, resume=False):
+        self.path = path
+        # Round-trip so the comparison with a loaded header is type-exact.
+        self.job = json.loads(json.dumps(job))
+        self.pages = {}
+        self.done = set()
+        self.text_layer_pages = set()
+        if resume and os.path.exists(path):
+            self._load()
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._append({"job": job})
+
+    def _load(self):
+        valid_length = 0
+        job = None
+        with open(self.path, 'rb') as f:
+            for line in f:
+                record = _decode_record(line)
+                if record is None:
+                    break
+                if job is None:
+                    job = record.get("job")
+                    if job != self.job:
+                        raise RuntimeError(
+                            f"Journal {self.path} belongs to a different job or settings; "
+                            "rerun without --resume to start over."
+                        )
+                else:
+                    self.pages[record["page"]] = record["rows"]
+                    self.done.add(record["page"])
+                    if record.get("text_layer"):
+                        self.text_layer_pages.add(record["page"])
+                valid_length += len(line)
+        if job is None:
+            # Not even the header survived: start a fresh journal.
+            with open(self.path, 'wb') as f:
+                f.write(_encode_record({"job": self.job}))
+            return
+        with open(self.path, 'r+b') as f:
+            f.truncate(valid_length)
+
+    def _append(self, record):
+        self._file.write(_encode_record(record))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def record_page(self, page_num, page_results, text_layer=False):
+        record = {"page": page_num, "rows": page_results}
+        if text_layer:
+            record["text_layer"] = True
+            self.text_layer_pages.add(page_num)
+        self._append(record)
+        self.done.add(page_num)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    def remove(self):
+        """Deletes the journal once the job's outputs are complete."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,145 @@
+"""Memory budget mode: reacts to RSS samples before the process runs out of memory.
+
+``MemoryBudget`` listens to the memory samples ``METRICS`` takes at the end
+of every pipeline stage (see ``src.instrumentation``).  Once the RSS reaches
+``high_water`` of the budget it runs the registered reliefs in order until
+the RSS is back below that mark:
+
+* ``gc``: a full garbage collection;
+* ``mupdf_store``: empties MuPDF's resource store (decoded images, fonts);
+* ``engine_pool``: evicts pooled engines the running job does not use;
+* ``lm_cache`` / ``page_digests``: drops language-model score caches and
+  cached content-stream digests;
+* ``recognition_batch``: halves the recognition batch size and the pages
+  kept in flight (``RecognitionBatcher.shrink``).
+
+Reliefs run at most once per ``cooldown`` seconds.  Every relief that freed
+something is listed in ``adaptations``; the peaks themselves (with the page
+and stage that set them) are part of the run's metrics summary.
+"""
+
+import gc
+import logging
+import re
+import time
+
+from src.instrumentation import METRICS, current_rss_bytes
+
+DEFAULT_HIGH_WATER = 0.85
+DEFAULT_COOLDOWN = 1.0
+_SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*$", re.IGNORECASE)
+_SIZE_UNITS = {"": 1024 ** 2, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_memory_size(text):
+    """Bytes of ``"8G"``, ``"512M"``, ``"1.5GiB"``; a plain number is in megabytes."""
+    match = _SIZE_PATTERN.match(str(text))
+    if not match:
+        raise RuntimeError(f"Invalid memory size: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def split_memory_budget(budget_bytes, workers, reserved_bytes=None):
+    """Per-worker share of ``budget_bytes`` once ``reserved_bytes`` is set aside.
+
+    ``reserved_bytes`` defaults to the RSS of the calling (parent) process,
+    which stays resident next to its workers.  Raises ``RuntimeError`` when
+    nothing would be left for the workers.
+    """
+    if reserved_bytes is None:
+        reserved_bytes = current_rss_bytes() or 0
+    share = (budget_bytes - reserved_bytes) // max(1, workers)
+    if share <= 0:
+        raise RuntimeError(f"Memory budget of {budget_bytes / 2 ** 20:.0f} MB leaves nothing for "
+                           f"{workers} workers after the parent's {reserved_bytes / 2 ** 20:.0f} MB.")
+    return share
+
+
+class MemoryBudget:
+    """Runs the registered reliefs when the sampled RSS nears ``budget_bytes``."""
+
+    def __init__(self, budget_bytes, high_water=DEFAULT_HIGH_WATER, cooldown=DEFAULT_COOLDOWN,
+                 rss_reader=current_rss_bytes, clock=time.monotonic):
+        self.budget_bytes = budget_bytes
+        self.high_water = high_water
+        self.cooldown = cooldown
+        self._rss_reader = rss_reader
+        self._clock = clock
+        self._reliefs = {}
+        self._last_relief = None
+        self.adaptations = []
+        self.over_budget = 0
+
+    @property
+    def high_water_bytes(self):
+        return int(self.budget_bytes * self.high_water)
+
+    def register(self, name, relieve):
+        """Adds ``relieve() -> bool`` (True when it freed or shrank something); later names run later."""
+        self._reliefs[name] = relieve
+
+    def unregister(self, name):
+        self._reliefs.pop(name, None)
+
+    def attach(self, instrumentation=METRICS, trace_python=False):
+        """Starts memory sampling on ``instrumentation`` and listens to it."""
+        instrumentation.track_memory(self._rss_reader, trace_python)
+        instrumentation.listeners.append(self.check)
+
+    def check(self, stage, page, rss):
+        """Listener for memory samples; relieves pressure when ``rss`` is above the high-water mark."""
+        if rss is None or rss < self.high_water_bytes:
+            return
+        if rss > self.budget_bytes:
+            self.over_budget += 1
+            METRICS.count("memory_over_budget")
+        now = self._clock()
+        if self._last_relief is not None and now - self._last_relief < self.cooldown:
+            return
+        self._last_relief = now
+        for name, relieve in list(self._reliefs.items()):
+            if not relieve():
+                continue
+            after = self._rss_reader()
+            self.adaptations.append({"action": name, "stage": stage,
+                                     "page": None if page is None else page + 1,
+                                     "rss_before": rss, "rss_after": after})
+            METRICS.count(f"memory_relief_{name}")
+            logger.info("Memory at %.0f MB of %.0f MB after %s (page %s): %s",
+                        rss / 2 ** 20, self.budget_bytes / 2 ** 20, stage,
+                        "-" if page is None else page + 1, name)
+            if after is not None and after < self.high_water_bytes:
+                return
+            rss = after if after is not None else rss
+        if rss > self.budget_bytes:
+            logger.warning("Memory %.0f MB exceeds the budget of %.0f MB and nothing is left to release.",
+                           rss / 2 ** 20, self.budget_bytes / 2 ** 20)
+
+    def report(self):
+        return {"budget_bytes": self.budget_bytes, "high_water_bytes": self.high_water_bytes,
+                "over_budget_samples": self.over_budget, "adaptations": list(self.adaptations)}
+
+
+def collect_garbage():
+    return gc.collect() > 0
+
+
+def register_default_reliefs(budget, fitz=None, engine_pool=None, engines=(), corrector=None):
+    """Registers the process-wide reliefs: gc, MuPDF store, idle engines, LM caches."""
+    budget.register("gc", collect_garbage)
+    if fitz is not None:
+        def shrink_mupdf_store():
+            cached = fitz.TOOLS.store_size
+            fitz.TOOLS.store_shrink(100)
+            return cached > 0
+        budget.register("mupdf_store", shrink_mupdf_store)
+    if engine_pool is not None:
+        keep = [engine.config.instance_key() for engine in engines if getattr(engine, "config", None)]
+
+        def evict_idle_engines():
+            return engine_pool.evict_idle(keep) > 0
+        budget.register("engine_pool", evict_idle_engines)
+    if corrector is not None:
+        budget.register("lm_cache", corrector.clear_caches)
@@ -0,0 +1,61 @@
+"""Multi-resolution rendering: detect lines cheaply, recognize them sharply.
+
+Handwriting needs far more than 72 dpi to be recognized, but rendering whole
+pages at 300+ dpi is slow and memory-heavy while most of the raster is blank
+paper.  ``render_line_crops`` therefore runs the detector (PaddleOCR's DB
+model) on a low-resolution render, then re-renders only the detected line
+regions at the recognition DPI through PyMuPDF clip rectangles.  The crops are
+handed to the engines as a ``CropBatch`` whose boxes are already mapped back
+to page coordinates at the recognition DPI, so the result rows look exactly
+like those of a full-page render at that DPI.
+"""
+
+from src.engines import CropBatch
+
+# Padding around a detected line, as a fraction of its height (and at least
+# ``MIN_MARGIN_POINTS``), so glyph edges cut by the coarse box are kept.
+MARGIN_RATIO = 0.15
+MIN_MARGIN_POINTS = 2.0
+
+
+def select_detector(engines):
+    """Returns the highest-weight engine that can run detection alone."""
+    detectors = [engine for engine in engines if hasattr(engine, "detect")]
+    if not detectors:
+        raise RuntimeError("Multi-resolution rendering needs an engine with a line detector.")
+    return max(detectors, key=lambda engine: engine.weight)
+
+
+def _reading_order(box):
+    return (min(point[1] for point in box), min(point[0] for point in box))
+
+
+def render_line_crops(page, detector, detect_dpi, dpi, to_array, matrix_for_dpi):
+    """Detects lines of ``page`` at ``detect_dpi`` and renders them at ``dpi``.
+
+    ``to_array`` converts a pixmap to an engine image and ``matrix_for_dpi``
+    builds the PyMuPDF render matrix; both come from the caller so this
+    module does not depend on the optional imaging packages.
+    """
+    detect_pix = page.get_pixmap(matrix=matrix_for_dpi(detect_dpi), alpha=False)
+    boxes = detector.detect(to_array(detect_pix))
+    del detect_pix
+
+    to_points = 72.0 / detect_dpi
+    to_output = dpi / detect_dpi
+    page_x0, page_y0, page_x1, page_y1 = tuple(page.rect)
+    recognition_matrix = matrix_for_dpi(dpi)
+    crops, page_boxes, pixmaps = [], [], []
+    for box in sorted(boxes, key=_reading_order):
+        xs = [point[0] * to_points for point in box]
+        ys = [point[1] * to_points for point in box]
+        margin = max(MIN_MARGIN_POINTS, MARGIN_RATIO * (max(ys) - min(ys)))
+        clip = (max(page_x0, min(xs) - margin), max(page_y0, min(ys) - margin),
+                min(page_x1, max(xs) + margin), min(page_y1, max(ys) + margin))
+        if clip[2] <= clip[0] or clip[3] <= clip[1]:
+            continue
+        pix = page.get_pixmap(matrix=recognition_matrix, clip=clip, alpha=False)
+        pixmaps.append(pix)
+        crops.append(to_array(pix))
+        page_boxes.append(tuple((x * to_output, y * to_output) for x, y in box))
+    return CropBatch(crops, page_boxes, keepalive=pixmaps)
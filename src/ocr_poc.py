@@ -1,7 +1,12 @@
 import argparse
+import contextlib
 import csv
+import functools
+import logging
+import multiprocessing
 import os
 import re
+import time
 import unicodedata
 
 try:
@@ -9,12 +14,44 @@ try:
 except ImportError:  # pragma: no cover - optional dependency during tests
     fitz = None
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency during tests
+    np = None
+
 try:
     from paddleocr import PaddleOCR
 except ImportError:  # pragma: no cover - optional dependency during tests
     PaddleOCR = None
 
-from scripts.kenlm_corrector import KenLMCorrector
+from scripts.columnar_results import ColumnarResultWriter, default_columnar_path
+from scripts.kenlm_corrector import DEFAULT_TAU, KenLMCorrector
+from src.batching import DEFAULT_MAX_LATENCY, RecognitionBatcher
+from src.engines import CropBatch, EngineConfig, EnginePool, load_engine_configs
+from src.ensemble import EnsembleRunner, format_timings
+from src.instrumentation import METRICS, default_metrics_path, export_metrics
+from src.job_journal import JobJournal, file_digest
+from src.memory_budget import MemoryBudget, parse_memory_size, register_default_reliefs, split_memory_budget
+from src.multires import render_line_crops, select_detector
+from src.pdf_overlay import DEFAULT_HIGHLIGHT_BELOW, PdfOverlayWriter, default_pdf_path
+from src.result_cache import (
+    DEFAULT_CACHE_PATH,
+    DEFAULT_CACHE_SIZE_MB,
+    ResultCache,
+    ensemble_cache_key,
+    page_fingerprint,
+)
+from src.text_layer import (
+    ROUTE_MIXED,
+    ROUTE_OCR,
+    ROUTE_TEXT,
+    classify_page,
+    rows_in_regions,
+    write_route_report,
+)
+from src.voting import WeightedVotingAggregator
+
+logger = logging.getLogger(__name__)
 
 
 _CJK_CHAR_RANGES = "\u3040-\u30FF\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF\uFF66-\uFF9F"
@@ -23,8 +60,12 @@ _NO_SPACE_EAW = {"F", "W"}
 _ADDITIONAL_NO_SPACE_CHARS = {"…", "‥", "―", "—"}
 
 
+@functools.lru_cache(maxsize=None)
 def _is_cjk_like(char: str) -> bool:
-    """Return True when the character belongs to scripts that do not use inter-word spacing."""
+    """Return True when the character belongs to scripts that do not use inter-word spacing.
+
+    Results are cached per character, so each code point is classified once.
+    """
     if not char:
         return False
     if _CJK_CHAR_PATTERN.match(char):
@@ -36,212 +77,1080 @@ def _is_cjk_like(char: str) -> bool:
     return False
 
 
+_SPACE_RUN_PATTERN = re.compile("[ \u3000]+")
+_LINE_SEPARATOR = "\n"
+_TABLE_LIMIT = 0x10000  # the classification table covers the Basic Multilingual Plane
+
+
+@functools.lru_cache(maxsize=None)
+def _cjk_space_pattern():
+    """Regex that deletes space runs between two CJK-like BMP characters.
+
+    The character class is built once from a code-point classification table
+    equivalent to ``_is_cjk_like``, so the substitution runs entirely inside
+    the regex engine.
+    """
+    east_asian_width = unicodedata.east_asian_width
+    ranges = []
+    start = None
+    for code_point in range(_TABLE_LIMIT + 1):
+        # U+3000 is full width but counts as a space, never as a neighbour.
+        wide = (code_point < _TABLE_LIMIT and code_point != 0x3000
+                and east_asian_width(chr(code_point)) in _NO_SPACE_EAW)
+        if wide and start is None:
+            start = code_point
+        elif not wide and start is not None:
+            ranges.append(f"{re.escape(chr(start))}-{re.escape(chr(code_point - 1))}")
+            start = None
+    extra = "".join(re.escape(char) for char in sorted(_ADDITIONAL_NO_SPACE_CHARS))
+    char_class = f"[{_CJK_CHAR_RANGES}{''.join(ranges)}{extra}]"
+    return re.compile(f"(?<={char_class})[ \u3000]+(?={char_class})")
+
+
+def _drop_cjk_space_run(match) -> str:
+    text = match.string
+    start, end = match.span()
+    prev_char = text[start - 1] if start else ""
+    next_char = text[end] if end < len(text) else ""
+    if _is_cjk_like(prev_char) and _is_cjk_like(next_char):
+        return ""
+    return match.group()
+
+
 def _remove_redundant_cjk_spaces(text: str) -> str:
-    """Collapse spaces that were artificially inserted between consecutive CJK characters."""
-    if not text:
+    """Collapse spaces that were artificially inserted between consecutive CJK characters.
+
+    Each run of spaces is visited once and dropped when the characters on both
+    sides of the run are CJK-like.
+    """
+    if not text or (" " not in text and "\u3000" not in text):
         return text
-    cleaned_chars = []
-    length = len(text)
-    for index, char in enumerate(text):
-        if char in (" ", "\u3000"):
-            prev_char = ""
-            next_char = ""
-
-            for rev_index in range(index - 1, -1, -1):
-                candidate = text[rev_index]
-                if candidate not in (" ", "\u3000"):
-                    prev_char = candidate
-                    break
-
-            for fwd_index in range(index + 1, length):
-                candidate = text[fwd_index]
-                if candidate not in (" ", "\u3000"):
-                    next_char = candidate
-                    break
-
-            if _is_cjk_like(prev_char) and _is_cjk_like(next_char):
-                continue
-        cleaned_chars.append(char)
-    return "".join(cleaned_chars)
+    if max(text) < chr(_TABLE_LIMIT):
+        return _cjk_space_pattern().sub("", text)
+    return _SPACE_RUN_PATTERN.sub(_drop_cjk_space_run, text)
+
+
+def _remove_redundant_cjk_spaces_batch(texts):
+    """Applies ``_remove_redundant_cjk_spaces`` to every text of a page in one pass."""
+    texts = list(texts)
+    # A line separator is neither a space nor CJK-like, so runs never merge
+    # across lines and each line keeps its own boundaries.
+    joined = _LINE_SEPARATOR.join(texts)
+    parts = _remove_redundant_cjk_spaces(joined).split(_LINE_SEPARATOR)
+    if len(parts) != len(texts):
+        return [_remove_redundant_cjk_spaces(text) for text in texts]
+    return parts
+
+def _require_fitz(caller):
+    if fitz is None:
+        raise RuntimeError(f"PyMuPDF (fitz) is required for {caller} but is not installed.")
+
 
-def pdf_to_images(pdf_path, output_folder="temp_images"):
+def _render_matrix(dpi):
+    zoom = dpi / 72.0
+    return fitz.Matrix(zoom, zoom)
+
+
+def save_page_image(pix, output_folder, page_index):
+    """Debug sink: writes a rendered page as ``page_<n>.png`` and returns its path."""
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    img_path = os.path.join(output_folder, f"page_{page_index+1}.png")
+    pix.save(img_path)
+    return img_path
+
+
+class _PixmapSamples:
+    """Array base that keeps the pixmap owning the samples alive."""
+
+    def __init__(self, pix, array):
+        self.pixmap = pix
+        self.__array_interface__ = array.__array_interface__
+
+
+def pixmap_to_array(pix):
+    """Wraps ``Pixmap.samples`` in an ``(height, width, channels)`` uint8 array without copying.
+
+    Color pixmaps are returned in BGR order, as PaddleOCR expects (the
+    channel swap is a reversed-stride view, not a copy).  The array shares
+    memory with ``pix`` and references it, so the pixmap is not freed while
+    the array or any view of it is in use, e.g. by an engine thread that
+    missed its deadline.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required for in-memory page images but is not installed.")
+    samples = getattr(pix, "samples_mv", None)
+    if samples is None:
+        samples = pix.samples
+    array = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    array = np.asarray(_PixmapSamples(pix, array))
+    return array[..., ::-1] if pix.n == 3 else array
+
+
+def iter_page_images(pdf_path, dpi=72, debug_folder=None):
+    """Yields ``(page_index, image)`` for each page, rendered straight into memory.
+
+    ``image`` is a BGR array built on the pixmap buffer (see ``pixmap_to_array``);
+    nothing is encoded or written unless ``debug_folder`` is given.  Each array
+    keeps its pixmap alive for as long as it is referenced.
+    """
+    logger.debug("Starting iter_page_images for %s", pdf_path)
+    _require_fitz("iter_page_images")
+
+    doc = fitz.open(pdf_path)
+    try:
+        logger.info("PDF has %d pages.", len(doc))
+        matrix = _render_matrix(dpi)
+        for i in range(len(doc)):
+            METRICS.current_page = i
+            with METRICS.span("render"):
+                page = doc.load_page(i)
+                pix = page.get_pixmap(matrix=matrix, alpha=False)
+                if debug_folder:
+                    save_page_image(pix, debug_folder, i)
+            yield i, pixmap_to_array(pix)
+            del pix
+    finally:
+        doc.close()
+
+def pdf_to_images(pdf_path, output_folder="temp_images", dpi=72):
     """Converts each page of a PDF into an image."""
-    print(f"DEBUG: Starting pdf_to_images for {pdf_path}")
+    logger.debug("Starting pdf_to_images for %s", pdf_path)
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    if fitz is None:
-        raise RuntimeError("PyMuPDF (fitz) is required for pdf_to_images but is not installed.")
+    _require_fitz("pdf_to_images")
 
     doc = fitz.open(pdf_path)
-    print(f"PDF has {len(doc)} pages.")
+    logger.info("PDF has %d pages.", len(doc))
     image_paths = []
+    matrix = _render_matrix(dpi)
     for i in range(len(doc)):
-        page = doc.load_page(i)
-        pix = page.get_pixmap()
-        img_path = os.path.join(output_folder, f"page_{i+1}.png")
-        pix.save(img_path)
-        image_paths.append(img_path)
+        METRICS.current_page = i
+        with METRICS.span("render"):
+            page = doc.load_page(i)
+            pix = page.get_pixmap(matrix=matrix)
+            image_paths.append(save_page_image(pix, output_folder, i))
     doc.close()
     return image_paths
 
-def run_ocr(image_paths, output_csv_path=None):
-    """Runs OCR on a list of image paths and returns the structured results."""
-    # Initialize multiple OCR engines for ensemble voting
+def _build_paddleocr(params):
     if PaddleOCR is None:
         raise RuntimeError("PaddleOCR is required for run_ocr but is not installed.")
+    return PaddleOCR(**params)
+
+
+_PADDLE_PARAMS = {'use_angle_cls': True, 'lang': 'japan', 'det_algorithm': 'DB++'}
+
+# All three members currently point at the same model, so the pool builds a
+# single PaddleOCR instance for them.
+DEFAULT_ENGINE_CONFIGS = [
+    EngineConfig(name='paddleocr', weight=1.0, params=_PADDLE_PARAMS),
+    EngineConfig(name='paddleocr_2', weight=1.0, params=_PADDLE_PARAMS), # Placeholder for another engine (e.g., Tesseract)
+    EngineConfig(name='paddleocr_3', weight=1.0, params=_PADDLE_PARAMS), # Placeholder for a third engine (e.g., Mistral-OCR LoRA)
+]
+
+ENGINE_POOL = EnginePool()
+ENGINE_POOL.register('paddleocr', _build_paddleocr)
+
+
+def create_ocr_engines(engine_configs=None, pool=None, reload=False):
+    """Returns the ensemble's engine adapters, built lazily through the engine pool.
+
+    Callers that process many documents (e.g. the warm worker in
+    ``src/ocr_worker.py``) fetch the engines once and pass them to ``run_ocr``.
+    ``reload=True`` rebuilds the pooled backends first.
+    """
+    pool = pool or ENGINE_POOL
+    if reload:
+        pool.reload()
+    return pool.adapters(engine_configs or DEFAULT_ENGINE_CONFIGS)
+
+VOTING_AGGREGATOR = WeightedVotingAggregator()
+
+def ocr_page(page_num, image, ensemble, page_label=None, aggregator=None, corrector=None):
+    """Runs the ensemble on one page image and returns its result rows.
+
+    ``ensemble`` is an ``EnsembleRunner``.  ``page_num`` is the 0-based page
+    index stored in each row; ``block_id`` restarts at 0 on every page.
+    ``aggregator`` defaults to the shared ``WeightedVotingAggregator``;
+    ``corrector`` is an optional ``KenLMCorrector``.
+    """
+    page_label = page_label or f"page {page_num + 1}"
+    logger.debug("Processing %s", page_label)
+
+    # Get results from each engine concurrently; engines that miss the
+    # deadline are left out of the vote.
+    responses, timings = ensemble.infer(image)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Engine wall times for %s: %s", page_label, format_timings(timings))
+    return vote_page(page_num, responses, page_label, aggregator, corrector)
+
+def vote_page(page_num, responses, page_label=None, aggregator=None, corrector=None):
+    """Votes the ``(engine, lines)`` responses of one page into result rows."""
+    page_label = page_label or f"page {page_num + 1}"
+
+    # Ensemble Voting (Weighted Voting Fusion): lines are aligned across
+    # engines by box overlap and the highest normalized, weighted confidence
+    # wins; the losing candidates are kept as alternatives.
+    with METRICS.span("vote"):
+        final_result_for_page = (aggregator or VOTING_AGGREGATOR).aggregate(responses)
+
+    if not final_result_for_page:
+        logger.debug("No valid OCR results found for %s", page_label)
+        return []
+
+    with METRICS.span("postprocess"):
+        return _rows_from_lines(page_num, final_result_for_page, corrector)
+
+def _apply_corrections(lines, corrector):
+    """Swaps in the alternatives a ``KenLMCorrector`` prefers (SDD 5.3).
+
+    The replaced text becomes the first alternative, so no candidate is lost.
+    """
+    choices = corrector.choose_batch(
+        (line['text'], [alternative['text'] for alternative in line.get('alternatives', ())])
+        for line in lines
+    )
+    corrected = []
+    for line, choice in zip(lines, choices):
+        if choice:
+            METRICS.count("lm_corrections")
+            alternatives = list(line['alternatives'])
+            chosen = alternatives.pop(choice - 1)
+            former = {'text': line['text'], 'confidence': line['confidence'], 'engine': line.get('engine')}
+            line = dict(line, text=chosen['text'], confidence=chosen['confidence'],
+                        engine=chosen.get('engine'), alternatives=[former] + alternatives)
+        corrected.append(line)
+    return corrected
+
+def _rows_from_lines(page_num, lines, corrector=None):
+    """Converts LineResults to result rows; ``block_id`` restarts at 0.
+
+    With a ``KenLMCorrector`` each line's text is first rescored against its
+    alternatives.
+    """
+    page_results = []
+    block_id = 0
+    if corrector is not None:
+        lines = _apply_corrections(lines, corrector)
+    cleaned = iter(_remove_redundant_cjk_spaces_batch(
+        text
+        for line in lines
+        for text in [line['text']] + [alternative['text'] for alternative in line.get('alternatives', ())]
+    ))
+    trace = logger.isEnabledFor(logging.DEBUG)
+    for line in lines:
+        bbox = line['bbox']
+        text = line['text']
+        confidence = line['confidence']
+
+        corrected_text = next(cleaned)
+        if trace:
+            logger.debug("Original text: %s, Corrected text: %s", text, corrected_text)
+
+        # Convert bbox to x0, y0, x1, y1 format
+        x_coords = [p[0] for p in bbox]
+        y_coords = [p[1] for p in bbox]
+        x0, y0 = min(x_coords), min(y_coords)
+        x1, y1 = max(x_coords), max(y_coords)
+
+        page_results.append({
+            'page': page_num,
+            'block_id': block_id,
+            'x0': x0,
+            'y0': y0,
+            'x1': x1,
+            'y1': y1,
+            'text': corrected_text,
+            'confidence': confidence,
+            'alternatives': [
+                dict(alternative, text=next(cleaned))
+                for alternative in line.get('alternatives', ())
+            ],
+        })
+        # IoU Check Framework (Placeholder)
+        # In a real scenario, you would compare the detected bbox with a ground truth bbox
+        # and calculate IoU here.
+        # Example: iou_value = calculate_iou([x0, y0, x1, y1], ground_truth_bbox)
+        # logger.debug("IoU for this bbox: %s", iou_value)
+        block_id += 1
+    return page_results
+
+CSV_FIELDNAMES = ['page', 'block_id', 'x0', 'y0', 'x1', 'y1', 'text', 'confidence']
+
+
+class CsvResultWriter:
+    """Appends result rows to the CSV page by page, flushing after each page.
+
+    Rows keep their 0-based ``page`` in memory; the 1-based page number is
+    written directly, without copying the row dicts.
+    """
+
+    def __init__(self, output_csv_path):
+        self.output_csv_path = output_csv_path
+        self.rows_written = 0
+        self._file = open(output_csv_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(CSV_FIELDNAMES)
+        self._file.flush()
+
+    def write_page(self, page_results):
+        self._writer.writerows(
+            (res['page'] + 1, res['block_id'], res['x0'], res['y0'], res['x1'], res['y1'],
+             res['text'], res['confidence'])
+            for res in page_results
+        )
+        self._file.flush()
+        self.rows_written += len(page_results)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+            logger.info("OCR results saved to %s", self.output_csv_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_results_csv(all_ocr_results, output_csv_path):
+    """Writes result rows to CSV with 1-based page numbers."""
+    with CsvResultWriter(output_csv_path) as writer:
+        writer.write_page(all_ocr_results)
+
+def iter_ocr_results(image_paths, engines=None, engine_timeout=None, corrector=None):
+    """Yields ``(page_num, page_results)`` for each page image as soon as it is recognized.
+
+    ``image_paths`` may hold file paths or in-memory page arrays (for example
+    from ``iter_page_images``); either is passed to the engines unchanged.
+    Pages without any recognized line yield an empty list.
+
+    ``engines`` is a list of ``EngineAdapter``; when omitted, the default
+    ensemble is fetched from the shared engine pool.  The engines of a page run
+    concurrently; one that takes longer than ``engine_timeout`` seconds is
+    dropped from that page's vote.  With a ``KenLMCorrector`` the voted texts
+    are rescored against their alternatives.
+    """
+    if engines is None:
+        engines = create_ocr_engines()
+
+    logger.debug("OCR Engines initialized for ensemble voting.")
+
+    with EnsembleRunner(engines, engine_timeout) as ensemble:
+        for page_num, image in enumerate(image_paths):
+            page_label = image if isinstance(image, str) else None
+            METRICS.current_page = page_num
+            started = time.perf_counter()
+            page_results = ocr_page(page_num, image, ensemble, page_label, corrector=corrector)
+            METRICS.page_done(time.perf_counter() - started)
+            yield page_num, page_results
+        logger.debug("Total engine wall times: %s, timeouts: %s", ensemble.total_seconds, ensemble.timeouts)
+
+def write_pages_csv(page_iterator, output_csv_path):
+    """Passes ``(page_num, page_results)`` through, appending each page to the CSV first."""
+    if not output_csv_path:
+        yield from page_iterator
+        return
+    with CsvResultWriter(output_csv_path) as writer:
+        for page_num, page_results in page_iterator:
+            METRICS.current_page = page_num
+            with METRICS.span("csv_write"):
+                writer.write_page(page_results)
+            yield page_num, page_results
 
-    ocr_engine_1 = PaddleOCR(use_angle_cls=True, lang='japan', det_algorithm='DB++')
-    ocr_engine_2 = PaddleOCR(use_angle_cls=True, lang='japan', det_algorithm='DB++') # Placeholder for another engine (e.g., Tesseract)
-    ocr_engine_3 = PaddleOCR(use_angle_cls=True, lang='japan', det_algorithm='DB++') # Placeholder for a third engine (e.g., Mistral-OCR LoRA)
+def write_pages_pdf(page_iterator, pdf_path, output_pdf_path, dpi=72, highlight_below=DEFAULT_HIGHLIGHT_BELOW,
+                    text_layer_pages=()):
+    """Passes ``(page_num, page_results)`` through, adding each page to the searchable PDF first.
 
-    # Initialize KenLM Corrector within the function
-    # NOTE: KenLM model loading is temporarily commented out due to installation issues.
-    # kenlm_corrector = KenLMCorrector("/path/to/your/kenlm_model.arpa")
+    Pages in ``text_layer_pages`` are already searchable and get no overlay.
+    """
+    if not output_pdf_path:
+        yield from page_iterator
+        return
+    with PdfOverlayWriter(pdf_path, output_pdf_path, dpi, highlight_below) as writer:
+        for page_num, page_results in page_iterator:
+            with METRICS.span("pdf_write"):
+                writer.write_page(page_results, overlay=page_num not in text_layer_pages)
+            yield page_num, page_results
+
+def write_pages_columnar(page_iterator, columnar_path):
+    """Passes ``(page_num, page_results)`` through, adding each page to the columnar file first."""
+    if not columnar_path:
+        yield from page_iterator
+        return
+    with ColumnarResultWriter(columnar_path) as writer:
+        for page_num, page_results in page_iterator:
+            with METRICS.span("columnar_write"):
+                writer.write_page(page_results)
+            yield page_num, page_results
 
-    print("DEBUG: OCR Engines initialized for ensemble voting.")
+def _count_page(page_results):
+    METRICS.count("pages")
+    METRICS.count("lines", len(page_results))
 
+def _collect_results(page_iterator, output_csv_path, columnar_path=None, metrics_path=None):
+    METRICS.reset()
     all_ocr_results = []
-    for page_num, img_path in enumerate(image_paths):
-        print(f"--- Processing {img_path} ---")
-
-        # Get results from each engine
-        result_engine_1 = ocr_engine_1.ocr(img_path, cls=True)
-        result_engine_2 = ocr_engine_2.ocr(img_path, cls=True) # Simulate result from engine 2
-        result_engine_3 = ocr_engine_3.ocr(img_path, cls=True) # Simulate result from engine 3
-
-        # Ensemble Voting (Weighted Voting Fusion)
-        # For simplicity, we'll choose the result with the highest confidence for each line.
-        # In a real scenario, weights would be applied (conf * weight_engine) and then compared.
-        final_result_for_page = []
-        # Assuming results are structured similarly and can be iterated line by line
-        # This is a simplified example and might need more sophisticated alignment for real-world scenarios
-        max_lines = max(len(result_engine_1[0]) if result_engine_1 and result_engine_1[0] else 0,
-                        len(result_engine_2[0]) if result_engine_2 and result_engine_2[0] else 0,
-                        len(result_engine_3[0]) if result_engine_3 and result_engine_3[0] else 0)
-
-        for i in range(max_lines):
-            best_line_info = None
-            best_confidence = -1.0
-
-            # Check engine 1
-            if result_engine_1 and result_engine_1[0] and i < len(result_engine_1[0]):
-                line_info = result_engine_1[0][i]
-                if line_info and len(line_info) == 2 and line_info[1] and len(line_info[1]) == 2:
-                    if line_info[1][1] > best_confidence:
-                        best_confidence = line_info[1][1]
-                        best_line_info = line_info
-
-            # Check engine 2
-            if result_engine_2 and result_engine_2[0] and i < len(result_engine_2[0]):
-                line_info = result_engine_2[0][i]
-                if line_info and len(line_info) == 2 and line_info[1] and len(line_info[1]) == 2:
-                    if line_info[1][1] > best_confidence:
-                        best_confidence = line_info[1][1]
-                        best_line_info = line_info
-
-            # Check engine 3
-            if result_engine_3 and result_engine_3[0] and i < len(result_engine_3[0]):
-                line_info = result_engine_3[0][i]
-                if line_info and len(line_info) == 2 and line_info[1] and len(line_info[1]) == 2:
-                    if line_info[1][1] > best_confidence:
-                        best_confidence = line_info[1][1]
-                        best_line_info = line_info
-            
-            if best_line_info:
-                final_result_for_page.append(best_line_info)
-
-        if not final_result_for_page:
-            print(f"DEBUG: No valid OCR results found for {img_path}")
-            continue
+    page_iterator = write_pages_columnar(page_iterator, columnar_path)
+    for _, page_results in write_pages_csv(page_iterator, output_csv_path):
+        _count_page(page_results)
+        all_ocr_results.extend(page_results)
+    if metrics_path:
+        export_metrics(metrics_path)
+    return all_ocr_results
+
+def run_ocr(image_paths, output_csv_path=None, engines=None, engine_timeout=None, corrector=None,
+            columnar_path=None, metrics_path=None):
+    """Runs OCR on page images and returns the structured results.
+
+    Collects ``iter_ocr_results`` into a single list; rows are appended to
+    ``output_csv_path`` page by page while the run progresses, and to the
+    typed ``columnar_path`` file (see ``scripts.columnar_results``) if given.
+    With ``metrics_path`` the stage timings of the run are exported as JSON
+    there and in the Prometheus text format next to it (see
+    ``src.instrumentation``).
+    """
+    return _collect_results(iter_ocr_results(image_paths, engines, engine_timeout, corrector), output_csv_path,
+                            columnar_path, metrics_path)
+
+class _PdfPageSource:
+    """Renders and OCRs pages of an open document, consulting the result cache first.
+
+    With ``detect_dpi`` lines are detected on a render at that resolution and
+    only their regions are rendered at ``dpi`` for recognition (see
+    ``src.multires``).  ``corrector`` is an optional ``KenLMCorrector``.
+    Under a ``MemoryBudget`` the cached content-stream digests and, while
+    batching, the recognition batch size and pages in flight are given up
+    when memory runs short.
+    """
+
+    def __init__(self, doc, dpi, debug_folder=None, cache=None, settings_key=None, detect_dpi=None,
+                 corrector=None, memory_budget=None):
+        self.doc = doc
+        self.dpi = dpi
+        self.detect_dpi = detect_dpi
+        self.matrix = _render_matrix(dpi)
+        self.debug_folder = debug_folder
+        self.cache = cache
+        self.settings_key = settings_key
+        self.corrector = corrector
+        self.memory_budget = memory_budget
+        self._stream_digests = {}
+        if memory_budget is not None:
+            memory_budget.register("page_digests", self._clear_stream_digests)
+
+    def _clear_stream_digests(self):
+        cached = bool(self._stream_digests)
+        self._stream_digests.clear()
+        return cached
+
+    def ocr(self, page_num, ensemble):
+        METRICS.current_page = page_num
+        started = time.perf_counter()
+        page = self.doc.load_page(page_num)
+        cache_key, cached = self._cached(page, page_num)
+        if cached is not None:
+            METRICS.page_done(time.perf_counter() - started)
+            return cached
+
+        timeouts_before = sum(ensemble.timeouts.values())
+        if self.detect_dpi:
+            crops = self._line_crops(page, page_num, ensemble)
+            page_results = ocr_page(page_num, crops, ensemble, corrector=self.corrector)
+            del crops
+        else:
+            with METRICS.span("render"):
+                pix = page.get_pixmap(matrix=self.matrix, alpha=False)
+                if self.debug_folder:
+                    save_page_image(pix, self.debug_folder, page_num)
+            page_results = ocr_page(page_num, pixmap_to_array(pix), ensemble, corrector=self.corrector)
+            del pix
+
+        # Pages where an engine timed out were voted on partially; do not keep them.
+        if cache_key is not None and sum(ensemble.timeouts.values()) == timeouts_before:
+            self.cache.put(cache_key, page_results)
+        METRICS.page_done(time.perf_counter() - started)
+        return page_results
+
+    def _cached(self, page, page_num):
+        """Returns ``(cache_key, cached rows or None)``; both are ``None`` without a cache."""
+        if self.cache is None:
+            return None, None
+        # The fingerprint only reads the PDF objects, so a hit skips the render too.
+        with METRICS.span("cache_lookup"):
+            cache_key = self.cache.make_key(page_fingerprint(page, self._stream_digests), self.settings_key)
+            cached = self.cache.get(cache_key, page_num)
+        if cached is not None:
+            logger.debug("Page %d: cached result", page_num + 1)
+            METRICS.count("cache_hits")
+        else:
+            METRICS.count("cache_misses")
+        return cache_key, cached
+
+    def _line_crops(self, page, page_num, ensemble):
+        if self.debug_folder:
+            save_page_image(page.get_pixmap(matrix=self.matrix, alpha=False), self.debug_folder, page_num)
+        with METRICS.span("detect"):
+            return render_line_crops(page, select_detector(ensemble.engines), self.detect_dpi or self.dpi,
+                                     self.dpi, pixmap_to_array, _render_matrix)
+
+    def iter_batched(self, page_numbers, ensemble, batch_size, max_latency=DEFAULT_MAX_LATENCY,
+                     max_pending_pages=None):
+        """Yields ``(page_num, page_results)`` in order, recognizing lines across pages.
+
+        Each page is only detected and cropped here; its crops join the
+        size-bucketed batches of a ``RecognitionBatcher`` and the page is
+        voted once all of its lines are recognized.  Cached pages wait for
+        the pages before them, so the output order is unchanged.
+        ``max_pending_pages`` bounds the pages waiting for recognition.
+        """
+        batcher = RecognitionBatcher(ensemble, batch_size, max_latency, max_pending_pages=max_pending_pages)
+        if self.memory_budget is not None:
+            self.memory_budget.register("recognition_batch", batcher.shrink)
+        try:
+            yield from self._batched_pages(batcher, page_numbers, ensemble)
+        finally:
+            if self.memory_budget is not None:
+                self.memory_budget.unregister("recognition_batch")
+        METRICS.count("recognition_batches", batcher.batches)
+        logger.debug("Recognized %d lines in %d batches.", batcher.lines, batcher.batches)
+
+    def _batched_pages(self, batcher, page_numbers, ensemble):
+        for page_num in page_numbers:
+            METRICS.current_page = page_num
+            started = time.perf_counter()
+            page = self.doc.load_page(page_num)
+            cache_key, cached = self._cached(page, page_num)
+            if cached is not None:
+                completed = batcher.add_page(page_num, CropBatch([], []), (cache_key, cached, started))
+            else:
+                crops = self._line_crops(page, page_num, ensemble)
+                completed = batcher.add_page(page_num, crops, (cache_key, None, started))
+                del crops
+            yield from self._vote_batched(completed)
+        yield from self._vote_batched(batcher.flush())
 
-        block_id = 0
-        for line_info in final_result_for_page:
-            # Ensure line_info is in the expected format before processing
-            if not (isinstance(line_info, list) and len(line_info) == 2 and
-                    isinstance(line_info[0], list) and # bbox
-                    isinstance(line_info[1], tuple) and len(line_info[1]) == 2): # (text, confidence)
-                print(f"DEBUG: Skipping malformed line_info: {line_info}")
+    def _vote_batched(self, completed):
+        for page_num, responses, partial, (cache_key, cached, started) in completed:
+            if cached is not None:
+                METRICS.page_done(time.perf_counter() - started)
+                yield page_num, cached
                 continue
+            page_results = vote_page(page_num, responses, corrector=self.corrector)
+            # Partially voted pages are not cached, as in ``ocr``.
+            if cache_key is not None and not partial:
+                self.cache.put(cache_key, page_results)
+            METRICS.page_done(time.perf_counter() - started)
+            yield page_num, page_results
 
-            bbox = line_info[0]
-            text, confidence = line_info[1]
-
-            # KenLM Correction Framework
-            # corrected_text = kenlm_corrector.correct(text) # Temporarily disabled due to kenlm installation issues
-            corrected_text = text # For now, no correction is applied
-            corrected_text = _remove_redundant_cjk_spaces(corrected_text)
-            print(f"DEBUG: Original text: {text}, Corrected text: {corrected_text}")
-
-            # Convert bbox to x0, y0, x1, y1 format
-            x_coords = [p[0] for p in bbox]
-            y_coords = [p[1] for p in bbox]
-            x0, y0 = min(x_coords), min(y_coords)
-            x1, y1 = max(x_coords), max(y_coords)
-
-            all_ocr_results.append({
-                'page': page_num,
-                'block_id': block_id,
-                'x0': x0,
-                'y0': y0,
-                'x1': x1,
-                'y1': y1,
-                'text': corrected_text,
-                'confidence': confidence
-            })
-            # IoU Check Framework (Placeholder)
-            # In a real scenario, you would compare the detected bbox with a ground truth bbox
-            # and calculate IoU here.
-            # Example: iou_value = calculate_iou([x0, y0, x1, y1], ground_truth_bbox)
-            # print(f"DEBUG: IoU for this bbox: {iou_value}")
-            block_id += 1
-    print("\n")
-
-    if output_csv_path:
-        csv_results = []
-        for res in all_ocr_results:
-            csv_res = res.copy()
-            csv_res['page'] = res['page'] + 1
-            csv_results.append(csv_res)
-            
-        with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            fieldnames = ['page', 'block_id', 'x0', 'y0', 'x1', 'y1', 'text', 'confidence']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(csv_results)
-        print(f"OCR results saved to {output_csv_path}")
-        
-    return all_ocr_results
+
+def line_detect_dpi(dpi, detect_dpi=None, rec_batch_size=None):
+    """DPI lines are detected at; batched recognition always works on line crops."""
+    if rec_batch_size and not detect_dpi:
+        return dpi
+    return detect_dpi
+
+
+def iter_pdf_ocr_results(pdf_path, engines=None, dpi=72, debug_folder=None, engine_timeout=None,
+                         cache=None, pages=None, detect_dpi=None, rec_batch_size=None,
+                         rec_max_latency=DEFAULT_MAX_LATENCY, corrector=None, memory_budget=None,
+                         rec_max_pending_pages=None):
+    """Yields ``(page_num, page_results)`` for each page of ``pdf_path``.
+
+    Pages are rendered in memory (see ``iter_page_images``).  With a
+    ``ResultCache``, pages whose content fingerprint, render settings and
+    ensemble configuration were seen before are served from the cache.
+    ``pages`` restricts processing to the given ascending page indices.
+    With ``detect_dpi`` only detected line regions are rendered at ``dpi``.
+    With ``rec_batch_size`` lines are detected page by page and recognized
+    in cross-page batches (see ``src.batching``), holding at most
+    ``rec_max_pending_pages`` pages in flight.  ``corrector`` is an
+    optional ``KenLMCorrector``.  ``memory_budget`` is an optional
+    ``MemoryBudget`` given the page source's reliefs.
+    """
+    _require_fitz("iter_pdf_ocr_results")
+    if engines is None:
+        engines = create_ocr_engines()
+    detect_dpi = line_detect_dpi(dpi, detect_dpi, rec_batch_size)
+    settings_key = ensemble_cache_key(engines, dpi, detect_dpi, corrector) if cache is not None else None
+
+    doc = fitz.open(pdf_path)
+    try:
+        logger.info("PDF has %d pages.", len(doc))
+        source = _PdfPageSource(doc, dpi, debug_folder, cache, settings_key, detect_dpi, corrector,
+                                memory_budget)
+        page_numbers = range(len(doc)) if pages is None else pages
+        with EnsembleRunner(engines, engine_timeout) as ensemble:
+            if rec_batch_size:
+                yield from source.iter_batched(page_numbers, ensemble, rec_batch_size, rec_max_latency,
+                                               rec_max_pending_pages)
+            else:
+                for page_num in page_numbers:
+                    yield page_num, source.ocr(page_num, ensemble)
+    finally:
+        if memory_budget is not None:
+            memory_budget.unregister("page_digests")
+        doc.close()
+
+_THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Per-process state of page workers: the page source (open document, render
+# settings, cache) and the engines are created once by ``_init_page_worker``
+# and reused for every range.
+_page_worker_state = None
+
+
+def _init_page_worker(pdf_path, dpi, engine_configs, debug_folder, engine_timeout,
+                      cache_path=None, cache_max_bytes=None, detect_dpi=None,
+                      rec_batch_size=None, rec_max_latency=DEFAULT_MAX_LATENCY, corrector=None,
+                      memory_budget_bytes=None, trace_python_memory=False):
+    global _page_worker_state
+    _require_fitz("run_ocr_parallel")
+    detect_dpi = line_detect_dpi(dpi, detect_dpi, rec_batch_size)
+    doc = fitz.open(pdf_path)
+    engines = create_ocr_engines(engine_configs)
+    cache = None
+    settings_key = None
+    if cache_path:
+        cache = ResultCache(cache_path, cache_max_bytes)
+        settings_key = ensemble_cache_key(engines, dpi, detect_dpi, corrector)
+    memory_budget = None
+    if memory_budget_bytes:
+        memory_budget = MemoryBudget(memory_budget_bytes)
+        memory_budget.attach(METRICS, trace_python_memory)
+        register_default_reliefs(memory_budget, fitz, ENGINE_POOL, engines, corrector)
+    source = _PdfPageSource(doc, dpi, debug_folder, cache, settings_key, detect_dpi, corrector,
+                            memory_budget)
+    _page_worker_state = (source, EnsembleRunner(engines, engine_timeout), rec_batch_size, rec_max_latency)
+
+
+def _ocr_page_range(page_numbers):
+    """Returns the ``(page_num, page_results)`` of a range and the worker's metrics for it."""
+    source, ensemble, rec_batch_size, rec_max_latency = _page_worker_state
+    METRICS.reset()
+    if rec_batch_size:
+        results = list(source.iter_batched(page_numbers, ensemble, rec_batch_size, rec_max_latency))
+    else:
+        results = [(page_num, source.ocr(page_num, ensemble)) for page_num in page_numbers]
+    return results, METRICS.snapshot()
+
+
+@contextlib.contextmanager
+def _worker_thread_limits(threads):
+    """Sets ``OMP_NUM_THREADS``/``MKL_NUM_THREADS`` (unless set) while worker processes start.
+
+    The workers inherit the environment when they are spawned; restoring it
+    afterwards keeps the limit out of the calling process.
+    """
+    previous = {variable: os.environ.get(variable) for variable in _THREAD_VARIABLES}
+    for variable in _THREAD_VARIABLES:
+        os.environ.setdefault(variable, str(threads))
+    try:
+        yield
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def split_page_ranges(page_count, workers, ranges_per_worker=4):
+    """Splits ``range(page_count)`` into contiguous ``(start, stop)`` chunks.
+
+    Several chunks per worker keep the pool busy when pages differ in cost.
+    """
+    if page_count <= 0:
+        return []
+    chunk_size = max(1, -(-page_count // (max(1, workers) * ranges_per_worker)))
+    return [(start, min(start + chunk_size, page_count))
+            for start in range(0, page_count, chunk_size)]
+
+
+def iter_ocr_results_parallel(pdf_path, workers, dpi=72, engine_configs=None,
+                              debug_folder=None, mp_context=None, engine_timeout=None,
+                              cache=None, pages=None, detect_dpi=None, rec_batch_size=None,
+                              rec_max_latency=DEFAULT_MAX_LATENCY, corrector=None,
+                              memory_budget_bytes=None, trace_python_memory=False):
+    """Yields ``(page_num, page_results)`` in page order while ``workers`` processes OCR page ranges.
+
+    Each worker opens the PDF and builds its engines once.  Ranges are merged
+    back in page order, so the rows (including ``page``/``block_id``) match the
+    serial output.  ``mp_context`` defaults to ``spawn`` because inference
+    libraries do not survive ``fork`` reliably.  With a ``ResultCache`` each
+    worker opens its own connection to the same cache file.  ``pages``
+    restricts processing to the given ascending page indices.  With
+    ``rec_batch_size`` each worker batches recognition across its range.
+    A ``corrector`` is pickled by its settings and each worker loads its own
+    language model.  With ``memory_budget_bytes`` every worker runs its own
+    ``MemoryBudget`` over an equal share of what the parent process, measured
+    before the pool starts, leaves of it; the memory peaks of the workers are
+    merged into ``METRICS``.
+    """
+    _require_fitz("run_ocr_parallel")
+    doc = fitz.open(pdf_path)
+    page_count = len(doc)
+    doc.close()
+    logger.info("PDF has %d pages; running OCR with %d workers.", page_count, workers)
+    pages = list(range(page_count) if pages is None else pages)
+    tasks = [pages[start:stop] for start, stop in split_page_ranges(len(pages), workers)]
+
+    worker_budget = split_memory_budget(memory_budget_bytes, workers) if memory_budget_bytes else None
+    mp_context = mp_context or multiprocessing.get_context("spawn")
+    # Split the cores between workers instead of letting every worker's
+    # inference runtime spawn one thread per core.
+    threads_per_worker = max(1, (os.cpu_count() or 1) // workers)
+    with _worker_thread_limits(threads_per_worker):
+        pool = mp_context.Pool(
+            processes=workers,
+            initializer=_init_page_worker,
+            initargs=(pdf_path, dpi, engine_configs, debug_folder, engine_timeout,
+                      cache.path if cache else None, cache.max_bytes if cache else None,
+                      detect_dpi, rec_batch_size, rec_max_latency, corrector,
+                      worker_budget, trace_python_memory),
+        )
+    with pool:
+        for range_results, metrics in pool.imap(_ocr_page_range, tasks):
+            METRICS.merge(metrics)
+            yield from range_results
+
+def run_ocr_parallel(pdf_path, workers, output_csv_path=None, dpi=72, engine_configs=None,
+                     debug_folder=None, mp_context=None, engine_timeout=None):
+    """Collects ``iter_ocr_results_parallel`` into a list, streaming rows to the CSV."""
+    return _collect_results(
+        iter_ocr_results_parallel(pdf_path, workers, dpi, engine_configs, debug_folder,
+                                  mp_context, engine_timeout),
+        output_csv_path,
+    )
+
+def default_csv_path(pdf_path):
+    """Returns the CSV path written next to the input PDF."""
+    pdf_dir = os.path.dirname(pdf_path)
+    if not pdf_dir: # Handle case where path is just a filename
+        pdf_dir = "."
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(pdf_dir, f"{pdf_name}_ocr_results.csv")
+
+def default_journal_path(pdf_path):
+    """Returns the job journal path written next to the CSV output."""
+    return os.path.splitext(default_csv_path(pdf_path))[0] + ".journal"
+
+def _merge_text_layer_rows(page_num, route, ocr_results):
+    """Combines a mixed page's text layer with the OCR lines of its image regions."""
+    rows = _rows_from_lines(page_num, route.lines) + rows_in_regions(ocr_results, route.ocr_regions)
+    rows.sort(key=lambda row: (row['y0'], row['x0']))
+    for block_id, row in enumerate(rows):
+        row['block_id'] = block_id
+    return rows
+
+def _assemble_pages(page_count, journal, routes, fresh_pages):
+    """Yields every page in order from the journal, the text layer or OCR.
+
+    ``routes`` maps pending page numbers to their ``PageRoute`` (empty when
+    the text layer is not used).  Freshly produced pages are journaled
+    before they are passed on, so a page that reached the CSV is always
+    recoverable.  Only resumed pages are read back from the journal; the
+    rows of fresh pages are not kept once they have been passed on.
+    """
+    fresh_pages = iter(fresh_pages)
+    for page_num in range(page_count):
+        if page_num in journal.pages:
+            yield page_num, journal.pages[page_num]
+            continue
+        route = routes.get(page_num)
+        text_layer = route is not None and route.route == ROUTE_TEXT
+        if text_layer:
+            page_results = _rows_from_lines(page_num, route.lines)
+            METRICS.count("pages_text_layer")
+        else:
+            fresh_page_num, page_results = next(fresh_pages)
+            if fresh_page_num != page_num:
+                raise RuntimeError(f"Expected page {page_num} but OCR produced page {fresh_page_num}.")
+            if route is not None and route.route == ROUTE_MIXED:
+                page_results = _merge_text_layer_rows(page_num, route, page_results)
+        with METRICS.span("journal_write"):
+            journal.record_page(page_num, page_results, text_layer)
+        yield page_num, page_results
+
+def classify_pdf_pages(doc, pages, dpi=72):
+    """Returns ``{page_num: PageRoute}`` for ``pages`` and logs the route report."""
+    routes = {}
+    for page_num in pages:
+        with METRICS.span("classify"):
+            route = classify_page(doc.load_page(page_num), page_num, dpi)
+        routes[page_num] = route
+        logger.debug("Page %d: route=%s (%s)", page_num + 1, route.route, route.reason)
+    counts = {name: sum(1 for r in routes.values() if r.route == name)
+              for name in (ROUTE_TEXT, ROUTE_MIXED, ROUTE_OCR)}
+    logger.info("Page routes: %s", ", ".join(f"{name}={count}" for name, count in counts.items()))
+    return routes
+
+def process_pdf(pdf_path, output_folder="temp_images", no_csv=False, engines=None,
+                save_images=False, dpi=72, workers=1, engine_configs=None,
+                engine_timeout=None, cache=None, resume=False, text_layer=True,
+                route_report_path=None, detect_dpi=None, rec_batch_size=None,
+                rec_max_latency=DEFAULT_MAX_LATENCY, corrector=None, searchable_pdf_path=None,
+                highlight_below=DEFAULT_HIGHLIGHT_BELOW, columnar_path=None, metrics_path=None,
+                memory_budget_bytes=None, trace_python_memory=False, rec_max_pending_pages=None,
+                reset_metrics=True):
+    """Runs the full PDF -> image -> OCR -> CSV flow for a single document.
+
+    Pages are rendered in memory and handed to the engines directly; with
+    ``save_images`` they are also written to ``output_folder`` for debugging.
+    With ``workers > 1`` pages are processed by ``iter_ocr_results_parallel``
+    using ``engine_configs`` (``engines`` cannot be shared across processes).
+    Results are streamed to the CSV page by page and not kept in memory;
+    the number of result lines is returned.  ``cache`` is an optional
+    ``ResultCache`` consulted before each page is rendered.
+
+    Completed pages are recorded in a journal next to the output (see
+    ``default_journal_path``).  With ``resume`` the pages already journaled by
+    an interrupted run of the same job are skipped and the CSV is rebuilt
+    from the journal, identical to an uninterrupted run.  The journal is
+    removed once the job completes.
+
+    With ``text_layer`` each page is first classified from its embedded
+    text (see ``src.text_layer``): born-digital pages are emitted from the
+    text layer without OCR and only image-only pages or regions are
+    recognized.  ``route_report_path`` optionally receives the per-page
+    routes as CSV.
+
+    With ``detect_dpi`` (lower than ``dpi``) lines are detected on a cheap
+    render at ``detect_dpi`` and only their regions are re-rendered at
+    ``dpi`` for recognition; boxes are reported at ``dpi`` as usual.
+
+    With ``rec_batch_size`` detection and recognition run as separate
+    stages: the line crops of consecutive pages are recognized together in
+    batches of up to ``rec_batch_size`` similar-sized lines, flushed after
+    ``rec_max_latency`` seconds at the latest (see ``src.batching``);
+    ``rec_max_pending_pages`` bounds the pages held for those batches.
+
+    ``corrector`` is an optional ``KenLMCorrector`` that rescores each OCR
+    line against its ensemble alternatives; it is part of the job identity.
+
+    With ``searchable_pdf_path`` the same page results are also written as
+    an invisible text layer onto a copy of the input PDF, highlighting lines
+    below ``highlight_below`` confidence (see ``src.pdf_overlay``).
+
+    With ``columnar_path`` the rows are also written as typed columns
+    (Parquet or NPZ, see ``scripts.columnar_results``), which
+    ``scripts.accuracy_reviewer`` reloads much faster than the CSV.
+
+    Stage timings, page latencies and counters are recorded in ``METRICS``
+    (see ``src.instrumentation``); with ``metrics_path`` they are exported
+    there as JSON and next to it in the Prometheus text format.  Without
+    ``reset_metrics`` the document's measurements are added to the ones
+    already in ``METRICS`` (the pipeline manager runs several documents at
+    once).
+
+    With ``memory_budget_bytes`` memory is sampled after every stage and a
+    ``MemoryBudget`` (see ``src.memory_budget``) releases caches, idle
+    engines and in-flight pages when the RSS nears the budget.  The peak,
+    with the page and stage that set it, and the adaptations made are part
+    of the metrics; ``trace_python_memory`` adds tracemalloc peaks.
+    """
+    _require_fitz("process_pdf")
+    if reset_metrics:
+        METRICS.reset()
+    memory_budget = None
+    if memory_budget_bytes and workers <= 1:
+        memory_budget = MemoryBudget(memory_budget_bytes)
+        memory_budget.attach(METRICS, trace_python_memory)
+    elif memory_budget_bytes:
+        # Workers run their own budgets; the parent only tracks its peaks.
+        METRICS.track_memory(trace_python=trace_python_memory)
+    detect_dpi = line_detect_dpi(dpi, detect_dpi, rec_batch_size)
+    output_csv_path = None
+    if not no_csv:
+        output_csv_path = default_csv_path(pdf_path)
+
+    job = {
+        "pdf_sha256": file_digest(pdf_path),
+        "settings": ensemble_cache_key(engines if engines is not None else
+                                       (engine_configs or DEFAULT_ENGINE_CONFIGS), dpi, detect_dpi,
+                                       corrector),
+        "text_layer": text_layer,
+    }
+    doc = fitz.open(pdf_path)
+    page_count = len(doc)
+    journal = JobJournal(default_journal_path(pdf_path), job, resume=resume)
+    pending_pages = [page_num for page_num in range(page_count) if page_num not in journal.done]
+    if resume:
+        logger.info("Resuming: %d of %d pages already journaled.", page_count - len(pending_pages), page_count)
+    routes = {}
+    if text_layer:
+        routes = classify_pdf_pages(doc, pending_pages, dpi)
+        if route_report_path:
+            write_route_report(routes.values(), route_report_path)
+    doc.close()
+    ocr_pages = [page_num for page_num in pending_pages
+                 if page_num not in routes or routes[page_num].route != ROUTE_TEXT]
+
+    debug_folder = output_folder if save_images else None
+    if not ocr_pages:
+        fresh_pages = iter(())
+    elif workers > 1:
+        fresh_pages = iter_ocr_results_parallel(pdf_path, workers, dpi, engine_configs,
+                                                debug_folder, engine_timeout=engine_timeout,
+                                                cache=cache, pages=ocr_pages, detect_dpi=detect_dpi,
+                                                rec_batch_size=rec_batch_size,
+                                                rec_max_latency=rec_max_latency, corrector=corrector,
+                                                memory_budget_bytes=memory_budget_bytes,
+                                                trace_python_memory=trace_python_memory)
+    else:
+        logger.info("Running OCR on in-memory page images...")
+        if engines is None:
+            engines = create_ocr_engines(engine_configs)
+        if memory_budget is not None:
+            register_default_reliefs(memory_budget, fitz, ENGINE_POOL, engines, corrector)
+        fresh_pages = iter_pdf_ocr_results(pdf_path, engines, dpi, debug_folder, engine_timeout,
+                                           cache, pages=ocr_pages, detect_dpi=detect_dpi,
+                                           rec_batch_size=rec_batch_size, rec_max_latency=rec_max_latency,
+                                           corrector=corrector, memory_budget=memory_budget,
+                                           rec_max_pending_pages=rec_max_pending_pages)
+
+    line_count = 0
+    try:
+        page_iterator = _assemble_pages(page_count, journal, routes, fresh_pages)
+        page_iterator = write_pages_pdf(page_iterator, pdf_path, searchable_pdf_path, dpi, highlight_below,
+                                        journal.text_layer_pages)
+        page_iterator = write_pages_columnar(page_iterator, columnar_path)
+        for _, page_results in write_pages_csv(page_iterator, output_csv_path):
+            _count_page(page_results)
+            line_count += len(page_results)
+    finally:
+        journal.close()
+        if memory_budget_bytes:
+            METRICS.stop_memory_tracking()
+    journal.remove()
+    if cache is not None and workers <= 1:
+        logger.info("Result cache: %d hits, %d misses.", cache.hits, cache.misses)
+
+    rss_peak = METRICS.summary()["memory"].get("rss") if memory_budget_bytes else None
+    if rss_peak:
+        logger.info("Peak RSS %.0f MB at page %s during %s (budget %.0f MB).",
+                    rss_peak["peak_bytes"] / 2 ** 20, rss_peak["peak_page"] or "-", rss_peak["peak_stage"],
+                    memory_budget_bytes / 2 ** 20)
+    if metrics_path:
+        extra = {"memory_budget": memory_budget.report()} if memory_budget is not None else None
+        summary = export_metrics(metrics_path, extra=extra)
+        latency = summary["page_latency"]
+        logger.info("%d pages in %.1f s (%.2f pages/s), page latency p50=%s p95=%s, bottleneck: %s.",
+                    summary["pages"], summary["wall_seconds"], summary["pages_per_second"] or 0.0,
+                    _format_seconds(latency["p50"]), _format_seconds(latency["p95"]), summary["bottleneck"])
+        logger.info("Metrics saved to %s", metrics_path)
+    logger.info("OCR PoC finished.")
+    return line_count
+
+def _format_seconds(seconds):
+    return "n/a" if seconds is None else f"{seconds:.3f}s"
 
 def main():
     parser = argparse.ArgumentParser(description="PDF to CSV OCR PoC.")
     parser.add_argument("pdf_path", type=str, help="Path to the input PDF file.")
     parser.add_argument("--output_folder", type=str, default="temp_images",
-                        help="Folder to save intermediate images.")
+                        help="Folder to save intermediate images (with --save-images).")
+    parser.add_argument("--save-images", action="store_true",
+                        help="Also write rendered pages as PNG files for debugging.")
+    parser.add_argument("--dpi", type=int, default=72,
+                        help="Resolution used to render PDF pages.")
+    parser.add_argument("--detect-dpi", type=int, default=None,
+                        help="Detect lines on a render at this DPI and re-render only line regions at --dpi.")
+    parser.add_argument("--rec-batch-size", type=int, default=None,
+                        help="Recognize detected lines of consecutive pages in batches of this many lines.")
+    parser.add_argument("--rec-max-latency", type=float, default=DEFAULT_MAX_LATENCY,
+                        help="Seconds a line may wait for its recognition batch to fill (with --rec-batch-size).")
+    parser.add_argument("--lm-model", type=str, default=None,
+                        help="n-gram language model (KenLM binary or ARPA) used to rescore alternatives.")
+    parser.add_argument("--lm-tau", type=float, default=DEFAULT_TAU,
+                        help="log10 probability margin an alternative needs to replace the voted text.")
+    parser.add_argument("--searchable-pdf", action="store_true",
+                        help="Also write a copy of the PDF with an invisible OCR text layer.")
+    parser.add_argument("--highlight-below", type=float, default=DEFAULT_HIGHLIGHT_BELOW,
+                        help="Highlight lines below this confidence in the searchable PDF.")
+    parser.add_argument("--columnar", action="store_true",
+                        help="Also write the results as typed columns (Parquet with pyarrow, NPZ otherwise).")
     parser.add_argument("--no-csv", action="store_true",
                         help="Do not output OCR results to CSV file.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes that OCR page ranges in parallel.")
+    parser.add_argument("--engine-timeout", type=float, default=None,
+                        help="Seconds an engine may take per page before it is dropped from the vote.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip pages recorded in the job journal of an interrupted run.")
+    parser.add_argument("--no-text-layer", action="store_true",
+                        help="OCR every page even when it carries a usable embedded text layer.")
+    parser.add_argument("--route-report", type=str, default=None,
+                        help="Write the per-page route (text/mixed/ocr) to this CSV file.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Do not read or write the per-page OCR result cache.")
+    parser.add_argument("--cache-path", type=str, default=DEFAULT_CACHE_PATH,
+                        help="SQLite file of the per-page OCR result cache.")
+    parser.add_argument("--cache-size-mb", type=float, default=DEFAULT_CACHE_SIZE_MB,
+                        help="Least recently used cache entries are evicted beyond this size.")
+    parser.add_argument("--engine-config", type=str, default=None,
+                        help="JSON list of ensemble engines (name, weight, kind, params).")
+    parser.add_argument("--engine-memory-budget-mb", type=float, default=None,
+                        help="Evict least recently used engines beyond this pooled footprint.")
+    parser.add_argument("--memory-budget", type=str, default=None,
+                        help="Memory budget of the run, e.g. 8G or 512M (a plain number is in MB); "
+                             "caches, idle engines and in-flight pages are released near it.")
+    parser.add_argument("--memory-trace", action="store_true",
+                        help="With --memory-budget, also record tracemalloc peaks of Python allocations.")
+    parser.add_argument("--metrics-path", type=str, default=None,
+                        help="JSON file for the run's stage timings (default: next to the CSV); "
+                             "a Prometheus .prom file is written next to it.")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="Do not export the stage timings of the run.")
+    parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), default="INFO",
+                        help="Logging level; DEBUG also logs every recognized line.")
     args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
     if not os.path.exists(args.pdf_path):
         print(f"Error: PDF file not found at {args.pdf_path}")
         return
+    if args.detect_dpi is not None and not 0 < args.detect_dpi < args.dpi:
+        print(f"Error: --detect-dpi must be between 0 and --dpi ({args.dpi}).")
+        return
+    if args.rec_batch_size is not None and args.rec_batch_size < 1:
+        print("Error: --rec-batch-size must be at least 1.")
+        return
 
-    print(f"Converting {args.pdf_path} to images...")
-    image_paths = pdf_to_images(args.pdf_path, args.output_folder)
-    print(f"Converted {len(image_paths)} pages to images.")
+    memory_budget_bytes = None
+    if args.memory_budget is not None:
+        try:
+            memory_budget_bytes = parse_memory_size(args.memory_budget)
+        except RuntimeError as e:
+            print(f"Error: {e}")
+            return
 
-    output_csv_path = None
-    if not args.no_csv:
-        pdf_dir = os.path.dirname(args.pdf_path)
-        if not pdf_dir: # Handle case where path is just a filename
-            pdf_dir = "."
-        pdf_name = os.path.splitext(os.path.basename(args.pdf_path))[0]
-        output_csv_path = os.path.join(pdf_dir, f"{pdf_name}_ocr_results.csv")
+    if args.engine_memory_budget_mb is not None:
+        ENGINE_POOL.memory_budget_bytes = int(args.engine_memory_budget_mb * 1024 * 1024)
+    engine_configs = load_engine_configs(args.engine_config) if args.engine_config else None
+
+    corrector = KenLMCorrector(args.lm_model, tau=args.lm_tau) if args.lm_model else None
 
-    print("Running OCR on extracted images...")
-    run_ocr(image_paths, output_csv_path)
+    cache = None
+    if not args.no_cache:
+        cache = ResultCache(args.cache_path, int(args.cache_size_mb * 1024 * 1024))
 
-    print("OCR PoC finished.")
+    process_pdf(args.pdf_path, args.output_folder, args.no_csv,
+                save_images=args.save_images, dpi=args.dpi,
+                workers=args.workers, engine_configs=engine_configs,
+                engine_timeout=args.engine_timeout, cache=cache, resume=args.resume,
+                text_layer=not args.no_text_layer, route_report_path=args.route_report,
+                detect_dpi=args.detect_dpi, rec_batch_size=args.rec_batch_size,
+                rec_max_latency=args.rec_max_latency, corrector=corrector,
+                searchable_pdf_path=default_pdf_path(args.pdf_path) if args.searchable_pdf else None,
+                highlight_below=args.highlight_below,
+                columnar_path=default_columnar_path(default_csv_path(args.pdf_path)) if args.columnar else None,
+                metrics_path=None if args.no_metrics else
+                args.metrics_path or default_metrics_path(default_csv_path(args.pdf_path)),
+                memory_budget_bytes=memory_budget_bytes, trace_python_memory=args.memory_trace)
 
 if __name__ == "__main__":
     main()
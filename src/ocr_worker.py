@@ -0,0 +1,409 @@
+"""Long-lived OCR worker that keeps the engines warm between jobs.
+
+The worker speaks line-delimited JSON-RPC 2.0 over stdin/stdout or a Unix
+domain socket.  One request per line, one response per line:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "ocr", "params": {"pdf_path": "a.pdf"}}
+
+Supported methods:
+
+- ``health``: liveness and basic counters (never waits for a running job).
+- ``ocr``: ``pdf_path``, optional ``output_folder`` and ``no_csv``.
+- ``accuracy_review``: ``ocr_csv``, ``ground_truth_json``, optional ``iou_threshold``
+  and ``match_method``.
+- ``reload``: rebuilds the engines once the running job has finished.
+- ``shutdown``: stops the worker once the running job has finished.
+
+Usage:
+
+    python -m src.ocr_worker serve [--socket PATH]
+    python -m src.ocr_worker call --socket PATH health
+    python -m src.ocr_worker call --socket PATH ocr tests/test.pdf --no-csv
+
+The client side only imports the standard library so that it starts quickly;
+PaddleOCR is imported by the server alone, and only OCR jobs wait for the
+engines.  Each job's output (its report and its log records at INFO and
+above) is captured for that request alone and returned as ``output``; the
+worker never redirects the process-wide stdout, which carries the protocol
+in stdio mode.  The desktop app (``src-tauri``) keeps one worker running in
+stdio mode for all of its jobs.
+"""
+
+import argparse
+import contextlib
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+JOB_FAILED = -32000
+
+
+class OcrWorker:
+    """Holds warm OCR engines and dispatches JSON-RPC requests to them.
+
+    ``engine_factory(reload=False)`` returns the engine adapters passed to
+    ``run_ocr``; it defaults to ``create_ocr_engines`` and the shared pool.
+    """
+
+    def __init__(self, engine_factory=None):
+        if engine_factory is None:
+            from src.ocr_poc import create_ocr_engines
+            engine_factory = create_ocr_engines
+        self._engine_factory = engine_factory
+        self._job_lock = threading.Lock()
+        # Guards building the engines; jobs that do not need them never wait on it.
+        self._engine_lock = threading.Lock()
+        self.engines = None
+        self.started_at = time.time()
+        self.jobs_served = 0
+        self.reload_count = 0
+        self.last_error = None
+        self.busy = False
+        self.shutdown_requested = threading.Event()
+
+    def load_engines(self):
+        """Builds the engines if they are not loaded yet."""
+        with self._engine_lock:
+            if self.engines is None:
+                self.engines = self._engine_factory()
+
+    def reload(self):
+        """Rebuilds the engines after the running job completes.
+
+        The new engines are built before the old ones are dropped, so a failed
+        reload leaves the worker serving with its previous engines.
+        """
+        with self._job_lock, self._engine_lock:
+            self.engines = self._engine_factory(reload=True)
+            self.reload_count += 1
+        return {"reloaded": True, "reload_count": self.reload_count}
+
+    def health(self):
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime_seconds": round(time.time() - self.started_at, 3),
+            "engines_loaded": self.engines is not None,
+            "busy": self.busy,
+            "jobs_served": self.jobs_served,
+            "reload_count": self.reload_count,
+            "last_error": self.last_error,
+        }
+
+    def run_ocr_job(self, pdf_path, output_folder="temp_images", no_csv=False):
+        from src.instrumentation import METRICS
+        from src.ocr_poc import default_csv_path, process_pdf
+
+        if not os.path.exists(pdf_path):
+            raise RuntimeError(f"PDF file not found at {pdf_path}")
+
+        def job(output):
+            line_count = process_pdf(pdf_path, output_folder, no_csv, engines=self.engines)
+            return {
+                "lines": line_count,
+                "csv_path": None if no_csv else default_csv_path(pdf_path),
+                "metrics": METRICS.summary(),
+            }
+
+        return self._run_job(job, needs_engines=True)
+
+    def run_accuracy_review_job(self, ocr_csv, ground_truth_json, iou_threshold=0.5,
+                                match_method="greedy"):
+        from scripts.accuracy_reviewer import review_accuracy
+
+        def job(output):
+            review_accuracy(ocr_csv, ground_truth_json, float(iou_threshold), match_method, out=output)
+            return {}
+
+        return self._run_job(job)
+
+    def _run_job(self, job, needs_engines=False):
+        """Runs ``job(output)`` under the job lock and returns its result with the captured output.
+
+        ``job`` writes its report to ``output``; the records the calling
+        thread logs at INFO and above are added to it.  Engines are built
+        first only for jobs that ``needs_engines``.
+        """
+        with self._job_lock:
+            if needs_engines:
+                self.load_engines()
+            self.busy = True
+            buffer = io.StringIO()
+            try:
+                with _capture_logs(buffer):
+                    result = job(buffer)
+            except Exception as exc:
+                self.last_error = str(exc)
+                raise _JobError(str(exc), buffer.getvalue()) from exc
+            finally:
+                self.busy = False
+                self.jobs_served += 1
+        result["output"] = buffer.getvalue()
+        return result
+
+    def handle(self, request):
+        """Handles one decoded JSON-RPC request and returns the response dict."""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return _error_response(None, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get("id")
+        method = request["method"]
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return _error_response(request_id, INVALID_PARAMS, "params must be an object")
+
+        handlers = {
+            "health": self.health,
+            "ocr": self.run_ocr_job,
+            "accuracy_review": self.run_accuracy_review_job,
+            "reload": self.reload,
+            "shutdown": self._request_shutdown,
+        }
+        handler = handlers.get(method)
+        if handler is None:
+            return _error_response(request_id, METHOD_NOT_FOUND, f"Unknown method: {method}")
+
+        try:
+            inspect.signature(handler).bind(**params)
+        except TypeError as exc:
+            return _error_response(request_id, INVALID_PARAMS, str(exc))
+
+        try:
+            result = handler(**params)
+        except _JobError as exc:
+            return _error_response(request_id, JOB_FAILED, exc.message, {"output": exc.output})
+        except Exception as exc:
+            self.last_error = str(exc)
+            return _error_response(request_id, JOB_FAILED, str(exc))
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    def handle_line(self, line):
+        """Decodes a request line and returns the encoded response line."""
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as exc:
+            response = _error_response(None, PARSE_ERROR, f"Parse error: {exc}")
+        else:
+            response = self.handle(request)
+        return json.dumps(response, ensure_ascii=False)
+
+    def _request_shutdown(self):
+        # Wait for the running job so that shutdown is always graceful.
+        with self._job_lock:
+            self.shutdown_requested.set()
+        return {"shutting_down": True}
+
+
+class _JobError(Exception):
+    def __init__(self, message, output):
+        super().__init__(message)
+        self.message = message
+        self.output = output
+
+
+def _error_response(request_id, code, message, data=None):
+    error = {"code": code, "message": message}
+    if data is not None:
+        error["data"] = data
+    return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+
+def serve_stdio(worker, stdin=None, stdout=None):
+    """Serves requests read line by line from stdin until EOF or shutdown."""
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        stdout.write(worker.handle_line(line) + "\n")
+        stdout.flush()
+        if worker.shutdown_requested.is_set():
+            break
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        worker = self.server.worker
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8")
+            if not line.strip():
+                continue
+            self.wfile.write((worker.handle_line(line) + "\n").encode("utf-8"))
+            self.wfile.flush()
+            if worker.shutdown_requested.is_set():
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                break
+
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve_unix_socket(worker, socket_path):
+    """Serves requests on a Unix domain socket until shutdown is requested."""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    with _ThreadingUnixServer(socket_path, _RequestHandler) as server:
+        server.worker = worker
+        try:
+            server.serve_forever()
+        finally:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+
+def call(socket_path, method, params=None, timeout=None):
+    """Sends a single request to a worker socket and returns the response dict."""
+    request = {"jsonrpc": "2.0", "id": 1, "method": method, "params": params or {}}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+        with client.makefile("r", encoding="utf-8") as reader:
+            line = reader.readline()
+    if not line:
+        raise RuntimeError("Worker closed the connection without a response.")
+    return json.loads(line)
+
+
+def _from_thread(thread_id, record):
+    return record.thread == thread_id
+
+
+@contextlib.contextmanager
+def _capture_logs(stream, level=logging.INFO):
+    """Copies the pipeline's log records (``src.*``, ``scripts.*``) of the calling thread to ``stream``.
+
+    Records of other threads (other connections, a SIGHUP reload) are left
+    out, so they never end up in this request's output.
+    """
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    handler.setLevel(level)
+    handler.addFilter(functools.partial(_from_thread, threading.get_ident()))
+    loggers = [logging.getLogger(name) for name in ("src", "scripts")]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.addHandler(handler)
+        if logger.getEffectiveLevel() > level:
+            logger.setLevel(level)
+    try:
+        yield
+    finally:
+        for logger, previous in zip(loggers, levels):
+            logger.removeHandler(handler)
+            logger.setLevel(previous)
+
+
+def _install_signal_handlers(worker):
+    def _reload(signum, frame):
+        threading.Thread(target=worker.reload, daemon=True).start()
+
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, _reload)
+
+
+def _warm_up(worker):
+    # Log to stderr: in stdio mode stdout carries the protocol.
+    print("Loading OCR engines...", file=sys.stderr)
+    try:
+        worker.load_engines()
+    except Exception as exc:
+        # The first OCR job retries and reports the error to its caller.
+        worker.last_error = str(exc)
+        print(f"Could not load OCR engines: {exc}", file=sys.stderr)
+        return
+    print("OCR engines ready.", file=sys.stderr)
+
+
+def _serve(args):
+    worker = OcrWorker()
+    _install_signal_handlers(worker)
+    # Warm the engines in the background: health checks and accuracy reviews
+    # are answered meanwhile, OCR jobs wait for them.
+    threading.Thread(target=_warm_up, args=(worker,), daemon=True).start()
+    if args.socket:
+        serve_unix_socket(worker, args.socket)
+    else:
+        serve_stdio(worker)
+
+
+def _call(args):
+    if args.method == "ocr":
+        params = {"pdf_path": args.pdf_path, "output_folder": args.output_folder,
+                  "no_csv": args.no_csv}
+    elif args.method == "accuracy_review":
+        params = {"ocr_csv": args.ocr_csv, "ground_truth_json": args.ground_truth_json,
+                  "iou_threshold": args.iou_threshold, "match_method": args.match_method}
+    else:
+        params = {}
+
+    try:
+        response = call(args.socket, args.method, params, timeout=args.timeout)
+    except OSError as exc:
+        raise SystemExit(f"Error: could not reach OCR worker at {args.socket}: {exc}")
+
+    if "error" in response:
+        error = response["error"]
+        output = (error.get("data") or {}).get("output")
+        if output:
+            print(output, end="")
+        raise SystemExit(f"Error: {error['message']}")
+
+    result = response["result"]
+    output = result.pop("output", None)
+    if output:
+        print(output, end="")
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm OCR worker and client.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Run the worker.")
+    serve_parser.add_argument("--socket", type=str, default=None,
+                              help="Unix socket path. Uses stdin/stdout when omitted.")
+
+    call_parser = subparsers.add_parser("call", help="Send a request to a running worker.")
+    call_parser.add_argument("--socket", type=str, required=True,
+                             help="Unix socket path of the worker.")
+    call_parser.add_argument("--timeout", type=float, default=None,
+                             help="Seconds to wait for the response.")
+    methods = call_parser.add_subparsers(dest="method", required=True)
+    methods.add_parser("health")
+    methods.add_parser("reload")
+    methods.add_parser("shutdown")
+    ocr_parser = methods.add_parser("ocr")
+    ocr_parser.add_argument("pdf_path", type=str)
+    ocr_parser.add_argument("--output_folder", type=str, default="temp_images")
+    ocr_parser.add_argument("--no-csv", action="store_true")
+    review_parser = methods.add_parser("accuracy_review")
+    review_parser.add_argument("--ocr_csv", type=str, required=True)
+    review_parser.add_argument("--ground_truth_json", type=str, required=True)
+    review_parser.add_argument("--iou_threshold", type=float, default=0.5)
+    review_parser.add_argument("--match_method", choices=("greedy", "hungarian"), default="greedy")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        _serve(args)
+    else:
+        _call(args)
+
+
+if __name__ == "__main__":
+    main()
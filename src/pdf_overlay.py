@@ -0,0 +1,130 @@
+"""Searchable-PDF output built from the same page results as the CSV (SDD 4.5).
+
+``PdfOverlayWriter`` copies the input PDF and, page by page, adds an
+invisible text layer (render mode 3) with every recognized line plus a
+highlight annotation on lines whose confidence is below a threshold.  Pages
+read from their own text layer are skipped.  The original page content is
+left untouched; nothing is re-rendered.
+
+The output is saved incrementally: each save appends only the objects
+changed since the previous one, so the cost per page stays constant for
+large documents, and a run that stops early leaves a valid PDF holding every
+page saved so far.
+"""
+
+import logging
+import os
+import shutil
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # pragma: no cover - optional dependency during tests
+    fitz = None
+
+DEFAULT_HIGHLIGHT_BELOW = 0.6
+DEFAULT_SAVE_EVERY = 10
+# Built-in CJK font of PyMuPDF; every glyph is one em wide.
+OVERLAY_FONT = "japan"
+HIGHLIGHT_COLOR = (1.0, 0.85, 0.0)
+
+logger = logging.getLogger(__name__)
+
+
+class PdfOverlayWriter:
+    """Adds the OCR text layer and low-confidence highlights to a copy of ``pdf_path``.
+
+    Result rows are in pixels of a render at ``dpi`` (the coordinates the CSV
+    holds), in the page's displayed orientation.  ``write_page`` takes the
+    rows of one page; the output is saved every ``save_every`` pages and on
+    ``close``.
+    """
+
+    def __init__(self, pdf_path, output_pdf_path, dpi=72, highlight_below=DEFAULT_HIGHLIGHT_BELOW,
+                 save_every=DEFAULT_SAVE_EVERY):
+        if fitz is None:
+            raise RuntimeError("PyMuPDF (fitz) is required for PdfOverlayWriter but is not installed.")
+        self.output_pdf_path = output_pdf_path
+        self.scale = 72.0 / dpi
+        self.highlight_below = highlight_below
+        self.save_every = max(1, save_every)
+        self.pages_written = 0
+        self.highlights = 0
+        self._unsaved = 0
+
+        source = fitz.open(pdf_path)
+        try:
+            # Incremental saves need a file PyMuPDF did not have to repair.
+            if source.can_save_incrementally():
+                source.close()
+                shutil.copyfile(pdf_path, output_pdf_path)
+            else:
+                source.save(output_pdf_path, garbage=1)
+        finally:
+            if not source.is_closed:
+                source.close()
+        self._doc = fitz.open(output_pdf_path)
+        self._font = fitz.Font(OVERLAY_FONT)
+
+    def _page_rect(self, page, row):
+        rect = fitz.Rect(row['x0'], row['y0'], row['x1'], row['y1']) * self.scale
+        # Rows follow the rendered (rotated) page; text goes in unrotated page space.
+        return rect * page.derotation_matrix if page.rotation else rect
+
+    def write_page(self, page_results, overlay=True):
+        """Overlays the rows of one page (all rows share the same ``page``).
+
+        With ``overlay=False`` the page is counted but left as is: pages
+        whose rows came from the PDF's own text layer are already searchable,
+        and a second invisible copy would duplicate every search hit.
+        """
+        if page_results and overlay:
+            page = self._doc.load_page(page_results[0]['page'])
+            writer = fitz.TextWriter(page.rect)
+            appended = 0
+            for row in page_results:
+                text = row['text']
+                rect = self._page_rect(page, row)
+                if not text or rect.is_empty:
+                    continue
+                # Fit the line into its box: CJK glyphs are one em wide.
+                fontsize = min(rect.height, rect.width / max(1, len(text)))
+                writer.append((rect.x0, rect.y1 - 0.15 * fontsize), text, font=self._font, fontsize=fontsize)
+                appended += 1
+                if row['confidence'] < self.highlight_below:
+                    annot = page.add_highlight_annot(rect)
+                    annot.set_colors(stroke=HIGHLIGHT_COLOR)
+                    annot.set_info(content=f"{text} ({row['confidence']:.2f})")
+                    annot.update()
+                    self.highlights += 1
+            if appended:
+                writer.write_text(page, render_mode=3)
+        self.pages_written += 1
+        self._unsaved += 1
+        if self._unsaved >= self.save_every:
+            self.save()
+
+    def save(self):
+        """Appends the pending changes to the output file."""
+        if self._unsaved:
+            self._doc.saveIncr()
+            self._unsaved = 0
+
+    def close(self):
+        if not self._doc.is_closed:
+            self.save()
+            self._doc.close()
+            logger.info("Searchable PDF saved to %s (%d low-confidence lines highlighted)",
+                        self.output_pdf_path, self.highlights)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def default_pdf_path(pdf_path):
+    """Returns the searchable-PDF path written next to the input PDF."""
+    pdf_dir = os.path.dirname(pdf_path) or "."
+    pdf_name = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(pdf_dir, f"{pdf_name}_ocr.pdf")
@@ -0,0 +1,542 @@
+"""Pipeline manager: continuous OCR of the PDFs dropped into watched folders (SDD 4.4).
+
+Usage:
+
+    python -m src.pipeline_manager run --root jobs --inbox scans --inbox urgent:10 [--documents 2]
+    python -m src.pipeline_manager run --root jobs --inbox scans --once
+    python -m src.pipeline_manager status --root jobs
+
+One long-lived process loads the engines once and keeps them warm for every
+document.  Everything it owns lives under ``--root``:
+
+* ``queue.sqlite3``: the persistent ``JobQueue``;
+* ``work/<job>/``: a claimed PDF with its CSV, journal and other outputs;
+* ``done/<name>/`` and ``failed/<name>/``: finished job folders.  A failed
+  folder also holds ``error.txt``.
+
+Inboxes are polled every ``poll_interval`` seconds.  A PDF is taken once it
+has not been modified for ``settle_seconds`` (so files still being copied
+are left alone): it is renamed into its own work folder and queued with the
+inbox's priority.  Jobs are claimed highest priority first, then oldest
+first, and run ``documents`` at a time on threads sharing the engines.  A
+failed job is retried with exponential backoff and resumes from its page
+journal; after ``max_attempts`` it is moved to ``failed``.  Moves are
+renames on the same file system, so a folder is always complete in
+``done``/``failed`` or not there at all.  A job whose results cannot be
+filed (a failed move or queue update) is marked failed and its folder stays
+in ``work``; the other documents carry on.
+
+``max_inflight_pages`` bounds the pages held in memory across all running
+documents: each document renders and recognizes one page at a time, or,
+with ``rec_batch_size``, keeps an equal share of the bound waiting for
+recognition batches.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from src.instrumentation import METRICS, export_metrics
+
+DEFAULT_DOCUMENTS = 2
+DEFAULT_MAX_INFLIGHT_PAGES = 8
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30.0
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_SECONDS = 2.0
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# ``process_pdf`` options that start or stop process-wide memory tracking.
+_PROCESS_WIDE_OPTIONS = {"memory_budget_bytes", "trace_python_memory"}
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    path: str
+    name: str
+    priority: int
+    attempts: int
+    max_attempts: int
+
+
+class JobQueue:
+    """Persistent priority queue of OCR jobs in SQLite.
+
+    A failed job is queued again ``retry_delay * 2 ** (attempts - 1)``
+    seconds later until it has been attempted ``max_attempts`` times.  Jobs
+    left ``running`` by a manager that died are queued again by ``recover``.
+    """
+
+    def __init__(self, path, clock=time.time):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self._clock = clock
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, path TEXT NOT NULL UNIQUE, name TEXT NOT NULL,"
+            " priority INTEGER NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL,"
+            " max_attempts INTEGER NOT NULL, not_before REAL NOT NULL, created REAL NOT NULL,"
+            " updated REAL NOT NULL, error TEXT, output TEXT)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, id)")
+        self._connection.commit()
+
+    def enqueue(self, path, name=None, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Queues the PDF at ``path``; returns the job id, or None when ``path`` is already known."""
+        now = self._clock()
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO jobs (path, name, priority, status, attempts, max_attempts,"
+                " not_before, created, updated) VALUES (?, ?, ?, ?, 0, ?, ?, ?, ?)",
+                (path, name or os.path.basename(path), priority, QUEUED, max_attempts, now, now, now),
+            )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self):
+        """Marks the next ready job as running and returns it, or None when nothing is ready."""
+        now = self._clock()
+        while True:
+            row = self._connection.execute(
+                "SELECT id, path, name, priority, attempts, max_attempts FROM jobs"
+                " WHERE status = ? AND not_before <= ? ORDER BY priority DESC, id LIMIT 1",
+                (QUEUED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            with self._connection:
+                # Another manager on the same queue may have claimed it meanwhile.
+                claimed = self._connection.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, updated = ?"
+                    " WHERE id = ? AND status = ?",
+                    (RUNNING, now, row[0], QUEUED),
+                ).rowcount
+            if claimed:
+                return Job(row[0], row[1], row[2], row[3], row[4] + 1, row[5])
+
+    def complete(self, job_id, output_path):
+        self._set(job_id, status=DONE, error=None, output=output_path)
+
+    def fail(self, job_id, error, retry_delay=DEFAULT_RETRY_DELAY):
+        """Queues the job again with backoff; returns False once its attempts are used up."""
+        attempts, max_attempts = self._connection.execute(
+            "SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if attempts >= max_attempts:
+            self._set(job_id, status=FAILED, error=error)
+            return False
+        self._set(job_id, status=QUEUED, error=error,
+                  not_before=self._clock() + retry_delay * 2 ** (attempts - 1))
+        return True
+
+    def abandon(self, job_id, error):
+        """Marks the job failed without retrying it."""
+        self._set(job_id, status=FAILED, error=error)
+
+    def set_output(self, job_id, output_path):
+        self._set(job_id, output=output_path)
+
+    def _set(self, job_id, **fields):
+        fields["updated"] = self._clock()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connection:
+            self._connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?",
+                                     (*fields.values(), job_id))
+
+    def recover(self):
+        """Queues the jobs a previous manager left running; returns how many."""
+        with self._connection:
+            return self._connection.execute(
+                "UPDATE jobs SET status = ?, updated = ? WHERE status = ?",
+                (QUEUED, self._clock(), RUNNING),
+            ).rowcount
+
+    def known(self, path):
+        return self._connection.execute("SELECT 1 FROM jobs WHERE path = ?", (path,)).fetchone() is not None
+
+    def counts(self):
+        """``{status: number of jobs}`` for every status."""
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        counts.update(self._connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"))
+        return counts
+
+    def jobs(self, status=None):
+        """Rows of the queue as dicts, newest first."""
+        query = "SELECT id, name, priority, status, attempts, max_attempts, error, output FROM jobs"
+        params = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            params = (status,)
+        cursor = self._connection.execute(query + " ORDER BY id DESC", params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def close(self):
+        self._connection.close()
+
+
+def parse_inbox(text):
+    """``"scans"`` -> ``("scans", 0)``; ``"urgent:10"`` -> ``("urgent", 10)``."""
+    directory, separator, priority = text.rpartition(":")
+    if separator and directory:
+        try:
+            return directory, int(priority)
+        except ValueError:
+            pass
+    return text, 0
+
+
+def move_atomically(source, destination):
+    """Renames ``source`` (a file or folder) to ``destination``.
+
+    Across file systems the copy is made under a temporary name next to
+    ``destination`` first and renamed into place, so ``destination`` never
+    exists half-written.
+    """
+    try:
+        os.replace(source, destination)
+        return
+    except OSError:
+        if not os.path.exists(source):
+            raise
+    temp_path = f"{destination}.tmp-{uuid.uuid4().hex[:8]}"
+    if os.path.isdir(source):
+        shutil.copytree(source, temp_path)
+    else:
+        shutil.copy2(source, temp_path)
+    os.replace(temp_path, destination)
+    if os.path.isdir(source):
+        shutil.rmtree(source)
+    else:
+        os.remove(source)
+
+
+def _unique_path(directory, name):
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return path
+    return os.path.join(directory, f"{name}-{uuid.uuid4().hex[:8]}")
+
+
+class PipelineManager:
+    """Feeds the PDFs of ``inboxes`` through ``process_pdf`` with shared warm engines.
+
+    ``inboxes`` is a list of ``(directory, priority)``.  ``engines`` (or
+    adapters built from ``engine_configs``) are created once and used by
+    every document.  ``ocr_options`` are passed to ``process_pdf`` as is
+    (``dpi``, ``detect_dpi``, ``rec_batch_size``, ``corrector``, ...);
+    ``searchable_pdf`` and ``columnar`` add those outputs to each job folder,
+    and ``cache_path`` gives every document a ``ResultCache`` connection to
+    that file.  With ``metrics_path`` the metrics of all documents are
+    exported there after each job.  Memory tracking is process-wide, so the
+    per-document ``memory_budget_bytes`` and ``trace_python_memory`` options
+    are rejected: concurrent documents would stop each other's tracking.
+    """
+
+    def __init__(self, root, inboxes, engines=None, engine_configs=None, documents=DEFAULT_DOCUMENTS,
+                 max_inflight_pages=DEFAULT_MAX_INFLIGHT_PAGES, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 retry_delay=DEFAULT_RETRY_DELAY, poll_interval=DEFAULT_POLL_INTERVAL,
+                 settle_seconds=DEFAULT_SETTLE_SECONDS, ocr_options=None, searchable_pdf=False,
+                 columnar=False, cache_path=None, cache_max_bytes=None, metrics_path=None,
+                 clock=time.time):
+        if max_inflight_pages < 1:
+            raise RuntimeError(f"max_inflight_pages must be at least 1: {max_inflight_pages}")
+        unsupported = sorted(set(ocr_options or {}) & _PROCESS_WIDE_OPTIONS)
+        if unsupported:
+            raise RuntimeError(f"The pipeline manager does not support per-document {', '.join(unsupported)}.")
+        self.root = root
+        self.inboxes = list(inboxes)
+        self.work_dir = os.path.join(root, "work")
+        self.done_dir = os.path.join(root, "done")
+        self.failed_dir = os.path.join(root, "failed")
+        for directory in (self.work_dir, self.done_dir, self.failed_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.queue = JobQueue(os.path.join(root, "queue.sqlite3"), clock)
+        self.engines = engines
+        self.engine_configs = engine_configs
+        # Every running document holds at least one page.
+        self.documents = max(1, min(documents, max_inflight_pages))
+        self.pages_per_document = max(1, max_inflight_pages // self.documents)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.ocr_options = dict(ocr_options or {})
+        self.searchable_pdf = searchable_pdf
+        self.columnar = columnar
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        self.metrics_path = metrics_path
+        self._clock = clock
+        self._stop = threading.Event()
+
+    def start(self):
+        """Loads the engines and requeues the work a previous manager left behind."""
+        if self.engines is None:
+            from src.ocr_poc import create_ocr_engines
+            logger.info("Loading OCR engines...")
+            self.engines = create_ocr_engines(self.engine_configs)
+        recovered = self.queue.recover()
+        adopted = self._adopt_work_folders()
+        if recovered or adopted:
+            logger.info("Requeued %d interrupted and %d unregistered jobs.", recovered, adopted)
+        METRICS.reset()
+
+    def _adopt_work_folders(self):
+        # A crash between moving a PDF into its work folder and queueing it
+        # leaves a folder holding just that PDF.
+        adopted = 0
+        for entry in sorted(os.listdir(self.work_dir)):
+            folder = os.path.join(self.work_dir, entry)
+            files = os.listdir(folder) if os.path.isdir(folder) else []
+            if len(files) != 1 or not files[0].lower().endswith(".pdf"):
+                continue
+            path = os.path.join(folder, files[0])
+            if not self.queue.known(path):
+                self.queue.enqueue(path, files[0], 0, self.max_attempts)
+                adopted += 1
+        return adopted
+
+    def scan(self):
+        """Moves the settled PDFs of every inbox into work folders and queues them; returns how many."""
+        queued = 0
+        now = self._clock()
+        for directory, priority in self.inboxes:
+            try:
+                names = sorted(os.listdir(directory))
+            except FileNotFoundError:
+                continue
+            for name in names:
+                path = os.path.join(directory, name)
+                if name.startswith(".") or not name.lower().endswith(".pdf") or not os.path.isfile(path):
+                    continue
+                try:
+                    if now - os.path.getmtime(path) < self.settle_seconds:
+                        continue
+                    folder = os.path.join(self.work_dir, uuid.uuid4().hex[:12])
+                    os.mkdir(folder)
+                    work_path = os.path.join(folder, name)
+                    move_atomically(path, work_path)
+                except OSError as e:
+                    logger.warning("Could not take %s: %s", path, e)
+                    continue
+                job_id = self.queue.enqueue(work_path, name, priority, self.max_attempts)
+                logger.info("Queued %s as job %s (priority %d).", name, job_id, priority)
+                queued += 1
+        return queued
+
+    def process(self, job):
+        """Runs OCR for one claimed job in its work folder; returns the number of result lines."""
+        from src.ocr_poc import default_csv_path, process_pdf
+        from src.pdf_overlay import default_pdf_path
+        from src.result_cache import ResultCache
+        from scripts.columnar_results import default_columnar_path
+
+        cache = ResultCache(self.cache_path, self.cache_max_bytes) if self.cache_path else None
+        try:
+            return process_pdf(
+                job.path, engines=self.engines,
+                cache=cache, resume=True, reset_metrics=False,
+                rec_max_pending_pages=self.pages_per_document,
+                searchable_pdf_path=default_pdf_path(job.path) if self.searchable_pdf else None,
+                columnar_path=default_columnar_path(default_csv_path(job.path)) if self.columnar else None,
+                **self.ocr_options)
+        finally:
+            if cache is not None:
+                cache.close()
+
+    def _finish(self, job, future, started):
+        folder = os.path.dirname(job.path)
+        stem = os.path.splitext(job.name)[0]
+        error = future.exception()
+        if error is None:
+            destination = _unique_path(self.done_dir, stem)
+            move_atomically(folder, destination)
+            self.queue.complete(job.id, destination)
+            METRICS.count("jobs_done")
+            logger.info("Job %d (%s) done: %d lines in %.1f s -> %s", job.id, job.name, future.result(),
+                        time.perf_counter() - started, destination)
+        elif self.queue.fail(job.id, str(error), self.retry_delay):
+            METRICS.count("jobs_retried")
+            logger.warning("Job %d (%s) failed on attempt %d of %d, will retry: %s",
+                           job.id, job.name, job.attempts, job.max_attempts, error)
+        else:
+            with open(os.path.join(folder, "error.txt"), 'w', encoding='utf-8') as f:
+                f.write(f"{error}\n")
+            destination = _unique_path(self.failed_dir, stem)
+            move_atomically(folder, destination)
+            self.queue.set_output(job.id, destination)
+            METRICS.count("jobs_failed")
+            logger.error("Job %d (%s) failed after %d attempts -> %s: %s",
+                         job.id, job.name, job.attempts, destination, error)
+
+    def _finish_safely(self, job, future, started):
+        # Filing a result can fail too (a move across a full disk, a locked
+        # queue); that must not stop the other documents or leave the job
+        # running, so the job is marked failed where its files are.
+        try:
+            self._finish(job, future, started)
+        except Exception as e:
+            logger.exception("Could not finish job %d (%s); marking it failed.", job.id, job.name)
+            METRICS.count("jobs_failed")
+            try:
+                self.queue.abandon(job.id, f"Could not finish the job: {e}")
+            except Exception:
+                logger.exception("Could not mark job %d (%s) failed.", job.id, job.name)
+        if self.metrics_path:
+            try:
+                export_metrics(self.metrics_path)
+            except Exception as e:
+                logger.warning("Could not export metrics to %s: %s", self.metrics_path, e)
+
+    def run(self, once=False):
+        """Processes jobs until ``stop`` is called, or with ``once`` until the queue is empty.
+
+        Running documents are always finished before returning.
+        """
+        self.start()
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.documents, thread_name_prefix="ocr-document") as pool:
+            while True:
+                if not self._stop.is_set():
+                    self.scan()
+                    while len(running) < self.documents:
+                        job = self.queue.claim()
+                        if job is None:
+                            break
+                        logger.info("Starting job %d (%s), attempt %d.", job.id, job.name, job.attempts)
+                        running[pool.submit(self.process, job)] = (job, time.perf_counter())
+                if not running:
+                    if self._stop.is_set() or (once and not self.queue.counts()[QUEUED]):
+                        break
+                    # Idle, or only retries waiting for their backoff are left.
+                    self._stop.wait(self.poll_interval)
+                    continue
+                finished, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job, started = running.pop(future)
+                    self._finish_safely(job, future, started)
+        self.queue.close()
+
+    def stop(self):
+        """Stops claiming jobs; ``run`` returns once the running documents are finished."""
+        self._stop.set()
+
+
+def _run(args):
+    from src.engines import load_engine_configs
+    from src.result_cache import DEFAULT_CACHE_PATH
+    from scripts.kenlm_corrector import KenLMCorrector
+
+    ocr_options = {"dpi": args.dpi, "detect_dpi": args.detect_dpi, "rec_batch_size": args.rec_batch_size,
+                   "engine_timeout": args.engine_timeout, "text_layer": not args.no_text_layer}
+    if args.lm_model:
+        ocr_options["corrector"] = KenLMCorrector(args.lm_model)
+    manager = PipelineManager(
+        args.root, [parse_inbox(inbox) for inbox in args.inbox],
+        engine_configs=load_engine_configs(args.engine_config) if args.engine_config else None,
+        documents=args.documents, max_inflight_pages=args.max_inflight_pages,
+        max_attempts=args.max_attempts, retry_delay=args.retry_delay, poll_interval=args.poll_interval,
+        settle_seconds=args.settle_seconds, ocr_options=ocr_options, searchable_pdf=args.searchable_pdf,
+        columnar=args.columnar, cache_path=None if args.no_cache else args.cache_path or DEFAULT_CACHE_PATH,
+        cache_max_bytes=int(args.cache_size_mb * 1024 * 1024),
+        metrics_path=os.path.join(args.root, "metrics.json"),
+    )
+
+    def _stop(signum, frame):
+        logger.info("Stopping after the running documents...")
+        manager.stop()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    manager.run(once=args.once)
+
+
+def _status(args):
+    queue = JobQueue(os.path.join(args.root, "queue.sqlite3"))
+    try:
+        counts = queue.counts()
+        print(", ".join(f"{status}: {count}" for status, count in counts.items()))
+        for job in queue.jobs(args.state)[:args.limit]:
+            line = f"{job['id']:>6} {job['status']:<8} p={job['priority']:<3} " \
+                   f"{job['attempts']}/{job['max_attempts']} {job['name']}"
+            if job['output']:
+                line += f" -> {job['output']}"
+            if job['error'] and job['status'] != DONE:
+                line += f" ({job['error']})"
+            print(line)
+    finally:
+        queue.close()
+
+
+def main():
+    from src.result_cache import DEFAULT_CACHE_SIZE_MB
+
+    parser = argparse.ArgumentParser(description="Continuous OCR of the PDFs dropped into inbox folders.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Watch the inboxes and process their PDFs.")
+    run_parser.add_argument("--root", type=str, required=True,
+                            help="Folder of the job queue and the work, done and failed folders.")
+    run_parser.add_argument("--inbox", type=str, action="append", required=True,
+                            help="Folder to watch, optionally with a priority (DIR:PRIORITY). Repeatable.")
+    run_parser.add_argument("--once", action="store_true",
+                            help="Exit once the inboxes and the queue are empty instead of watching.")
+    run_parser.add_argument("--documents", type=int, default=DEFAULT_DOCUMENTS,
+                            help="Documents processed at the same time.")
+    run_parser.add_argument("--max-inflight-pages", type=int, default=DEFAULT_MAX_INFLIGHT_PAGES,
+                            help="Pages held in memory across all running documents.")
+    run_parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                            help="Attempts per document before it is moved to the failed folder.")
+    run_parser.add_argument("--retry-delay", type=float, default=DEFAULT_RETRY_DELAY,
+                            help="Seconds before the first retry; doubled for every further one.")
+    run_parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                            help="Seconds between inbox scans.")
+    run_parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                            help="A PDF is taken once it has not been modified for this long.")
+    run_parser.add_argument("--dpi", type=int, default=72)
+    run_parser.add_argument("--detect-dpi", type=int, default=None)
+    run_parser.add_argument("--rec-batch-size", type=int, default=None)
+    run_parser.add_argument("--engine-timeout", type=float, default=None)
+    run_parser.add_argument("--engine-config", type=str, default=None)
+    run_parser.add_argument("--lm-model", type=str, default=None)
+    run_parser.add_argument("--no-text-layer", action="store_true")
+    run_parser.add_argument("--searchable-pdf", action="store_true")
+    run_parser.add_argument("--columnar", action="store_true")
+    run_parser.add_argument("--no-cache", action="store_true")
+    run_parser.add_argument("--cache-path", type=str, default=None)
+    run_parser.add_argument("--cache-size-mb", type=float, default=DEFAULT_CACHE_SIZE_MB)
+    run_parser.add_argument("--log-level", choices=("DEBUG", "INFO", "WARNING", "ERROR"), default="INFO")
+
+    status_parser = subparsers.add_parser("status", help="Show the job queue.")
+    status_parser.add_argument("--root", type=str, required=True)
+    status_parser.add_argument("--state", choices=(QUEUED, RUNNING, DONE, FAILED), default=None)
+    status_parser.add_argument("--limit", type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        logging.basicConfig(level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        _run(args)
+    else:
+        _status(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""Content-addressed on-disk cache of per-page OCR results.
+
+A page is identified by a fingerprint computed from what PyMuPDF sees in the
+PDF, without rendering it: the page's decompressed content streams, its
+geometry, the raw streams of the images and form XObjects it references, and
+its annotations and form fields (their visible properties and normal
+appearance streams), since those are rendered onto the page too.  Identical pages in re-uploaded or partially edited documents therefore share
+an entry regardless of their page number or object numbers.
+
+The cache key combines that fingerprint with the render settings and the
+ensemble configuration, so changing the DPI or the engines never returns stale
+lines.  Entries live in a single SQLite file and are evicted least recently
+used first once the stored payload exceeds ``max_bytes``.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Bump when the stored line format or the post-processing changes.
+CACHE_FORMAT_VERSION = 3
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "abroad_ocr", "results.sqlite3")
+DEFAULT_CACHE_SIZE_MB = 512
+
+
+def _digest_stream(doc, xref, stream_digests):
+    digest = stream_digests.get(xref)
+    if digest is None:
+        digest = hashlib.sha256(doc.xref_stream_raw(xref) or b"").hexdigest()
+        stream_digests[xref] = digest
+    return digest
+
+
+# Annotation keys that change what is drawn; object references are left out so
+# that renumbered objects keep their fingerprint.
+_ANNOTATION_KEYS = ("Subtype", "Rect", "F", "Contents", "FT", "V", "AS", "DA")
+
+
+def _annotation_digest(doc, xref, stream_digests):
+    parts = [doc.xref_get_key(xref, key) for key in _ANNOTATION_KEYS]
+    appearance = doc.xref_get_key(xref, "AP/N")
+    if appearance[0] == "dict":
+        # Checkboxes and radio buttons keep one appearance per state.
+        state = doc.xref_get_key(xref, "AS")[1].lstrip("/")
+        appearance = doc.xref_get_key(xref, f"AP/N/{state}")
+    if appearance[0] == "xref":
+        parts.append(_digest_stream(doc, int(appearance[1].split()[0]), stream_digests))
+    return repr(parts)
+
+
+def page_fingerprint(page, stream_digests=None):
+    """Returns a hex digest of the page content as seen by PyMuPDF.
+
+    ``stream_digests`` memoizes image/XObject stream hashes per document, so an
+    image shared by every page (a letterhead, a stamp) is hashed once.
+    """
+    if stream_digests is None:
+        stream_digests = {}
+    doc = page.parent
+    hasher = hashlib.sha256()
+    hasher.update(repr((tuple(page.rect), page.rotation)).encode("utf-8"))
+    hasher.update(page.read_contents() or b"")
+    for image in page.get_images(full=True):
+        hasher.update(b"img:")
+        hasher.update(_digest_stream(doc, image[0], stream_digests).encode("ascii"))
+    for xobject in page.get_xobjects():
+        hasher.update(b"xobj:")
+        hasher.update(_digest_stream(doc, xobject[0], stream_digests).encode("ascii"))
+    # ``annot_xrefs`` lists widgets as well as ordinary annotations.
+    for annotation in page.annot_xrefs():
+        hasher.update(b"annot:")
+        hasher.update(_annotation_digest(doc, annotation[0], stream_digests).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def ensemble_cache_key(engines, dpi, detect_dpi=None, corrector=None):
+    """Serializes the render settings and ensemble configuration for cache keys.
+
+    ``engines`` may hold ``EngineConfig`` objects or engine adapters.
+    ``detect_dpi`` is set for multi-resolution rendering and ``corrector``
+    for language-model rescoring.
+    """
+    members = []
+    for engine in engines:
+        config = getattr(engine, "config", None) or engine
+        if hasattr(config, "instance_key"):
+            identity = list(config.instance_key())
+        else:
+            identity = type(engine).__name__
+        members.append([engine.name, engine.weight, identity])
+    settings = {"version": CACHE_FORMAT_VERSION, "dpi": dpi, "engines": members}
+    if detect_dpi:
+        settings["detect_dpi"] = detect_dpi
+    if corrector is not None:
+        settings["lm"] = corrector.settings()
+    return json.dumps(settings, sort_keys=True)
+
+
+class ResultCache:
+    """SQLite-backed LRU cache mapping page keys to their recognized lines."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # Several page workers may share the file; wait for their locks.
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(fingerprint, settings_key):
+        return hashlib.sha256(f"{settings_key}\n{fingerprint}".encode("utf-8")).hexdigest()
+
+    def get(self, key, page_num):
+        """Returns the cached rows for ``key`` renumbered to ``page_num``, or None."""
+        row = self._connection.execute("SELECT payload FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with self._connection:
+            self._connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.hits += 1
+        lines = json.loads(row[0])
+        for line in lines:
+            line['page'] = page_num
+        return lines
+
+    def put(self, key, page_results):
+        """Stores a page's rows (without their page number) and evicts over budget."""
+        payload = json.dumps(
+            [{field: value for field, value in res.items() if field != 'page'} for res in page_results],
+            ensure_ascii=False,
+        ).encode("utf-8")
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor = self._connection.execute("SELECT key, size FROM entries ORDER BY last_access")
+        stale_keys = []
+        for key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", stale_keys)
+
+    def size_bytes(self):
+        return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
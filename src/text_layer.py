@@ -0,0 +1,147 @@
+"""Routes PDF pages between their embedded text layer and OCR.
+
+Born-digital pages already carry their text, with exact coordinates, in the
+PDF.  ``classify_page`` reads that text layer with PyMuPDF (no rendering) and
+decides per page:
+
+* ``text``: the text layer is reliable and no large image is left without
+  text, so the page needs no OCR at all;
+* ``mixed``: the text layer is reliable but some image regions (a pasted scan,
+  a handwritten form field) carry no text; only lines recognized inside those
+  regions are taken from OCR;
+* ``ocr``: there is no usable text layer (scans, broken ToUnicode maps).
+
+All coordinates are returned in the pixel space of the page rendered at the
+requested DPI, which is the space OCR results are reported in.
+"""
+
+import csv
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+ROUTE_TEXT = "text"
+ROUTE_MIXED = "mixed"
+ROUTE_OCR = "ocr"
+
+# Embedded text is exact, so it outranks any engine confidence.
+TEXT_LAYER_CONFIDENCE = 1.0
+
+DEFAULT_MIN_CHARS = 20
+DEFAULT_MAX_GARBLED_RATIO = 0.1
+DEFAULT_MIN_REGION_FRACTION = 0.02
+
+Rect = Tuple[float, float, float, float]
+
+
+@dataclass
+class PageRoute:
+    """Routing decision for one page."""
+
+    page: int
+    route: str
+    reason: str
+    text_chars: int = 0
+    # Text layer lines as LineResults (empty for the ``ocr`` route).
+    lines: List[dict] = field(default_factory=list)
+    # Regions whose OCR lines are used on ``mixed`` pages.
+    ocr_regions: List[Rect] = field(default_factory=list)
+
+
+def _is_garbled(char):
+    # Replacement, private-use, unassigned and control characters are what
+    # fonts without a usable ToUnicode map extract to.
+    return char == "\ufffd" or unicodedata.category(char) in ("Co", "Cn", "Cc")
+
+
+def _transform(rect, matrix, scale):
+    """Applies ``matrix`` (a PyMuPDF Matrix or None) and ``scale`` to a rect."""
+    x0, y0, x1, y1 = rect
+    if matrix is not None:
+        corners = [(x * matrix.a + y * matrix.c + matrix.e, x * matrix.b + y * matrix.d + matrix.f)
+                   for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        xs = [x for x, _ in corners]
+        ys = [y for _, y in corners]
+        x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+    return (x0 * scale, y0 * scale, x1 * scale, y1 * scale)
+
+
+def _area(rect):
+    return max(0.0, rect[2] - rect[0]) * max(0.0, rect[3] - rect[1])
+
+
+def _contains_center(rect, bbox):
+    cx = sum(point[0] for point in bbox) / len(bbox)
+    cy = sum(point[1] for point in bbox) / len(bbox)
+    return rect[0] <= cx <= rect[2] and rect[1] <= cy <= rect[3]
+
+
+def _text_layer_lines(page, matrix, scale):
+    lines = []
+    for block in page.get_text("dict").get("blocks", []):
+        if block.get("type", 0) != 0:
+            continue
+        for line in block.get("lines", []):
+            text = "".join(span.get("text", "") for span in line.get("spans", [])).strip()
+            if not text:
+                continue
+            x0, y0, x1, y1 = _transform(line["bbox"], matrix, scale)
+            lines.append({
+                'bbox': ((x0, y0), (x1, y0), (x1, y1), (x0, y1)),
+                'text': text,
+                'confidence': TEXT_LAYER_CONFIDENCE,
+            })
+    return lines
+
+
+def classify_page(page, page_num, dpi=72, min_chars=DEFAULT_MIN_CHARS,
+                  max_garbled_ratio=DEFAULT_MAX_GARBLED_RATIO,
+                  min_region_fraction=DEFAULT_MIN_REGION_FRACTION):
+    """Returns the ``PageRoute`` for a PyMuPDF page."""
+    scale = dpi / 72.0
+    # Text and image boxes are reported on the unrotated page; rendering
+    # applies the rotation, so map them the same way.
+    matrix = page.rotation_matrix if getattr(page, "rotation", 0) else None
+    lines = _text_layer_lines(page, matrix, scale)
+    chars = [char for line in lines for char in line['text'] if not char.isspace()]
+    if len(chars) < min_chars:
+        return PageRoute(page_num, ROUTE_OCR, f"{len(chars)} text-layer chars < {min_chars}",
+                         text_chars=len(chars))
+    garbled = sum(1 for char in chars if _is_garbled(char))
+    if garbled > max_garbled_ratio * len(chars):
+        return PageRoute(page_num, ROUTE_OCR, f"{garbled}/{len(chars)} text-layer chars unreadable",
+                         text_chars=len(chars))
+
+    page_area = _area(tuple(page.rect)) * scale * scale
+    regions = []
+    for image in page.get_image_info():
+        region = _transform(tuple(image["bbox"]), matrix, scale)
+        if _area(region) < min_region_fraction * page_area:
+            continue
+        if any(_contains_center(region, line['bbox']) for line in lines):
+            continue
+        regions.append(region)
+    if regions:
+        return PageRoute(page_num, ROUTE_MIXED, f"{len(regions)} image regions without text",
+                         text_chars=len(chars), lines=lines, ocr_regions=regions)
+    return PageRoute(page_num, ROUTE_TEXT, "reliable text layer", text_chars=len(chars), lines=lines)
+
+
+def rows_in_regions(rows, regions):
+    """Keeps the result rows whose box center falls inside one of ``regions``."""
+    kept = []
+    for row in rows:
+        corners = ((row['x0'], row['y0']), (row['x1'], row['y1']))
+        if any(_contains_center(region, corners) for region in regions):
+            kept.append(row)
+    return kept
+
+
+def write_route_report(routes, path):
+    """Writes one CSV row per page: page (1-based), route, text chars, regions, reason."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['page', 'route', 'text_chars', 'ocr_regions', 'reason'])
+        for route in routes:
+            writer.writerow([route.page + 1, route.route, route.text_chars, len(route.ocr_regions),
+                             route.reason])
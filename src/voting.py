@@ -0,0 +1,138 @@
+"""Weighted Voting Fusion across ensemble engines (SDD 5.2).
+
+Lines from different engines are aligned by geometry rather than by list
+position: two lines are the same line when their axis-aligned boxes overlap
+with IoU >= 0.7.  Candidate clusters are found through a uniform grid over
+the page, so each line is only compared with the clusters in the cells it
+touches and dense form pages stay near-linear instead of quadratic.
+
+Within a cluster every engine contributes at most one candidate.  The winner
+is the candidate with the highest ``normalized confidence * engine weight``;
+the others are kept, best first, as ``alternatives`` for later rescoring.
+"""
+
+import math
+from collections import defaultdict
+
+from scripts.calculate_iou import calculate_iou
+
+DEFAULT_IOU_THRESHOLD = 0.7
+
+
+def _rect(bbox):
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _sigmoid(value):
+    return 1.0 / (1.0 + math.exp(-value))
+
+
+def normalized_scores(confidences):
+    """Maps an engine's page confidences to ``sigmoid((c - mean) / std)``.
+
+    Engines disagree on how they spread confidences, so scores are compared
+    after standardizing each engine's own distribution on the page.  When an
+    engine's confidences do not vary (a single line, or identical values)
+    every line sits at the mean, so each scores ``sigmoid(0) = 0.5`` and stays
+    on the same scale as the other engines in the vote.
+    """
+    if not confidences:
+        return []
+    mean = sum(confidences) / len(confidences)
+    std = math.sqrt(sum((c - mean) ** 2 for c in confidences) / len(confidences))
+    if std == 0:
+        return [0.5] * len(confidences)
+    return [_sigmoid((c - mean) / std) for c in confidences]
+
+
+class _Cluster:
+    __slots__ = ("rect", "candidates", "engines")
+
+    def __init__(self, rect):
+        self.rect = rect
+        self.candidates = []
+        self.engines = set()
+
+
+class WeightedVotingAggregator:
+    """Aligns engine lines spatially and votes on each aligned line.
+
+    ``aggregate`` takes the ``(engine, lines)`` responses of one page and
+    returns the voted lines in the order they were first seen: each is a
+    LineResult (the winner's bbox, text and raw confidence) with the winning
+    ``engine`` name and an ``alternatives`` list of ``{'text', 'confidence',
+    'engine'}`` dicts.
+    """
+
+    def __init__(self, iou_threshold=DEFAULT_IOU_THRESHOLD, cell_size=None):
+        self.iou_threshold = iou_threshold
+        self.cell_size = cell_size
+
+    def _grid_cell_size(self, rects):
+        if self.cell_size:
+            return float(self.cell_size)
+        # About one line height: a line then touches a handful of cells.
+        heights = sorted(rect[3] - rect[1] for rect in rects)
+        return max(1.0, heights[len(heights) // 2]) if heights else 1.0
+
+    @staticmethod
+    def _cells(rect, cell_size):
+        for gx in range(int(rect[0] // cell_size), int(rect[2] // cell_size) + 1):
+            for gy in range(int(rect[1] // cell_size), int(rect[3] // cell_size) + 1):
+                yield gx, gy
+
+    def aggregate(self, responses):
+        candidates = []
+        for engine_index, (engine, lines) in enumerate(responses):
+            # Empty text means the engine saw nothing readable; it does not vote.
+            lines = [line for line in lines if line['text']]
+            scores = normalized_scores([line['confidence'] for line in lines])
+            for line, score in zip(lines, scores):
+                candidates.append((engine_index, engine, line, _rect(line['bbox']), score * engine.weight))
+        if not candidates:
+            return []
+
+        cell_size = self._grid_cell_size([candidate[3] for candidate in candidates])
+        grid = defaultdict(list)
+        clusters = []
+        for candidate in candidates:
+            engine_index, rect = candidate[0], candidate[3]
+            best_cluster, best_iou = None, self.iou_threshold
+            seen = set()
+            for cell in self._cells(rect, cell_size):
+                for cluster_id in grid.get(cell, ()):
+                    if cluster_id in seen:
+                        continue
+                    seen.add(cluster_id)
+                    cluster = clusters[cluster_id]
+                    if engine_index in cluster.engines:
+                        continue
+                    iou = calculate_iou(rect, cluster.rect)
+                    if iou >= best_iou:
+                        best_cluster, best_iou = cluster, iou
+            if best_cluster is None:
+                best_cluster = _Cluster(rect)
+                clusters.append(best_cluster)
+                for cell in self._cells(rect, cell_size):
+                    grid[cell].append(len(clusters) - 1)
+            best_cluster.candidates.append(candidate)
+            best_cluster.engines.add(engine_index)
+
+        voted = []
+        for cluster in clusters:
+            # Stable sort: ties go to the engine listed first.
+            ranked = sorted(cluster.candidates, key=lambda candidate: -candidate[4])
+            _, winner_engine, winner, _, _ = ranked[0]
+            voted.append({
+                'bbox': winner['bbox'],
+                'text': winner['text'],
+                'confidence': winner['confidence'],
+                'engine': winner_engine.name,
+                'alternatives': [
+                    {'text': line['text'], 'confidence': line['confidence'], 'engine': engine.name}
+                    for _, engine, line, _, _ in ranked[1:]
+                ],
+            })
+        return voted
@@ -1,10 +1,49 @@
+import itertools
 import json
 import os
+import random
 import subprocess
 import tempfile
 import unittest
+from unittest.mock import patch
 
-from scripts.accuracy_reviewer import load_ground_truth, load_ocr_results
+from scripts.accuracy_reviewer import PageResults, load_ground_truth, load_ocr_results, match_boxes
+from scripts.calculate_iou import calculate_iou
+from scripts.columnar_results import ColumnarResultWriter, is_columnar_file
+from src.ocr_poc import CsvResultWriter
+
+
+def _reference_greedy(gt_boxes, ocr_boxes, iou_threshold):
+    """The original nested-loop matcher, kept as the behavioral reference."""
+    matched_pairs = []
+    matched_ocr_indices = set()
+    for gt_box_info in gt_boxes:
+        best_iou = -1
+        best_ocr_idx = -1
+        for ocr_idx, ocr_box_info in enumerate(ocr_boxes):
+            if ocr_idx in matched_ocr_indices:
+                continue
+            iou = calculate_iou(gt_box_info['bbox'], ocr_box_info['bbox'])
+            if iou > best_iou:
+                best_iou = iou
+                best_ocr_idx = ocr_idx
+        if best_iou >= iou_threshold and best_ocr_idx != -1:
+            matched_pairs.append((gt_box_info, ocr_boxes[best_ocr_idx]))
+            matched_ocr_indices.add(best_ocr_idx)
+    return matched_pairs
+
+
+def _random_boxes(rng, count, jitter=0.0, base=None):
+    boxes = []
+    for i in range(count):
+        if base is not None:
+            x0, y0, x1, y1 = base[i % len(base)]['bbox']
+        else:
+            x0, y0 = rng.randrange(0, 400, 5), rng.randrange(0, 400, 5)
+            x1, y1 = x0 + rng.randrange(5, 80, 5), y0 + rng.randrange(5, 30, 5)
+        d = [rng.uniform(-jitter, jitter) for _ in range(4)]
+        boxes.append({'bbox': [x0 + d[0], y0 + d[1], x1 + d[2], y1 + d[3]], 'text': str(i)})
+    return boxes
 
 
 class TestAccuracyReviewer(unittest.TestCase):
@@ -46,6 +85,87 @@ class TestAccuracyReviewer(unittest.TestCase):
         with self.assertRaisesRegex(RuntimeError, '数値が不正'):
             load_ocr_results(csv_path)
 
+    def test_load_ocr_results_short_row(self):
+        header = 'page,block_id,x0,y0,x1,y1,text,confidence'
+        for row, column in (('0,0,0,0,10,10,テスト', 'confidence'), ('0,0,5', 'y0')):
+            with self.subTest(row=row):
+                csv_path = self._write_csv('short.csv', header, row)
+                with self.assertRaisesRegex(RuntimeError, f"必須列 '{column}'"):
+                    load_ocr_results(csv_path)
+
+    def test_load_ocr_results_fills_page_columns(self):
+        csv_path = self._write_csv(
+            'pages.csv',
+            'page,block_id,x0,y0,x1,y1,text,confidence',
+            '2,0,1,2,3,4,テスト,0.5\n1,0,5,6,7,8,検査,0.75\n2,1,9,10,11,12,テスト,1.0'
+        )
+        results = load_ocr_results(csv_path)
+
+        self.assertEqual(sorted(results), [1, 2])
+        self.assertIsInstance(results[2], PageResults)
+        self.assertEqual(results[2].bbox_list(), [[1.0, 2.0, 3.0, 4.0], [9.0, 10.0, 11.0, 12.0]])
+        self.assertEqual(results[1][0], {'bbox': [5.0, 6.0, 7.0, 8.0], 'text': '検査', 'confidence': 0.75})
+        # Rows holding the same text share one string.
+        self.assertIs(results[2][0]['text'], results[2][1]['text'])
+
+    def test_page_results_views(self):
+        page = PageResults()
+        page.append((0.0, 1.0, 2.0, 3.0), 'a', 0.5)
+        page.append((4.0, 5.0, 6.0, 7.0), 'b', 0.25)
+        page.append((8.0, 9.0, 10.0, 11.0), 'c', 1.0)
+        first = {'bbox': [0.0, 1.0, 2.0, 3.0], 'text': 'a', 'confidence': 0.5}
+
+        self.assertEqual(len(page), 3)
+        self.assertEqual(page[0], first)
+        self.assertEqual(page[-1]['text'], 'c')
+        with self.assertRaises(IndexError):
+            page[3]
+        with self.assertRaises(IndexError):
+            page[-4]
+        self.assertEqual([line['text'] for line in page], ['a', 'b', 'c'])
+        self.assertEqual(page, list(page))
+        self.assertNotEqual(page, list(page)[:2])
+        self.assertEqual(page.bbox_list(), [[0.0, 1.0, 2.0, 3.0], [4.0, 5.0, 6.0, 7.0], [8.0, 9.0, 10.0, 11.0]])
+
+        self.assertEqual(page[1:], [page[1], page[2]])
+        self.assertEqual([line['text'] for line in page[::-2]], ['c', 'a'])
+        self.assertEqual(page[5:], [])
+        # Rows are built on access, so editing one leaves the page unchanged.
+        page[0]['bbox'][0] = 99.0
+        self.assertEqual(page[0], first)
+
+    def test_columnar_results_load_like_csv(self):
+        rows = [{'page': page, 'block_id': block, 'x0': 10.5 * block, 'y0': 20.25, 'x1': 30.0 + block,
+                 'y1': 40.0, 'text': text, 'confidence': 0.5}
+                for page, block, text in [(0, 0, 'テスト'), (0, 1, ''), (2, 0, 'テスト'), (2, 1, '検査, "用紙"')]]
+        csv_path = os.path.join(self.temp_path, 'results.csv')
+        npz_path = os.path.join(self.temp_path, 'results.npz')
+        with CsvResultWriter(csv_path) as writer:
+            writer.write_page(rows)
+        expected = load_ocr_results(csv_path)
+        with ColumnarResultWriter(npz_path) as writer:
+            writer.write_page(rows[:2])
+            writer.write_page(rows[2:])
+
+        self.assertTrue(is_columnar_file(npz_path))
+        self.assertFalse(is_columnar_file(csv_path))
+        self.assertEqual(dict(load_ocr_results(npz_path)), dict(expected))
+        # An up-to-date columnar file next to the CSV is read instead of it.
+        with patch('scripts.accuracy_reviewer._load_columnar_ocr_results', return_value={}) as columnar, \
+                self.assertLogs('scripts.accuracy_reviewer', level='INFO') as logs:
+            self.assertEqual(load_ocr_results(csv_path), {})
+        columnar.assert_called_once_with(npz_path)
+        self.assertIn(npz_path, logs.output[0])
+        # The opt-out reads the CSV and says so.
+        with patch('scripts.accuracy_reviewer._load_columnar_ocr_results') as columnar, \
+                self.assertLogs('scripts.accuracy_reviewer', level='INFO') as logs:
+            self.assertEqual(dict(load_ocr_results(csv_path, prefer_columnar=False)), dict(expected))
+        columnar.assert_not_called()
+        self.assertEqual(logs.output, [f"INFO:scripts.accuracy_reviewer:Reading OCR results from {csv_path}."])
+        # Pages without lines read as empty, as with the CSV.
+        self.assertEqual(list(expected[2]), [])
+        self.assertEqual(list(load_ocr_results(npz_path)[2]), [])
+
     def test_load_ground_truth_invalid_json(self):
         json_path = os.path.join(self.temp_path, 'invalid.json')
         with open(json_path, 'w', encoding='utf-8') as f:
@@ -53,6 +173,38 @@ class TestAccuracyReviewer(unittest.TestCase):
         with self.assertRaisesRegex(RuntimeError, '形式が不正'):
             load_ground_truth(json_path)
 
+    def test_greedy_matching_equals_reference(self):
+        rng = random.Random(7)
+        for _ in range(30):
+            gt = _random_boxes(rng, rng.randrange(1, 40))
+            ocr = _random_boxes(rng, rng.randrange(1, 40), jitter=6.0, base=gt) + _random_boxes(rng, 5)
+            rng.shuffle(ocr)
+            for threshold in (0.5, 0.1, 0.0):
+                self.assertEqual(match_boxes(gt, ocr, threshold), _reference_greedy(gt, ocr, threshold))
+
+    def test_hungarian_maximizes_total_iou(self):
+        gt = [{'bbox': [0, 0, 10, 10], 'text': 'a'}, {'bbox': [6, 0, 16, 10], 'text': 'b'}]
+        ocr = [{'bbox': [1, 0, 11, 10], 'text': 'x'}, {'bbox': [-3, 0, 7, 10], 'text': 'y'}]
+        greedy = match_boxes(gt, ocr, 0.3)
+        optimal = match_boxes(gt, ocr, 0.3, method='hungarian', with_iou=True)
+
+        self.assertEqual([(g['text'], o['text']) for g, o in greedy], [('a', 'x')])
+        self.assertEqual([(g['text'], o['text']) for g, o, _ in optimal], [('a', 'y'), ('b', 'x')])
+        self.assertEqual(optimal[0][2], calculate_iou(gt[0]['bbox'], ocr[1]['bbox']))
+
+    def test_pure_python_hungarian_is_optimal(self):
+        rng = random.Random(3)
+        with patch('scripts.accuracy_reviewer.linear_sum_assignment', None):
+            for _ in range(40):
+                gt = _random_boxes(rng, rng.randrange(1, 6))
+                ocr = _random_boxes(rng, rng.randrange(1, 6), jitter=10.0, base=gt)
+                total = sum(iou for _, _, iou in match_boxes(gt, ocr, 0.2, 'hungarian', with_iou=True))
+                best = 0.0
+                for perm in itertools.permutations(range(len(ocr)), min(len(gt), len(ocr))):
+                    ious = [calculate_iou(gt[g]['bbox'], ocr[o]['bbox']) for g, o in enumerate(perm)]
+                    best = max(best, sum(iou for iou in ious if iou >= 0.2))
+                self.assertAlmostEqual(total, best)
+
     def test_script_propagates_runtime_error(self):
         gt_path = self._write_json('gt.json', {"1": []})
         env = os.environ.copy()
@@ -0,0 +1,171 @@
+import unittest
+import weakref
+from unittest.mock import patch
+
+try:
+    import numpy as np  # type: ignore
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover - optional dependency in tests
+    HAS_NUMPY = False
+
+from src.batching import RecognitionBatcher, aspect_bucket
+from src.engines import CropBatch, EngineConfig
+from src.ensemble import EnsembleRunner
+from src.ocr_poc import ENGINE_POOL, _PdfPageSource, create_ocr_engines
+
+
+class _Crop:
+    def __init__(self, label, width, height=32):
+        self.label = label
+        self.shape = (height, width, 3)
+
+
+class _RecordingEngine:
+    releases_gil = True
+
+    def __init__(self, name):
+        self.name = name
+        self.weight = 1.0
+        self.batches = []
+
+    def infer(self, batch):
+        self.batches.append([crop.label for crop in batch.crops])
+        return [{'bbox': box, 'text': f'{self.name}:{crop.label}', 'confidence': 0.9}
+                for crop, box in zip(batch.crops, batch.boxes)]
+
+
+def _page_batch(page_num, widths):
+    crops = [_Crop(f'{page_num}.{index}', width) for index, width in enumerate(widths)]
+    boxes = [((0, 10 * index), (width, 10 * index), (width, 10 * index + 8), (0, 10 * index + 8))
+             for index, width in enumerate(widths)]
+    return CropBatch(crops, boxes)
+
+
+class TestRecognitionBatcher(unittest.TestCase):
+    def test_lines_are_batched_by_width_and_returned_in_page_order(self):
+        engine = _RecordingEngine('a')
+        with EnsembleRunner([engine]) as ensemble:
+            batcher = RecognitionBatcher(ensemble, batch_size=3, max_latency=None)
+            completed = []
+            for page_num, widths in enumerate([[100, 800, 110], [820, 105], [], [790, 120]]):
+                completed += batcher.add_page(page_num, _page_batch(page_num, widths), context=page_num * 10)
+            completed += batcher.flush()
+
+        self.assertEqual(engine.batches, [['0.0', '0.2', '1.1'], ['0.1', '1.0', '3.0'], ['3.1']])
+        self.assertEqual([(page_num, context) for page_num, _, _, context in completed],
+                         [(0, 0), (1, 10), (2, 20), (3, 30)])
+        page_num, responses, partial, _ = completed[0]
+        self.assertFalse(partial)
+        self.assertEqual([line['text'] for line in responses[0][1]], ['a:0.0', 'a:0.1', 'a:0.2'])
+        self.assertEqual(responses[0][1][1]['bbox'], ((0, 10), (800, 10), (800, 18), (0, 18)))
+        self.assertEqual(completed[2][1], [])
+        self.assertEqual(aspect_bucket(_Crop('x', 100)), aspect_bucket(_Crop('y', 110)))
+        self.assertNotEqual(aspect_bucket(_Crop('x', 100)), aspect_bucket(_Crop('y', 800)))
+
+    def test_max_latency_flushes_partial_batches(self):
+        engine = _RecordingEngine('a')
+        now = [0.0]
+        with EnsembleRunner([engine]) as ensemble:
+            batcher = RecognitionBatcher(ensemble, batch_size=100, max_latency=1.0, clock=lambda: now[0])
+            self.assertEqual(batcher.add_page(0, _page_batch(0, [100])), [])
+            now[0] = 1.5
+            completed = batcher.add_page(1, _page_batch(1, [800]))
+
+        self.assertEqual([page_num for page_num, _, _, _ in completed], [0, 1])
+        self.assertEqual(engine.batches, [['0.0'], ['1.0']])
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_waiting_pages_keep_their_crop_buffers_alive(self):
+        class _Pixmap:
+            def __init__(self, value, width):
+                self.buffer = bytearray([value]) * (8 * width * 3)
+
+        class _ReadingEngine(_RecordingEngine):
+            def infer(self, batch):
+                self.batches.append([int(crop.mean()) for crop in batch.crops])
+                self.owners_alive = [owner() is not None for owner in owners]
+                return [{'bbox': box, 'text': 'x', 'confidence': 0.9} for box in batch.boxes]
+
+        owners, completed = [], []
+        engine = _ReadingEngine('a')
+        with EnsembleRunner([engine]) as ensemble:
+            batcher = RecognitionBatcher(ensemble, batch_size=2, max_latency=None)
+            for page_num in range(2):
+                pixmap = _Pixmap(page_num + 1, 100)
+                owners.append(weakref.ref(pixmap))
+                # Like a pixmap's samples: the array does not own the pixmap.
+                crop = np.asarray(memoryview(pixmap.buffer)).reshape(8, 100, 3)
+                boxes = [((0, 0), (100, 0), (100, 8), (0, 8))]
+                completed += batcher.add_page(page_num, CropBatch([crop], boxes, keepalive=[pixmap]))
+                del pixmap, crop
+            # Page 0 waited for page 1's crop; the batcher kept its pixmap until both were read.
+            self.assertEqual(engine.batches, [[1, 2]])
+            self.assertEqual(engine.owners_alive, [True, True])
+            self.assertEqual([page[0] for page in completed], [0, 1])
+            self.assertEqual([owner() for owner in owners], [None, None])
+
+
+class _Matrix:
+    def __init__(self, zoom_x, zoom_y):
+        self.zoom = zoom_x
+
+
+class _Page:
+    rect = (0.0, 0.0, 600.0, 800.0)
+
+    def __init__(self, index):
+        self.index = index
+
+    def get_pixmap(self, matrix, clip=None, alpha=False):
+        return ('crop', self.index, clip) if clip else ('page', self.index)
+
+
+class _Document:
+    def load_page(self, index):
+        return _Page(index)
+
+
+class _FakePaddle:
+    def __init__(self):
+        self.recognition_calls = []
+
+    def ocr(self, image, det=True, rec=True, cls=True):
+        if not rec:
+            _, index = image
+            return [[[[10, 20 + 30 * line], [100 + 40 * line, 20 + 30 * line],
+                      [100 + 40 * line, 40 + 30 * line], [10, 40 + 30 * line]] for line in range(index + 1)]]
+        self.recognition_calls.append(len(image))
+        return [[(f'p{index}@{clip[1]:.0f}', 0.9) for _, index, clip in image]]
+
+
+class TestBatchedPdfPageSource(unittest.TestCase):
+    def setUp(self):
+        ENGINE_POOL.clear()
+
+    def tearDown(self):
+        ENGINE_POOL.clear()
+
+    @patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix)
+    @patch('src.ocr_poc.fitz')
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_batched_rows_match_page_by_page_rows(self, MockPaddleOCR, mock_fitz, _):
+        mock_fitz.Matrix.side_effect = _Matrix
+        paddle = _FakePaddle()
+        MockPaddleOCR.return_value = paddle
+        engines = create_ocr_engines([EngineConfig(name='a'), EngineConfig(name='b', weight=0.5)])
+        source = _PdfPageSource(_Document(), 144, detect_dpi=144)
+
+        with EnsembleRunner(engines) as ensemble:
+            expected = [(page_num, source.ocr(page_num, ensemble)) for page_num in range(4)]
+            paddle.recognition_calls.clear()
+            batched = list(source.iter_batched(range(4), ensemble, batch_size=4, max_latency=None))
+
+        self.assertEqual(batched, expected)
+        self.assertEqual(sum(len(rows) for _, rows in batched), 10)
+        # Two engines share one backend; each batch is one recognizer call per engine.
+        self.assertTrue(all(size <= 4 for size in paddle.recognition_calls))
+        self.assertLess(len(paddle.recognition_calls), 2 * 4 * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from benchmarks.run import check_targets, compare_reports
+from benchmarks.synthetic import SyntheticEngine, generate_document
+
+
+def _report(seconds, peak_rss_mb=100.0):
+    return {"version": 1, "peak_rss_mb": peak_rss_mb,
+            "results": {name: {"seconds": value, "items": 10} for name, value in seconds.items()}}
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_document_is_deterministic(self):
+        pages = generate_document(3, 5, 12, seed=4)
+        self.assertEqual(pages, generate_document(3, 5, 12, seed=4))
+        self.assertEqual([len(lines) for lines in pages], [5, 5, 5])
+        for line in pages[0]:
+            x0, y0, x1, y1 = line['bbox']
+            self.assertTrue(line['text'] and x0 < x1 and y0 < y1)
+
+        engine = SyntheticEngine('synthetic', pages, error_rate=0.0)
+        lines = engine.infer(1)
+        self.assertEqual([line['text'] for line in lines], [line['text'] for line in pages[1]])
+        self.assertEqual(lines, SyntheticEngine('synthetic', pages, error_rate=0.0).infer(1))
+
+    def test_compare_flags_regressions_beyond_threshold_and_noise(self):
+        baseline = _report({"run_ocr[small]": 1.0, "calculate_cer[small]": 0.001, "match_boxes[small]": 0.5})
+        current = _report({"run_ocr[small]": 1.5, "calculate_cer[small]": 0.003, "match_boxes[small]": 0.55,
+                           "calculate_iou[small]": 0.2})
+        rows, regressions = compare_reports(baseline, current, threshold=0.2, min_seconds=0.005)
+        self.assertEqual(regressions, ["run_ocr[small]"])
+        self.assertEqual([row[0] for row in rows], ["calculate_cer[small]", "match_boxes[small]", "run_ocr[small]"])
+
+        self.assertEqual(check_targets(current), [])
+        slow = _report({"run_ocr[small]": 70.0}, peak_rss_mb=9000.0)
+        self.assertEqual(len(check_targets(slow)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
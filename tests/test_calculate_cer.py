@@ -0,0 +1,72 @@
+import multiprocessing
+import random
+import unittest
+from unittest.mock import patch
+
+from scripts.calculate_cer import (
+    _banded_distance,
+    _bit_parallel_distance,
+    _dp_distance,
+    calculate_cer,
+    calculate_cer_batch,
+)
+
+_ALPHABET = 'あいう日本語漢字検査ab'
+
+
+def _random_pairs(count, seed=3):
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        truth = ''.join(rng.choice(_ALPHABET) for _ in range(rng.randrange(0, 90)))
+        hypothesis = list(truth)
+        for _ in range(rng.randrange(0, 12)):
+            position = rng.randrange(len(hypothesis) + 1)
+            if rng.random() < 0.5 or not hypothesis:
+                hypothesis.insert(position, rng.choice(_ALPHABET))
+            else:
+                del hypothesis[min(position, len(hypothesis) - 1)]
+        pairs.append((truth, ''.join(hypothesis)))
+    return pairs
+
+
+@patch('scripts.calculate_cer.Levenshtein', None)
+class TestCalculateCer(unittest.TestCase):
+    def test_bit_parallel_matches_dp(self):
+        for truth, hypothesis in _random_pairs(400):
+            self.assertEqual(_bit_parallel_distance(truth, hypothesis), _dp_distance(truth, hypothesis))
+        # Patterns longer than a machine word.
+        long_truth = _ALPHABET * 40
+        self.assertEqual(_bit_parallel_distance(long_truth, long_truth[3:] + '字'),
+                         _dp_distance(long_truth, long_truth[3:] + '字'))
+
+    def test_bounded_distance_is_exact_within_bound(self):
+        for truth, hypothesis in _random_pairs(400):
+            distance = _dp_distance(truth, hypothesis)
+            for bound in (0, 1, 3, 8):
+                expected = min(distance, bound + 1)
+                self.assertEqual(_banded_distance(truth, hypothesis, bound), expected)
+                self.assertEqual(_bit_parallel_distance(truth, hypothesis, bound), expected)
+
+    def test_max_cer_is_exact_up_to_threshold(self):
+        for truth, hypothesis in _random_pairs(400):
+            exact = calculate_cer(truth, hypothesis)
+            for max_cer in (0.0, 0.05, 0.2):
+                bounded = calculate_cer(truth, hypothesis, max_cer)
+                if exact <= max_cer:
+                    self.assertEqual(bounded, exact)
+                else:
+                    self.assertGreater(bounded, max_cer)
+                    self.assertLessEqual(bounded, exact)
+
+    def test_batch_keeps_order_across_workers(self):
+        pairs = _random_pairs(300)
+        expected = [calculate_cer(truth, hypothesis, 0.1) for truth, hypothesis in pairs]
+        self.assertEqual(calculate_cer_batch(pairs, max_cer=0.1), expected)
+        self.assertEqual(calculate_cer_batch(pairs, max_cer=0.1, workers=2, chunk_size=64,
+                                             mp_context=multiprocessing.get_context('fork')),
+                         expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import contextlib
+import math
+import random
+import unittest
+from unittest.mock import patch
+
+from scripts.calculate_iou import (
+    calculate_iou,
+    calculate_iou_batch,
+    calculate_iou_matrix,
+    calculate_quad_iou,
+    calculate_quad_iou_batch,
+    calculate_quad_iou_matrix,
+)
+
+
+def _as_list(values):
+    return values.tolist() if hasattr(values, 'tolist') else values
+
+
+def _rotated_box(rng):
+    cx, cy = rng.uniform(0, 60), rng.uniform(0, 60)
+    w, h, angle = rng.uniform(0, 50), rng.uniform(0, 20), rng.uniform(-1.0, 1.0)
+    corners = [(-w / 2, -h / 2), (w / 2, -h / 2), (w / 2, h / 2), (-w / 2, h / 2)]
+    quad = [(cx + x * math.cos(angle) - y * math.sin(angle), cy + x * math.sin(angle) + y * math.cos(angle))
+            for x, y in corners]
+    return quad if rng.random() < 0.5 else quad[::-1]
+
+
+class TestCalculateIou(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.boxes_a = []
+        self.boxes_b = []
+        for _ in range(200):
+            x, y = rng.uniform(0, 50), rng.uniform(0, 50)
+            self.boxes_a.append([x, y, x + rng.uniform(0, 30), y + rng.uniform(0, 30)])
+            x, y = x + rng.uniform(-8, 8), y + rng.uniform(-8, 8)
+            self.boxes_b.append([x, y, x + rng.uniform(0, 30), y + rng.uniform(0, 30)])
+        self.quads_a = [_rotated_box(rng) for _ in range(200)]
+        self.quads_b = [_rotated_box(rng) for _ in range(200)]
+
+    def test_batch_and_matrix_match_scalar_with_and_without_numpy(self):
+        expected = [calculate_iou(a, b) for a, b in zip(self.boxes_a, self.boxes_b)]
+        expected_matrix = [[calculate_iou(a, b) for b in self.boxes_b[:20]] for a in self.boxes_a[:15]]
+        for numpy_module in (None, 'installed'):
+            with self.subTest(numpy=numpy_module):
+                with patch('scripts.calculate_iou.np', None) if numpy_module is None else contextlib.nullcontext():
+                    self.assertEqual(_as_list(calculate_iou_batch(self.boxes_a, self.boxes_b)), expected)
+                    self.assertEqual(_as_list(calculate_iou_matrix(self.boxes_a[:15], self.boxes_b[:20])),
+                                     expected_matrix)
+
+    def test_quad_batch_and_matrix_match_scalar_with_and_without_numpy(self):
+        expected = [calculate_quad_iou(a, b) for a, b in zip(self.quads_a, self.quads_b)]
+        self.assertTrue(any(value > 0 for value in expected))
+        expected_matrix = [[calculate_quad_iou(a, b) for b in self.quads_b[:20]] for a in self.quads_a[:15]]
+        for numpy_module in (None, 'installed'):
+            with self.subTest(numpy=numpy_module):
+                with patch('scripts.calculate_iou.np', None) if numpy_module is None else contextlib.nullcontext():
+                    self.assertEqual(_as_list(calculate_quad_iou_batch(self.quads_a, self.quads_b)), expected)
+                    self.assertEqual(_as_list(calculate_quad_iou_matrix(self.quads_a[:15], self.quads_b[:20])),
+                                     expected_matrix)
+
+    def test_quad_iou_is_exact_for_rotated_lines(self):
+        square = [(0, 0), (2, 0), (2, 2), (0, 2)]
+        diamond = [(1, 0), (2, 1), (1, 2), (0, 1)]
+        # The inscribed diamond covers half of the square.
+        self.assertAlmostEqual(calculate_quad_iou(square, diamond), 0.5)
+        self.assertAlmostEqual(calculate_quad_iou(diamond[::-1], square), 0.5)
+
+        # Axis-aligned quads agree with the rectangle formula.
+        for a, b in zip(self.boxes_a, self.boxes_b):
+            quad_a = [(a[0], a[1]), (a[2], a[1]), (a[2], a[3]), (a[0], a[3])]
+            quad_b = [(b[0], b[1]), (b[2], b[1]), (b[2], b[3]), (b[0], b[3])]
+            self.assertAlmostEqual(calculate_quad_iou(quad_a, quad_b), calculate_iou(a, b))
+
+        # Two thin diagonal lines crossing each other barely overlap, although
+        # their axis-aligned rectangles are identical.
+        rising = [(0, 0), (1, 0), (10, 9), (9, 10)]
+        falling = [(10, 0), (9, 0), (0, 9), (1, 10)]
+        self.assertEqual(calculate_iou([0, 0, 10, 10], [0, 0, 10, 10]), 1.0)
+        self.assertLess(calculate_quad_iou(rising, falling), 0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
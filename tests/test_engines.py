@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.engines import CropBatch, EngineConfig, EnginePool, PaddleOCREngine, parse_paddle_result
+
+_BOX = [[10, 10], [100, 10], [100, 30], [10, 30]]
+
+
+class TestEnginePool(unittest.TestCase):
+    def setUp(self):
+        self.builder = MagicMock(side_effect=lambda params: MagicMock(params=params))
+        self.pool = EnginePool()
+        self.pool.register("fake", self.builder)
+
+    def test_identical_configs_share_one_lazily_built_instance(self):
+        params = {"lang": "japan"}
+        configs = [
+            EngineConfig(name="a", weight=1.0, kind="fake", params=params),
+            EngineConfig(name="b", weight=0.5, kind="fake", params=dict(params)),
+        ]
+        self.assertEqual(self.builder.call_count, 0)
+
+        first = self.pool.adapters(configs)
+        second = self.pool.adapters(configs)
+
+        self.assertEqual(self.builder.call_count, 1)
+        self.assertIs(first[0].backend, first[1].backend)
+        self.assertIs(first[0].backend, second[0].backend)
+        self.assertEqual([a.weight for a in first], [1.0, 0.5])
+
+        self.pool.get(EngineConfig(name="c", kind="fake", params={"lang": "en"}))
+        self.assertEqual(self.builder.call_count, 2)
+
+    def test_least_recently_used_instance_is_evicted_over_budget(self):
+        self.pool.memory_budget_bytes = 150 * 1024 * 1024
+        a = EngineConfig(name="a", kind="fake", params={"model": "a", "memory_mb": 100})
+        b = EngineConfig(name="b", kind="fake", params={"model": "b", "memory_mb": 100})
+
+        self.pool.get(a)
+        self.pool.get(b)
+
+        self.assertEqual(len(self.pool), 1)
+        self.assertEqual(self.pool.evictions, 1)
+        self.pool.get(b)
+        self.assertEqual(self.builder.call_count, 2)
+        self.pool.get(a)
+        self.assertEqual(self.builder.call_count, 3)
+
+    def test_instances_held_by_live_adapters_are_not_evicted(self):
+        self.pool.memory_budget_bytes = 150 * 1024 * 1024
+        a = EngineConfig(name="a", kind="fake", params={"model": "a", "memory_mb": 100})
+        b = EngineConfig(name="b", kind="fake", params={"model": "b", "memory_mb": 100})
+
+        held = self.pool.get(a)
+        self.pool.get(b)
+
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual(self.pool.evictions, 0)
+        # Only the backend of the discarded adapter can go.
+        self.assertEqual(self.pool.evict_idle(), 1)
+        del held
+        self.assertEqual(self.pool.evict_idle(), 1)
+
+    def test_unknown_kind_raises(self):
+        with self.assertRaisesRegex(RuntimeError, "Unknown engine kind"):
+            self.pool.get(EngineConfig(name="x", kind="missing"))
+
+    def test_recognize_sends_the_whole_batch_to_the_recognizer_once(self):
+        self.pool.register("paddle", lambda params: MagicMock(spec=["ocr", "text_classifier", "text_recognizer",
+                                                                    "use_angle_cls"]))
+        engine = self.pool.get(EngineConfig(name="a", kind="paddle"))
+        self.assertIsInstance(engine, PaddleOCREngine)
+        backend = engine.backend
+        backend.use_angle_cls = True
+        backend.text_classifier.side_effect = lambda crops: ([c.upper() for c in crops], [], 0.0)
+        backend.text_recognizer.side_effect = lambda crops: ([(c, 0.8) for c in crops], 0.0)
+
+        lines = engine.recognize(CropBatch(['a', 'b', 'c'], [_BOX] * 3))
+
+        self.assertEqual([line['text'] for line in lines], ['A', 'B', 'C'])
+        self.assertEqual(backend.text_recognizer.call_count, 1)
+        backend.ocr.assert_not_called()
+
+    def test_parse_paddle_result_skips_malformed_lines(self):
+        raw = [[[_BOX, ('テスト', 0.9)], ['broken'], [_BOX, ('B', 0.5)]]]
+        lines = parse_paddle_result(raw)
+        self.assertEqual([line['text'] for line in lines], ['テスト', 'B'])
+        self.assertEqual(parse_paddle_result([None]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import unittest
+
+from src.engines import EngineConfig
+from src.ensemble import STATUS_OK, STATUS_TIMEOUT, EnsembleRunner, EnsembleTimeoutError
+from src.ocr_poc import ENGINE_POOL
+
+_LINE = {'bbox': ((0, 0), (10, 0), (10, 10), (0, 10)), 'text': 'x', 'confidence': 0.9}
+
+
+class _SleepingEngine:
+    releases_gil = True
+
+    def __init__(self, name, seconds, release=None):
+        self.name = name
+        self.weight = 1.0
+        self.seconds = seconds
+        self.release = release
+
+    def infer(self, image):
+        if self.release is not None:
+            self.release.wait(self.seconds)
+        else:
+            time.sleep(self.seconds)
+        return [dict(_LINE, text=self.name)]
+
+
+class _PidEngine:
+    """Pure-Python engine: the runner must dispatch it to a separate process."""
+
+    releases_gil = False
+
+    def __init__(self, name, weight, instance):
+        self.name = name
+        self.weight = weight
+        self.config = None
+
+    def infer(self, image):
+        if image == 'hang':
+            time.sleep(30)
+        return [dict(_LINE, text=str(os.getpid()))]
+
+
+def _build_pid_backend(params):
+    return object()
+
+
+class _CountingEngine:
+    releases_gil = True
+
+    def __init__(self, name, weight, instance):
+        self.name = name
+        self.weight = weight
+        self.config = None
+        self._instance = instance
+
+    def infer(self, image):
+        self._instance.backend.append(image)
+        return [dict(_LINE)]
+
+
+class TestEnsembleRunner(unittest.TestCase):
+    def test_members_sharing_a_backend_run_it_once_per_page(self):
+        ENGINE_POOL.register('count-test', lambda params: [], adapter_cls=_CountingEngine)
+        engines = [ENGINE_POOL.get(EngineConfig(name=name, weight=weight, kind='count-test'))
+                   for name, weight in (('a', 1.0), ('b', 0.5), ('c', 0.25))]
+        engines.append(ENGINE_POOL.get(EngineConfig(name='d', kind='count-test', params={'model': 'other'})))
+        with EnsembleRunner(engines) as runner:
+            responses, timings = runner.infer('page')
+
+        self.assertEqual(engines[0]._instance.backend, ['page'])
+        self.assertEqual(engines[3]._instance.backend, ['page'])
+        self.assertEqual([engine.name for engine, _ in responses], ['a', 'b', 'c', 'd'])
+        self.assertEqual([t.name for t in timings], ['a', 'b', 'c', 'd'])
+        self.assertIsNot(responses[0][1][0], responses[1][1][0])
+        ENGINE_POOL.clear()
+
+    def test_engines_run_concurrently_and_report_wall_times(self):
+        engines = [_SleepingEngine('a', 0.2), _SleepingEngine('b', 0.2), _SleepingEngine('c', 0.2)]
+        with EnsembleRunner(engines) as runner:
+            started = time.perf_counter()
+            responses, timings = runner.infer('page')
+            elapsed = time.perf_counter() - started
+
+        self.assertLess(elapsed, 0.5)
+        self.assertEqual([engine.name for engine, _ in responses], ['a', 'b', 'c'])
+        self.assertEqual([t.status for t in timings], [STATUS_OK] * 3)
+        self.assertTrue(all(t.seconds >= 0.19 for t in timings))
+
+    def test_slow_engine_is_dropped_after_timeout(self):
+        release = threading.Event()
+        engines = [_SleepingEngine('fast', 0.0), _SleepingEngine('hung', 5.0, release)]
+        with EnsembleRunner(engines, timeout=0.2) as runner:
+            started = time.perf_counter()
+            responses, timings = runner.infer('page')
+            elapsed = time.perf_counter() - started
+            release.set()
+
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual([engine.name for engine, _ in responses], ['fast'])
+        self.assertEqual({t.name: t.status for t in timings}, {'fast': STATUS_OK, 'hung': STATUS_TIMEOUT})
+        self.assertEqual(runner.timeouts['hung'], 1)
+
+    def test_busy_engine_does_not_stall_the_following_pages(self):
+        release = threading.Event()
+        engines = [_SleepingEngine('fast', 0.0), _SleepingEngine('hung', 5.0, release)]
+        with EnsembleRunner(engines, timeout=0.2) as runner:
+            runner.infer('page 1')
+            started = time.perf_counter()
+            for page in ('page 2', 'page 3', 'page 4'):
+                responses, timings = runner.infer(page)
+                self.assertEqual([engine.name for engine, _ in responses], ['fast'])
+                self.assertEqual(timings[1].status, STATUS_TIMEOUT)
+            elapsed = time.perf_counter() - started
+
+            release.set()
+            time.sleep(0.05)
+            responses, _ = runner.infer('page 5')
+
+        self.assertLess(elapsed, 0.2)
+        self.assertEqual(runner.timeouts['hung'], 4)
+        self.assertEqual([engine.name for engine, _ in responses], ['fast', 'hung'])
+
+    def test_page_that_no_engine_answered_raises(self):
+        release = threading.Event()
+        with EnsembleRunner([_SleepingEngine('hung', 5.0, release)], timeout=0.1) as runner:
+            with self.assertRaises(EnsembleTimeoutError):
+                runner.infer('page')
+            release.set()
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "fork start method is required for the test registry")
+    def test_gil_bound_engine_runs_in_a_process_that_is_killed_on_timeout(self):
+        ENGINE_POOL.register('pid-test', lambda params: object(), adapter_cls=_PidEngine)
+        ENGINE_POOL.clear()
+        engine = ENGINE_POOL.get(EngineConfig(name='pid', kind='pid-test'))
+
+        with EnsembleRunner([engine], timeout=5.0, mp_context=multiprocessing.get_context('fork')) as runner:
+            responses, _ = runner.infer('page')
+            self.assertNotEqual(responses[0][1][0]['text'], str(os.getpid()))
+
+            runner.timeout = 0.3
+            with self.assertRaises(EnsembleTimeoutError):
+                runner.infer('hang')
+            self.assertEqual(runner.timeouts['pid'], 1)
+
+            runner.timeout = 5.0
+            responses, _ = runner.infer('page')
+            self.assertEqual(len(responses), 1)
+        ENGINE_POOL.clear()
+
+    def test_spawned_process_builds_an_engine_kind_registered_at_runtime(self):
+        ENGINE_POOL.register('spawn-test', _build_pid_backend, adapter_cls=_PidEngine)
+        engine = ENGINE_POOL.get(EngineConfig(name='spawned', kind='spawn-test'))
+
+        with EnsembleRunner([engine], timeout=60.0, mp_context=multiprocessing.get_context('spawn')) as runner:
+            responses, timings = runner.infer('page')
+
+        self.assertEqual(timings[0].status, STATUS_OK)
+        self.assertNotEqual(responses[0][1][0]['text'], str(os.getpid()))
+        ENGINE_POOL.clear()
+
+    def test_spawned_process_rejects_an_unpicklable_builder(self):
+        ENGINE_POOL.register('lambda-test', lambda params: object(), adapter_cls=_PidEngine)
+        engine = ENGINE_POOL.get(EngineConfig(name='lambda', kind='lambda-test'))
+
+        with EnsembleRunner([engine], mp_context=multiprocessing.get_context('spawn')) as runner:
+            with self.assertRaisesRegex(RuntimeError, "must be picklable"):
+                runner.infer('page')
+        ENGINE_POOL.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
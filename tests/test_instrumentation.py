@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from src.instrumentation import METRICS, Instrumentation, percentile, prometheus_path
+from src.ocr_poc import run_ocr
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _StaticEngine:
+    releases_gil = True
+
+    def __init__(self, name):
+        self.name = name
+        self.weight = 1.0
+
+    def infer(self, image):
+        return [{'bbox': ((0, 0), (40, 0), (40, 10), (0, 10)), 'text': f'ページ {image}', 'confidence': 0.9}]
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_memory_samples_use_the_page_of_the_recording_thread(self):
+        metrics = Instrumentation(_FakeClock())
+        rss = {}
+        metrics.track_memory(rss_reader=lambda: rss[threading.current_thread().name])
+        metrics.current_page = 1
+        rss["MainThread"] = 100
+
+        def other_document():
+            rss[threading.current_thread().name] = 500
+            metrics.current_page = 7
+            metrics.record("render", 0.1)
+
+        thread = threading.Thread(target=other_document, name="document-2")
+        thread.start()
+        thread.join()
+        metrics.record("render", 0.1)
+        metrics.stop_memory_tracking()
+
+        self.assertEqual(metrics.current_page, 1)
+        self.assertEqual(metrics.summary()["memory"]["rss"]["top_pages"], {"8": 500, "2": 100})
+
+    def test_summary_percentiles_bottleneck_and_merge(self):
+        self.assertEqual([percentile([1, 2, 3, 4], q) for q in (0.5, 0.95)], [2, 4])
+        self.assertIsNone(percentile([], 0.5))
+
+        clock = _FakeClock()
+        metrics = Instrumentation(clock)
+        for seconds in (1.0, 2.0, 3.0):
+            with metrics.span("render"):
+                clock.now += seconds
+        metrics.record("infer", 10.0)
+        metrics.record("infer.slow", 9.0)
+        worker = Instrumentation(clock)
+        worker.page_done(4.0)
+        worker.count("pages", 2)
+        metrics.page_done(2.0)
+        metrics.merge(worker.snapshot())
+        clock.now = 10.0
+
+        summary = metrics.summary()
+        self.assertEqual(summary["bottleneck"], "infer")
+        self.assertEqual(summary["stages"]["render"]["p50"], 2.0)
+        self.assertEqual(summary["stages"]["render"]["total_seconds"], 6.0)
+        self.assertAlmostEqual(summary["stages"]["render"]["share"], 6.0 / 16.0)
+        self.assertNotIn("share", summary["stages"]["infer.slow"])
+        self.assertEqual((summary["pages"], summary["pages_per_second"]), (2, 0.2))
+        self.assertEqual((summary["page_latency"]["p50"], summary["page_latency"]["p95"]), (2.0, 4.0))
+
+        path = os.path.join(self.temp_dir, 'metrics.prom')
+        metrics.write_prometheus(path, summary)
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        self.assertIn('ocr_stage_seconds{stage="render",quantile="0.95"} 3.000000\n', text)
+        self.assertIn('ocr_stage_seconds_count{stage="infer.slow"} 1\n', text)
+        self.assertIn('ocr_page_latency_seconds{quantile="0.5"} 2.000000\n', text)
+        self.assertIn('# TYPE ocr_pages_total counter\nocr_pages_total 2\n', text)
+
+    def test_run_ocr_exports_stage_timings(self):
+        self.addCleanup(METRICS.reset)
+        metrics_path = os.path.join(self.temp_dir, 'run_metrics.json')
+        engines = [_StaticEngine('a'), _StaticEngine('b')]
+        rows = run_ocr([0, 1, 2], os.path.join(self.temp_dir, 'out.csv'), engines, metrics_path=metrics_path)
+
+        self.assertEqual(len(rows), 3)
+        with open(metrics_path, encoding='utf-8') as f:
+            summary = json.load(f)
+        self.assertTrue(os.path.exists(prometheus_path(metrics_path)))
+        self.assertEqual((summary["pages"], summary["counters"]["lines"]), (3, 3))
+        self.assertEqual(summary["page_latency"]["count"], 3)
+        for stage in ("infer", "infer.a", "infer.b", "vote", "postprocess", "csv_write"):
+            self.assertEqual(summary["stages"][stage]["count"], 3, stage)
+        self.assertIn(summary["bottleneck"], summary["stages"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.job_journal import JobJournal
+from src.ocr_poc import ENGINE_POOL, default_csv_path, default_journal_path, process_pdf
+from tests.test_ocr_poc import _FakeDocument, _fake_page_ocr
+
+
+def _row(page, text):
+    return {'page': page, 'block_id': 0, 'x0': 1.0, 'y0': 2.0, 'x1': 3.0, 'y1': 4.0,
+            'text': text, 'confidence': 0.9}
+
+
+class TestJobJournal(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tempdir.name, 'job.journal')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_torn_tail_is_truncated_on_resume(self):
+        journal = JobJournal(self.path, {'pdf': 'abc'})
+        journal.record_page(0, [_row(0, '精度')])
+        journal.record_page(1, [_row(1, '日本語')])
+        journal.close()
+        intact_size = os.path.getsize(self.path)
+        with open(self.path, 'ab') as f:
+            f.write(b'0badc0de {"page": 2, "ro')
+
+        resumed = JobJournal(self.path, {'pdf': 'abc'}, resume=True)
+        self.assertEqual(resumed.pages, {0: [_row(0, '精度')], 1: [_row(1, '日本語')]})
+        self.assertEqual(os.path.getsize(self.path), intact_size)
+        resumed.record_page(2, [_row(2, 'x')], text_layer=True)
+        # Fresh pages are only tracked, not kept in memory.
+        self.assertEqual((sorted(resumed.done), sorted(resumed.pages)), ([0, 1, 2], [0, 1]))
+        resumed.close()
+        reloaded = JobJournal(self.path, {'pdf': 'abc'}, resume=True)
+        self.assertEqual((sorted(reloaded.pages), reloaded.text_layer_pages), ([0, 1, 2], {2}))
+        reloaded.close()
+
+    def test_resume_rejects_journal_of_another_job(self):
+        JobJournal(self.path, {'pdf': 'abc', 'dpi': 72}).close()
+        with self.assertRaises(RuntimeError):
+            JobJournal(self.path, {'pdf': 'abc', 'dpi': 144}, resume=True)
+
+
+class TestProcessPdfResume(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tempdir.name, 'doc.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4 fake')
+        ENGINE_POOL.clear()
+
+    def tearDown(self):
+        ENGINE_POOL.clear()
+        self.tempdir.cleanup()
+
+    def _read_csv(self):
+        with open(default_csv_path(self.pdf_path), 'rb') as f:
+            return f.read()
+
+    @patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix)
+    @patch('src.ocr_poc.fitz')
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_resume_skips_journaled_pages_and_rebuilds_identical_csv(self, MockPaddleOCR, mock_fitz, _):
+        mock_fitz.open.side_effect = lambda path: _FakeDocument(5)
+        MockPaddleOCR.return_value.ocr.side_effect = _fake_page_ocr
+        process_pdf(self.pdf_path)
+        expected = self._read_csv()
+        self.assertFalse(os.path.exists(default_journal_path(self.pdf_path)))
+
+        def crash_on_page_3(image, cls=True):
+            if image[1] == 3:
+                raise KeyboardInterrupt
+            return _fake_page_ocr(image, cls)
+
+        ENGINE_POOL.clear()
+        MockPaddleOCR.return_value.ocr.side_effect = crash_on_page_3
+        with self.assertRaises(KeyboardInterrupt):
+            process_pdf(self.pdf_path)
+        self.assertTrue(os.path.exists(default_journal_path(self.pdf_path)))
+
+        ENGINE_POOL.clear()
+        MockPaddleOCR.return_value.ocr.side_effect = _fake_page_ocr
+        MockPaddleOCR.return_value.ocr.reset_mock()
+        line_count = process_pdf(self.pdf_path, resume=True)
+
+        recognized_pages = {call.args[0][1] for call in MockPaddleOCR.return_value.ocr.call_args_list}
+        self.assertEqual(recognized_pages, {3, 4})
+        self.assertEqual(self._read_csv(), expected)
+        self.assertEqual(line_count, expected.count(b'\n') - 1)
+        self.assertFalse(os.path.exists(default_journal_path(self.pdf_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
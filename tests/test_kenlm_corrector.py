@@ -0,0 +1,142 @@
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from scripts.kenlm_corrector import ArpaModel, KenLMCorrector
+from scripts.lm_binary import MappedModel, convert_arpa, is_binary_model
+from src.ocr_poc import _rows_from_lines
+
+ARPA = """\\data\\
+ngram 1=9
+ngram 2=6
+
+\\1-grams:
+-1.0\t<s>\t-0.5
+-1.0\t</s>
+-1.5\tテ\t-0.3
+-1.5\tス\t-0.3
+-1.5\tト\t-0.3
+-2.0\tて\t-0.2
+-2.0\tす\t-0.2
+-2.0\tと\t-0.2
+-3.0\t<unk>
+
+\\2-grams:
+-0.2\t<s>\tテ
+-0.1\tテ\tス
+-0.1\tス\tト
+-0.3\tト\t</s>
+-1.0\t<s>\tて
+-1.0\tて\tす
+
+\\end\\
+"""
+
+
+class TestKenLMCorrector(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.model_path = os.path.join(self.temp_dir, 'chars.arpa')
+        with open(self.model_path, 'w', encoding='utf-8') as f:
+            f.write(ARPA)
+        patcher = patch('scripts.kenlm_corrector.kenlm', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_arpa_model_backs_off_like_kenlm(self):
+        model = ArpaModel(self.model_path)
+        self.assertEqual(model.order, 2)
+        self.assertAlmostEqual(model.score('テ ス ト'), -0.2 - 0.1 - 0.1 - 0.3)
+        # す -> と is unseen: backoff(す) + p(と); と -> </s> likewise.
+        self.assertAlmostEqual(model.score('て す と'), -1.0 - 1.0 + (-0.2 - 2.0) + (-0.2 - 1.0))
+        self.assertAlmostEqual(model.score('X', bos=False, eos=False), -3.0)
+
+    def test_margin_rule_and_score_cache(self):
+        corrector = KenLMCorrector(self.model_path, tau=1.0)
+        self.assertEqual(corrector.correct('てすと', ['テスト']), 'テスト')
+        self.assertEqual(corrector.correct('テスト', ['てすと']), 'テスト')
+        strict = KenLMCorrector(self.model_path, tau=10.0)
+        self.assertEqual(strict.correct('てすと', ['テスト']), 'てすと')
+
+        # Lines without a differing alternative are not scored at all.
+        corrector = KenLMCorrector(self.model_path)
+        self.assertEqual(corrector.choose_batch([('テスト', []), ('テスト', ['テスト', ''])]), [0, 0])
+        self.assertEqual(corrector._scores.misses, 0)
+
+        choices = corrector.choose_batch([('てすと', ['テ スト', 'テスト'])] * 50)
+        self.assertEqual(choices, [1] * 50)
+        self.assertEqual(corrector._scores.misses, 3)
+        corrector.choose_batch([('てすと', ['テスト'])])
+        self.assertEqual(corrector._scores.misses, 3)
+
+    def test_rows_keep_replaced_text_as_alternative(self):
+        corrector = KenLMCorrector(self.model_path)
+        lines = [{'bbox': ((0, 0), (10, 0), (10, 5), (0, 5)), 'text': 'てすと', 'confidence': 0.9, 'engine': 'a',
+                  'alternatives': [{'text': 'テスト', 'confidence': 0.8, 'engine': 'b'}]}]
+        rows = _rows_from_lines(0, lines, corrector)
+        self.assertEqual((rows[0]['text'], rows[0]['confidence']), ('テスト', 0.8))
+        self.assertEqual(rows[0]['alternatives'], [{'text': 'てすと', 'confidence': 0.9, 'engine': 'a'}])
+
+        restored = pickle.loads(pickle.dumps(corrector))
+        self.assertEqual(restored.correct('てすと', ['テスト']), 'テスト')
+        self.assertEqual(restored.settings(), corrector.settings())
+
+    def test_memory_mapped_model_scores_like_arpa(self):
+        binary_path = os.path.join(self.temp_dir, 'chars.lmbin')
+        self.assertEqual(convert_arpa(self.model_path, binary_path), 15)
+        self.assertTrue(is_binary_model(binary_path))
+        self.assertFalse(is_binary_model(self.model_path))
+
+        arpa, mapped = ArpaModel(self.model_path), MappedModel(binary_path)
+        self.addCleanup(mapped.close)
+        self.assertEqual((mapped.order, mapped.unknown_logprob), (2, -3.0))
+        for sentence in ['テ ス ト', 'て す と', 'テ す X ト', '', 'X']:
+            for bos, eos in [(True, True), (False, False)]:
+                self.assertAlmostEqual(mapped.score(sentence, bos, eos), arpa.score(sentence, bos, eos), places=5)
+
+        corrector = pickle.loads(pickle.dumps(KenLMCorrector(binary_path)))
+        self.assertIsInstance(corrector.model, MappedModel)
+        self.assertEqual(corrector.correct('てすと', ['テスト']), 'テスト')
+
+    def test_corrector_can_be_shared_between_threads(self):
+        corrector = KenLMCorrector(self.model_path, cache_size=4)
+        texts = ['テスト', 'てすと', 'テすと', 'てスト', 'すて', 'とす']
+        expected = corrector.score_batch(texts)
+        errors = []
+
+        def score():
+            try:
+                for _ in range(300):
+                    self.assertEqual(corrector.score_batch(texts), expected)
+            except Exception as exc:  # reported below, not lost in the thread
+                errors.append(exc)
+
+        threads = [threading.Thread(target=score) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_unloadable_model_raises(self):
+        with self.assertRaisesRegex(RuntimeError, 'Could not load language model'), \
+                self.assertLogs('scripts.kenlm_corrector', level='ERROR'):
+            KenLMCorrector(os.path.join(self.temp_dir, 'missing.arpa'))
+
+    def test_conversion_rejects_more_ngrams_than_declared(self):
+        bad_path = os.path.join(self.temp_dir, 'bad.arpa')
+        with open(bad_path, 'w', encoding='utf-8') as f:
+            f.write(ARPA.replace('ngram 2=6', 'ngram 2=5'))
+        with self.assertRaisesRegex(RuntimeError, 'More 2-grams than the 5 declared'):
+            convert_arpa(bad_path, os.path.join(self.temp_dir, 'bad.lmbin'))
+
+
+if __name__ == '__main__':
+    unittest.main()
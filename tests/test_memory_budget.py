@@ -0,0 +1,110 @@
+import unittest
+
+from src.batching import RecognitionBatcher
+from src.engines import CropBatch
+from src.ensemble import EnsembleRunner
+from src.instrumentation import Instrumentation
+from src.memory_budget import MemoryBudget, parse_memory_size, split_memory_budget
+
+MB = 1024 ** 2
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Crop:
+    def __init__(self, width):
+        self.shape = (32, width, 3)
+
+
+class _EchoEngine:
+    releases_gil = True
+    name = 'echo'
+    weight = 1.0
+
+    def infer(self, batch):
+        return [{'bbox': box, 'text': 'x', 'confidence': 0.9} for box in batch.boxes]
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_parse_memory_size(self):
+        self.assertEqual(parse_memory_size("8G"), 8 * 1024 * MB)
+        self.assertEqual(parse_memory_size("512MiB"), 512 * MB)
+        self.assertEqual(parse_memory_size("1.5g"), int(1.5 * 1024 * MB))
+        self.assertEqual(parse_memory_size("300"), 300 * MB)
+        with self.assertRaises(RuntimeError):
+            parse_memory_size("lots")
+
+    def test_worker_shares_leave_room_for_the_parent(self):
+        self.assertEqual(split_memory_budget(1000 * MB, 4, reserved_bytes=200 * MB), 200 * MB)
+        with self.assertRaises(RuntimeError):
+            split_memory_budget(1000 * MB, 4, reserved_bytes=1000 * MB)
+
+    def test_reliefs_run_in_order_until_below_high_water_with_cooldown(self):
+        rss = [900 * MB]
+        clock = _FakeClock()
+        budget = MemoryBudget(1000 * MB, high_water=0.8, cooldown=1.0, rss_reader=lambda: rss[0], clock=clock)
+        calls = []
+
+        def relief(name, freed, available=True):
+            def relieve():
+                calls.append(name)
+                rss[0] -= freed
+                return available
+            return relieve
+
+        budget.register("nothing_cached", relief("nothing_cached", 0, available=False))
+        budget.register("cache", relief("cache", 50 * MB))
+        budget.register("batch", relief("batch", 100 * MB))
+        budget.register("engines", relief("engines", 100 * MB))
+        metrics = Instrumentation(clock)
+        budget.attach(metrics)
+
+        metrics.current_page = 4
+        metrics.record("infer", 0.1)
+        self.assertEqual(calls, ["nothing_cached", "cache", "batch"])
+        self.assertEqual([(a["action"], a["stage"], a["page"]) for a in budget.adaptations],
+                         [("cache", "infer", 5), ("batch", "infer", 5)])
+
+        # Still high, but within the cooldown: nothing runs.
+        rss[0] = 950 * MB
+        metrics.record("vote", 0.1)
+        self.assertEqual(len(calls), 3)
+        clock.now = 2.0
+        rss[0] = 1200 * MB
+        metrics.record("vote", 0.1)
+        self.assertEqual(calls[3:], ["nothing_cached", "cache", "batch", "engines"])
+        self.assertEqual(budget.report()["over_budget_samples"], 1)
+
+        memory = metrics.summary()["memory"]["rss"]
+        self.assertEqual(memory["peak_bytes"], 1200 * MB)
+        self.assertEqual((memory["peak_page"], memory["peak_stage"]), (5, "vote"))
+        self.assertEqual(memory["stages"]["infer"], 900 * MB)
+        merged = Instrumentation(clock)
+        merged.merge(metrics.snapshot())
+        self.assertEqual(merged.summary()["memory"]["rss"]["top_pages"], {"5": 1200 * MB})
+
+    def test_batcher_shrink_bounds_batch_size_and_pending_pages(self):
+        with EnsembleRunner([_EchoEngine()]) as ensemble:
+            batcher = RecognitionBatcher(ensemble, batch_size=8, max_latency=None)
+            boxes = [((0, 0), (10, 0), (10, 8), (0, 8))]
+            for page_num in range(4):
+                self.assertEqual(batcher.add_page(page_num, CropBatch([_Crop(100)], boxes)), [])
+            self.assertTrue(batcher.shrink())
+            self.assertEqual((batcher.batch_size, batcher.max_pending_pages), (4, 2))
+            completed = batcher.add_page(4, CropBatch([_Crop(100)], boxes))
+            self.assertEqual([page[0] for page in completed], [0, 1, 2, 3, 4])
+            while batcher.shrink():
+                pass
+            self.assertEqual((batcher.batch_size, batcher.max_pending_pages), (1, 1))
+            completed = batcher.add_page(5, CropBatch([_Crop(100)], boxes))
+            self.assertEqual([page[0] for page in completed], [5])
+
+
+if __name__ == '__main__':
+    unittest.main()
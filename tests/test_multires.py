@@ -0,0 +1,84 @@
+import pickle
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.engines import CropBatch, EngineConfig
+from src.ensemble import EnsembleRunner
+from src.ocr_poc import ENGINE_POOL, _PdfPageSource, create_ocr_engines
+
+
+class _Matrix:
+    def __init__(self, zoom_x, zoom_y):
+        self.zoom = zoom_x
+
+
+class _Page:
+    rect = (0.0, 0.0, 600.0, 800.0)
+
+    def __init__(self):
+        self.renders = []
+
+    def get_pixmap(self, matrix, clip=None, alpha=False):
+        self.renders.append((matrix.zoom, clip))
+        return ('crop', clip) if clip else ('page', matrix.zoom)
+
+
+class _Document:
+    def __init__(self, page):
+        self.page = page
+
+    def load_page(self, index):
+        return self.page
+
+
+def _fake_paddle(image, det=True, rec=True, cls=True):
+    if not rec:
+        # Lines detected on the 1x (72 dpi) render, deliberately out of order.
+        return [[[[10, 100], [200, 100], [200, 120], [10, 120]],
+                 [[10, 20], [300, 20], [300, 40], [10, 40]],
+                 [[595, 795], [640, 795], [640, 805], [595, 805]]]]
+    raise AssertionError("full-page OCR must not run in multi-resolution mode")
+
+
+def _fake_recognizer(crops):
+    return [(f'line@{clip[1]:.0f}', 0.9) if clip[1] < 700 else ('', 0.0) for _, clip in crops], 0.01
+
+
+class TestMultiResolution(unittest.TestCase):
+    def setUp(self):
+        ENGINE_POOL.clear()
+
+    def tearDown(self):
+        ENGINE_POOL.clear()
+
+    @patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix)
+    @patch('src.ocr_poc.fitz')
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_lines_are_recognized_on_high_dpi_crops(self, MockPaddleOCR, mock_fitz, _):
+        mock_fitz.Matrix.side_effect = _Matrix
+        MockPaddleOCR.return_value.ocr.side_effect = _fake_paddle
+        MockPaddleOCR.return_value.text_recognizer.side_effect = _fake_recognizer
+        MockPaddleOCR.return_value.use_angle_cls = False
+        page = _Page()
+        engines = create_ocr_engines([EngineConfig(name='a'), EngineConfig(name='b', weight=0.5)])
+
+        source = _PdfPageSource(_Document(page), 288, detect_dpi=72)
+        with EnsembleRunner(engines) as ensemble:
+            rows = source.ocr(0, ensemble)
+
+        self.assertEqual(page.renders[0], (1.0, None))
+        self.assertEqual([zoom for zoom, _ in page.renders[1:]], [4.0, 4.0, 4.0])
+        self.assertEqual(page.renders[1][1], (7.0, 17.0, 303.0, 43.0))
+        self.assertEqual(page.renders[3][1], (593.0, 793.0, 600.0, 800.0))
+        self.assertEqual([row['text'] for row in rows], ['line@17', 'line@97'])
+        self.assertEqual((rows[0]['x0'], rows[0]['y0'], rows[0]['x1'], rows[0]['y1']),
+                         (40.0, 80.0, 1200.0, 160.0))
+
+    def test_crop_batch_pickles_without_buffer_owners(self):
+        batch = CropBatch(['crop'], [((0, 0), (1, 0), (1, 1), (0, 1))], keepalive=[MagicMock()])
+        restored = pickle.loads(pickle.dumps(batch))
+        self.assertEqual((restored.crops, restored.keepalive), (['crop'], []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,12 @@
 import unittest
+import multiprocessing
 import os
 import shutil
 import csv
-from unittest.mock import patch
+import random
+import sys
+import weakref
+from unittest.mock import MagicMock, patch
 
 try:
     import fitz  # type: ignore
@@ -10,10 +14,81 @@ try:
 except ImportError:  # pragma: no cover - optional dependency in tests
     HAS_PYMUPDF = False
 
-from src.ocr_poc import pdf_to_images, run_ocr, _remove_redundant_cjk_spaces
+try:
+    import numpy  # type: ignore
+    HAS_NUMPY = True
+except ImportError:  # pragma: no cover - optional dependency in tests
+    HAS_NUMPY = False
+
+from src.engines import EngineConfig
+from src.ocr_poc import (
+    ENGINE_POOL,
+    create_ocr_engines,
+    iter_ocr_results,
+    iter_page_images,
+    pdf_to_images,
+    pixmap_to_array,
+    run_ocr,
+    run_ocr_parallel,
+    split_page_ranges,
+    write_pages_csv,
+    _is_cjk_like,
+    _worker_thread_limits,
+    _remove_redundant_cjk_spaces,
+    _remove_redundant_cjk_spaces_batch,
+)
 from scripts.calculate_cer import calculate_cer
 from scripts.calculate_iou import calculate_iou
 
+class _FakePage:
+    """Scanned page: no text layer."""
+
+    rect = (0.0, 0.0, 595.0, 842.0)
+    rotation = 0
+
+    def __init__(self, index):
+        self.index = index
+
+    def get_pixmap(self, **kwargs):
+        return ('pixmap', self.index)
+
+    def get_text(self, option):
+        return {'blocks': []}
+
+    def get_image_info(self):
+        return [{'bbox': self.rect}]
+
+
+class _FakeDocument:
+    def __init__(self, page_count):
+        self.page_count = page_count
+
+    def __len__(self):
+        return self.page_count
+
+    def load_page(self, index):
+        return _FakePage(index)
+
+    def close(self):
+        pass
+
+
+def _fake_page_ocr(image, cls=True):
+    """Returns a page-dependent number of lines so block ids differ per page."""
+    page_index = image[1]
+    return [[
+        [[[10, 10 + 30 * line], [100, 10 + 30 * line], [100, 30 + 30 * line], [10, 30 + 30 * line]],
+         (f'p{page_index} l{line}', 0.9)]
+        for line in range(page_index % 3 + 1)
+    ]]
+
+
+class _FakePixmap:
+    def __init__(self, samples, width, height, n=3):
+        self.samples_mv = memoryview(samples)
+        self.width, self.height, self.n = width, height, n
+
+
 class TestOcrPoc(unittest.TestCase):
 
     def setUp(self):
@@ -30,6 +105,8 @@ class TestOcrPoc(unittest.TestCase):
         if os.path.exists("tests/output"):
             shutil.rmtree("tests/output")
         os.makedirs(self.output_folder)
+        # Each test patches PaddleOCR, so drop engines pooled by earlier tests.
+        ENGINE_POOL.clear()
 
     def tearDown(self):
         # Clean up created files and directories
@@ -49,6 +126,103 @@ class TestOcrPoc(unittest.TestCase):
         for path in image_paths:
             self.assertTrue(os.path.exists(path))
 
+    @unittest.skipUnless(HAS_PYMUPDF and HAS_NUMPY, "PyMuPDF and NumPy are required for in-memory rendering")
+    def test_iter_page_images_renders_in_memory(self):
+        """Pages are yielded as arrays; files are only written to the debug sink."""
+        pages = [(index, image.shape, image.copy()) for index, image in iter_page_images(self.test_pdf_path)]
+        self.assertEqual([index for index, _, _ in pages], [0, 1])
+        for _, shape, _ in pages:
+            self.assertEqual(len(shape), 3)
+            self.assertEqual(shape[2], 3)
+        self.assertEqual(os.listdir(self.output_folder), [])
+
+        list(iter_page_images(self.test_pdf_path, debug_folder=self.output_folder))
+        self.assertEqual(sorted(os.listdir(self.output_folder)), ['page_1.png', 'page_2.png'])
+
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_run_ocr_accepts_in_memory_images(self, MockPaddleOCR):
+        """In-memory page images reach the engines unchanged, without touching disk."""
+        mock_ocr_instance = MockPaddleOCR.return_value
+        mock_ocr_instance.ocr.return_value = [[[[[10, 10], [100, 10], [100, 30], [10, 30]], ('mocked text', 0.99)]]]
+        page_images = [bytearray(b'page-1'), bytearray(b'page-2')]
+
+        results = run_ocr(iter(page_images))
+
+        passed_images = [call.args[0] for call in mock_ocr_instance.ocr.call_args_list]
+        # The three default members share one backend, which runs once per page.
+        self.assertEqual(len(passed_images), 2)
+        self.assertIs(passed_images[0], page_images[0])
+        self.assertIs(passed_images[-1], page_images[1])
+        self.assertEqual([r['page'] for r in results], [0, 1])
+
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_iter_ocr_results_streams_pages_to_csv(self, MockPaddleOCR):
+        """Each page's rows are on disk before the next page is recognized."""
+        MockPaddleOCR.return_value.ocr.side_effect = _fake_page_ocr
+        pages = write_pages_csv(iter_ocr_results([('pixmap', 0), ('pixmap', 1)]), self.output_csv_path)
+
+        page_num, page_results = next(pages)
+        self.assertEqual(page_num, 0)
+        with open(self.output_csv_path, 'r', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(row['page'], row['text']) for row in rows], [('1', 'p0 l0')])
+        self.assertEqual(page_results[0]['page'], 0)
+
+        page_num, page_results = next(pages)
+        self.assertEqual((page_num, len(page_results)), (1, 2))
+        self.assertEqual(list(pages), [])
+        with open(self.output_csv_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), 3)
+
+    def test_worker_thread_limits_do_not_leak(self):
+        with patch.dict(os.environ, {"MKL_NUM_THREADS": "3"}):
+            os.environ.pop("OMP_NUM_THREADS", None)
+            with _worker_thread_limits(2):
+                self.assertEqual((os.environ["OMP_NUM_THREADS"], os.environ["MKL_NUM_THREADS"]), ("2", "3"))
+            self.assertNotIn("OMP_NUM_THREADS", os.environ)
+            self.assertEqual(os.environ["MKL_NUM_THREADS"], "3")
+
+    def test_split_page_ranges(self):
+        self.assertEqual(split_page_ranges(0, 4), [])
+        self.assertEqual(split_page_ranges(5, 1, ranges_per_worker=2), [(0, 3), (3, 5)])
+        ranges = split_page_ranges(100, 16)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], 100)
+        self.assertTrue(all(a[1] == b[0] for a, b in zip(ranges, ranges[1:])))
+
+    @unittest.skipUnless(sys.platform.startswith('linux'), "fork start method is required to share mocks")
+    @unittest.skipUnless(HAS_NUMPY, "NumPy is not installed")
+    def test_pixmap_to_array_returns_bgr_view(self):
+        pix = _FakePixmap(bytes([255, 0, 10, 0, 128, 20]), width=2, height=1)
+        image = pixmap_to_array(pix)
+        self.assertEqual(image.shape, (1, 2, 3))
+        self.assertEqual(image[0].tolist(), [[10, 0, 255], [20, 128, 0]])
+        # The array keeps the pixmap alive once the caller drops it.
+        pixmap = weakref.ref(pix)
+        del pix
+        self.assertIsNotNone(pixmap())
+        del image
+        self.assertIsNone(pixmap())
+
+    @patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix)
+    @patch('src.ocr_poc.fitz')
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_run_ocr_parallel_matches_serial(self, MockPaddleOCR, mock_fitz, _):
+        """Parallel page ranges merge back into the serial row order."""
+        mock_fitz.open.return_value = _FakeDocument(7)
+        MockPaddleOCR.return_value.ocr.side_effect = _fake_page_ocr
+
+        serial = run_ocr([('pixmap', index) for index in range(7)])
+        ENGINE_POOL.clear()
+        parallel = run_ocr_parallel('doc.pdf', 3, self.output_csv_path,
+                                    mp_context=multiprocessing.get_context('fork'))
+
+        self.assertEqual(parallel, serial)
+        self.assertEqual([(r['page'], r['block_id']) for r in parallel][:4],
+                         [(0, 0), (1, 0), (1, 1), (2, 0)])
+        with open(self.output_csv_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(list(csv.DictReader(f))), len(serial))
+
     @patch('src.ocr_poc.PaddleOCR')
     def test_run_ocr_with_mock(self, MockPaddleOCR):
         """Test the OCR process and CSV output using a mock."""
@@ -100,11 +274,18 @@ class TestOcrPoc(unittest.TestCase):
         # Simulate results from three engines
         mock_result_engine_1 = [[[[[10, 10], [100, 10], [100, 30], [10, 30]], ('text_A', 0.9)]]]
         mock_result_engine_2 = [[[[[10, 10], [100, 10], [100, 30], [10, 30]], ('text_B', 0.8)]]]
-        mock_result_engine_3 = [[[[[10, 10], [100, 10], [100, 30], [10, 30]], ('text_C', 0.95)]]] # Highest confidence
+        mock_result_engine_3 = [[[[[10, 10], [100, 10], [100, 30], [10, 30]], ('text_C', 0.95)]]] # Heaviest engine
 
-        # Configure side_effect for PaddleOCR mock to return results for each engine call
-        # The run_ocr function calls ocr_engine.ocr three times per image
+        # Configure side_effect for PaddleOCR mock to return results for each engine call.
+        # Members sharing a backend run once per page, so give each its own model.
+        # A single line normalizes to the same score for every engine, so the
+        # engine weight decides the vote.
         mock_ocr_instance_1.ocr.side_effect = [mock_result_engine_1, mock_result_engine_2, mock_result_engine_3]
+        engines = create_ocr_engines([
+            EngineConfig(name=f'paddleocr_{i}', weight=weight,
+                         params={'lang': 'japan', 'rec_model_dir': f'model_{i}'})
+            for i, weight in enumerate((1.0, 1.0, 1.5))
+        ])
 
         image_paths = [os.path.join(self.output_folder, "page_1.png")]
         for path in image_paths:
@@ -112,19 +293,19 @@ class TestOcrPoc(unittest.TestCase):
                 f.write('')
 
         # Set ground truth content for this test
-        self_ground_truth_content = "text_C" # Expect highest confidence text
+        self_ground_truth_content = "text_C" # Expect the heaviest engine's text
         with open(self.ground_truth_txt_path, 'w', encoding='utf-8') as f:
             f.write(self_ground_truth_content)
 
         # Run the function
-        run_ocr(image_paths, self.output_csv_path)
+        run_ocr(image_paths, self.output_csv_path, engines=engines)
 
         # Assertions
         self.assertTrue(os.path.exists(self.output_csv_path))
         with open(self.output_csv_path, 'r', encoding='utf-8') as f:
             lines = f.readlines()
             self.assertEqual(len(lines), 2) # Header + 1 data row
-            # Expect the highest confidence text (text_C) from ensemble voting
+            # Expect the heaviest engine's text (text_C) from ensemble voting
             self.assertIn('text_C', lines[1])
 
         # Test CER calculation
@@ -207,5 +388,33 @@ class TestOcrPoc(unittest.TestCase):
         self.assertEqual(_remove_redundant_cjk_spaces('test value'), 'test value')
         self.assertEqual(_remove_redundant_cjk_spaces(''), '')
 
+    def test_cjk_space_cleanup_matches_neighbor_scan(self):
+        """The single-pass cleanup gives the same output as scanning around every space."""
+        def neighbor_scan(text):
+            kept = []
+            for index, char in enumerate(text):
+                if char in (' ', '\u3000'):
+                    prev_char = next((c for c in reversed(text[:index]) if c not in (' ', '\u3000')), '')
+                    next_char = next((c for c in text[index + 1:] if c not in (' ', '\u3000')), '')
+                    if _is_cjk_like(prev_char) and _is_cjk_like(next_char):
+                        continue
+                kept.append(char)
+            return ''.join(kept)
+
+        rng = random.Random(5)
+        alphabet = ['精', 'テ', '。', 'Ａ', '…', 'A', 'b', '1', 'α', '𠀋', '😀', ' ', ' ', '\u3000', '\n', '\t']
+        texts = [''.join(rng.choice(alphabet) for _ in range(rng.randrange(0, 30))) for _ in range(2000)]
+        expected = [neighbor_scan(text) for text in texts]
+        self.assertEqual([_remove_redundant_cjk_spaces(text) for text in texts], expected)
+        self.assertEqual(_remove_redundant_cjk_spaces_batch(texts), expected)
+        plain = [text.replace('\n', '') for text in texts]
+        self.assertEqual(_remove_redundant_cjk_spaces_batch(plain), [neighbor_scan(text) for text in plain])
+
+        # The precomputed table agrees with _is_cjk_like on every other BMP character.
+        mismatches = [hex(code_point) for code_point in range(0x10000)
+                      if chr(code_point) not in (' ', '\u3000') and (_remove_redundant_cjk_spaces('精 ' + chr(code_point)) == '精' + chr(code_point))
+                      != _is_cjk_like(chr(code_point))]
+        self.assertEqual(mismatches, [])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
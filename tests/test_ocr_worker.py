@@ -0,0 +1,109 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.ocr_worker import (
+    INVALID_PARAMS,
+    METHOD_NOT_FOUND,
+    PARSE_ERROR,
+    OcrWorker,
+    serve_stdio,
+)
+
+
+class TestOcrWorker(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.temp_path = self.tempdir.name
+        self.factory = MagicMock(side_effect=lambda **kwargs: [MagicMock(), MagicMock(), MagicMock()])
+        self.worker = OcrWorker(engine_factory=self.factory)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def _serve(self, *requests):
+        stdin = io.StringIO("".join(
+            (r if isinstance(r, str) else json.dumps(r)) + "\n" for r in requests
+        ))
+        stdout = io.StringIO()
+        serve_stdio(self.worker, stdin, stdout)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_health_and_protocol_errors(self):
+        responses = self._serve(
+            {"jsonrpc": "2.0", "id": 1, "method": "health"},
+            "{ not json",
+            {"jsonrpc": "2.0", "id": 2, "method": "unknown"},
+            {"jsonrpc": "2.0", "id": 3, "method": "ocr", "params": {"bad": 1}},
+        )
+        self.assertEqual(responses[0]["result"]["status"], "ok")
+        self.assertFalse(responses[0]["result"]["engines_loaded"])
+        self.assertEqual(responses[1]["error"]["code"], PARSE_ERROR)
+        self.assertEqual(responses[2]["error"]["code"], METHOD_NOT_FOUND)
+        self.assertEqual(responses[3]["error"]["code"], INVALID_PARAMS)
+
+    def test_engines_are_built_once_across_jobs_and_rebuilt_on_reload(self):
+        pdf_path = os.path.join(self.temp_path, "doc.pdf")
+        with open(pdf_path, "w") as f:
+            f.write("")
+
+        with patch("src.ocr_poc.process_pdf", return_value=2) as process_pdf:
+            responses = self._serve(
+                {"jsonrpc": "2.0", "id": 1, "method": "ocr",
+                 "params": {"pdf_path": pdf_path, "no_csv": True}},
+                {"jsonrpc": "2.0", "id": 2, "method": "ocr",
+                 "params": {"pdf_path": pdf_path, "no_csv": True}},
+                {"jsonrpc": "2.0", "id": 3, "method": "reload"},
+                {"jsonrpc": "2.0", "id": 4, "method": "shutdown"},
+                {"jsonrpc": "2.0", "id": 5, "method": "health"},
+            )
+
+        self.assertEqual(responses[0]["result"]["lines"], 2)
+        self.assertEqual(process_pdf.call_count, 2)
+        self.assertEqual(self.factory.call_count, 2)  # first job + reload
+        self.assertEqual(responses[2]["result"]["reload_count"], 1)
+        # Requests after shutdown are not served.
+        self.assertEqual(len(responses), 4)
+
+    def test_accuracy_review_output_is_captured(self):
+        csv_path = os.path.join(self.temp_path, "ocr.csv")
+        with open(csv_path, "w", encoding="utf-8") as f:
+            f.write("page,block_id,x0,y0,x1,y1,text,confidence\n1,0,0,0,10,10,精度,0.9\n")
+        gt_path = os.path.join(self.temp_path, "gt.json")
+        with open(gt_path, "w", encoding="utf-8") as f:
+            json.dump({"1": [{"bbox": [0, 0, 10, 10], "text": "精度"}]}, f, ensure_ascii=False)
+
+        responses = self._serve(
+            {"jsonrpc": "2.0", "id": 1, "method": "accuracy_review",
+             "params": {"ocr_csv": csv_path, "ground_truth_json": gt_path}},
+            {"jsonrpc": "2.0", "id": 2, "method": "accuracy_review",
+             "params": {"ocr_csv": csv_path + ".missing", "ground_truth_json": gt_path}},
+        )
+        self.assertIn("Overall Average CER: 0.0000", responses[0]["result"]["output"])
+        # Reviews neither need the engines nor print to the protocol stream.
+        self.assertEqual(self.factory.call_count, 0)
+        self.assertEqual(len(responses), 2)
+        self.assertIn("OCR結果CSVファイルが見つかりません", responses[1]["error"]["message"])
+        self.assertEqual(self.worker.health()["jobs_served"], 2)
+
+    def test_log_records_of_other_threads_are_not_captured(self):
+        logger = logging.getLogger("src.ocr_worker_test")
+
+        def job(output):
+            thread = threading.Thread(target=logger.warning, args=("other request",))
+            thread.start()
+            thread.join()
+            logger.warning("this request")
+            return {}
+
+        result = self.worker._run_job(job)
+        self.assertEqual(result["output"], "this request\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.pdf_overlay import PdfOverlayWriter, default_pdf_path
+
+
+class _Rect:
+    def __init__(self, x0, y0, x1, y1):
+        self.x0, self.y0, self.x1, self.y1 = x0, y0, x1, y1
+
+    def __mul__(self, scale):
+        return _Rect(self.x0 * scale, self.y0 * scale, self.x1 * scale, self.y1 * scale)
+
+    @property
+    def width(self):
+        return self.x1 - self.x0
+
+    @property
+    def height(self):
+        return self.y1 - self.y0
+
+    @property
+    def is_empty(self):
+        return self.width <= 0 or self.height <= 0
+
+
+def _row(page, text, confidence, box):
+    x0, y0, x1, y1 = box
+    return {'page': page, 'block_id': 0, 'x0': x0, 'y0': y0, 'x1': x1, 'y1': y1,
+            'text': text, 'confidence': confidence}
+
+
+class TestPdfOverlayWriter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.pdf_path = os.path.join(self.temp_dir, 'form.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.7 original')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch('src.pdf_overlay.fitz')
+    def test_pages_are_overlaid_and_saved_incrementally(self, mock_fitz):
+        mock_fitz.Rect.side_effect = _Rect
+        source, output = MagicMock(), MagicMock()
+        source.can_save_incrementally.return_value = True
+        output.is_closed = False
+        mock_fitz.open.side_effect = [source, output]
+        pages = [MagicMock(rotation=0) for _ in range(3)]
+        output.load_page.side_effect = lambda index: pages[index]
+        writers = [MagicMock() for _ in range(2)]
+        mock_fitz.TextWriter.side_effect = writers
+        output_path = default_pdf_path(self.pdf_path)
+
+        writer = PdfOverlayWriter(self.pdf_path, output_path, dpi=144, save_every=2)
+        writer.write_page([_row(0, '精度', 0.9, (100, 200, 300, 240)),
+                           _row(0, '検査', 0.3, (100, 300, 180, 340)),
+                           _row(0, '', 0.0, (0, 0, 10, 10))])
+        self.assertEqual(output.saveIncr.call_count, 0)
+        writer.write_page([])
+        self.assertEqual(output.saveIncr.call_count, 1)
+        writer.write_page([_row(2, '用紙', 0.8, (0, 0, 40, 20))])
+        # A text-layer page is already searchable: no overlay, no highlight.
+        writer.write_page([_row(1, '本文', 0.2, (0, 0, 40, 20))], overlay=False)
+        writer.close()
+
+        with open(output_path, 'rb') as f:
+            self.assertEqual(f.read(), b'%PDF-1.7 original')
+        self.assertEqual(output.saveIncr.call_count, 2)
+        self.assertEqual([call.args[0] for call in output.load_page.call_args_list], [0, 2])
+
+        appends = writers[0].append.call_args_list
+        self.assertEqual([call.args[1] for call in appends], ['精度', '検査'])
+        # 200x40 px at 144 dpi is a 100x20 pt box; two one-em glyphs fit at 20 pt.
+        self.assertEqual(appends[0].kwargs['fontsize'], 20.0)
+        self.assertEqual(appends[1].kwargs['fontsize'], 20.0)
+        writers[0].write_text.assert_called_once_with(pages[0], render_mode=3)
+
+        pages[0].add_highlight_annot.assert_called_once()
+        self.assertEqual(pages[0].add_highlight_annot.call_args.args[0].x0, 50.0)
+        pages[2].add_highlight_annot.assert_not_called()
+        self.assertEqual((writer.pages_written, writer.highlights), (4, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import pipeline_manager
+from src.pipeline_manager import DONE, FAILED, QUEUED, RUNNING, JobQueue, PipelineManager, parse_inbox
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _RecordingManager(PipelineManager):
+    """Writes a CSV next to each PDF instead of running OCR; PDFs named ``bad*`` always fail."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.processed = []
+
+    def process(self, job):
+        self.processed.append(job.name)
+        if job.name.startswith("bad"):
+            raise RuntimeError(f"cannot read {job.name}")
+        with open(os.path.splitext(job.path)[0] + "_ocr_results.csv", 'w', encoding='utf-8') as f:
+            f.write("page,block_id\n")
+        return 1
+
+
+class TestPipelineManager(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.temp_path = self.tempdir.name
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_queue_priorities_retries_and_recovery(self):
+        self.assertEqual(parse_inbox("scans"), ("scans", 0))
+        self.assertEqual(parse_inbox("urgent:10"), ("urgent", 10))
+        clock = _FakeClock()
+        queue = JobQueue(os.path.join(self.temp_path, "queue.sqlite3"), clock)
+        low = queue.enqueue("/work/a/low.pdf", priority=0, max_attempts=2)
+        high = queue.enqueue("/work/b/high.pdf", priority=5, max_attempts=2)
+        self.assertIsNone(queue.enqueue("/work/a/low.pdf"))
+
+        job = queue.claim()
+        self.assertEqual((job.id, job.attempts), (high, 1))
+        self.assertTrue(queue.fail(job.id, "boom", retry_delay=10))
+        # The retry waits for its backoff, so the lower priority job goes first.
+        self.assertEqual(queue.claim().id, low)
+        self.assertIsNone(queue.claim())
+        clock.now += 10
+        job = queue.claim()
+        self.assertEqual((job.id, job.attempts), (high, 2))
+        self.assertFalse(queue.fail(job.id, "boom again"))
+        self.assertEqual(queue.counts(), {QUEUED: 0, RUNNING: 1, DONE: 0, FAILED: 1})
+
+        self.assertEqual(queue.recover(), 1)
+        job = queue.claim()
+        queue.complete(job.id, "/done/low")
+        self.assertEqual([(row["name"], row["status"], row["output"]) for row in queue.jobs()],
+                         [("high.pdf", FAILED, None), ("low.pdf", DONE, "/done/low")])
+        queue.close()
+
+    def test_process_wide_memory_options_are_rejected(self):
+        with self.assertRaisesRegex(RuntimeError, "memory_budget_bytes"):
+            PipelineManager(self.temp_path, [], engines=[object()], ocr_options={"memory_budget_bytes": 2 ** 30})
+
+    def test_inbox_documents_end_in_done_or_failed_folders(self):
+        inbox = os.path.join(self.temp_path, "inbox")
+        urgent = os.path.join(self.temp_path, "urgent")
+        root = os.path.join(self.temp_path, "jobs")
+        for directory, names in ((inbox, ("a.pdf", "bad.pdf", "notes.txt")), (urgent, ("b.pdf",))):
+            os.makedirs(directory)
+            for name in names:
+                with open(os.path.join(directory, name), 'w') as f:
+                    f.write("%PDF-1.4\n")
+
+        manager = _RecordingManager(root, [(inbox, 0), (urgent, 10)], engines=[object()], documents=1,
+                                    max_attempts=2, retry_delay=0, poll_interval=0.01, settle_seconds=0)
+        manager.run(once=True)
+
+        self.assertEqual(manager.processed, ["b.pdf", "a.pdf", "bad.pdf", "bad.pdf"])
+        self.assertEqual(os.listdir(inbox), ["notes.txt"])
+        self.assertEqual(os.listdir(os.path.join(root, "work")), [])
+        self.assertEqual(sorted(os.listdir(os.path.join(root, "done"))), ["a", "b"])
+        self.assertEqual(sorted(os.listdir(os.path.join(root, "done", "a"))), ["a.pdf", "a_ocr_results.csv"])
+        failed = os.path.join(root, "failed", "bad")
+        self.assertEqual(sorted(os.listdir(failed)), ["bad.pdf", "error.txt"])
+        with open(os.path.join(failed, "error.txt"), encoding='utf-8') as f:
+            self.assertIn("cannot read bad.pdf", f.read())
+
+        queue = JobQueue(os.path.join(root, "queue.sqlite3"))
+        self.assertEqual(queue.counts(), {QUEUED: 0, RUNNING: 0, DONE: 2, FAILED: 1})
+        queue.close()
+
+    def test_a_job_that_cannot_be_filed_fails_without_stopping_the_others(self):
+        inbox = os.path.join(self.temp_path, "inbox")
+        root = os.path.join(self.temp_path, "jobs")
+        os.makedirs(inbox)
+        for name in ("a.pdf", "stuck.pdf", "b.pdf"):
+            with open(os.path.join(inbox, name), 'w') as f:
+                f.write("%PDF-1.4\n")
+        move = pipeline_manager.move_atomically
+
+        def failing_move(source, destination):
+            if os.path.basename(destination) == "stuck":
+                raise OSError("No space left on device")
+            move(source, destination)
+
+        # The metrics path is a directory, so every export fails as well.
+        manager = _RecordingManager(root, [(inbox, 0)], engines=[object()], documents=2, retry_delay=0,
+                                    poll_interval=0.01, settle_seconds=0, metrics_path=self.temp_path)
+        with mock.patch.object(pipeline_manager, "move_atomically", failing_move), \
+                self.assertLogs(pipeline_manager.logger, "WARNING"):
+            manager.run(once=True)
+
+        self.assertEqual(sorted(manager.processed), ["a.pdf", "b.pdf", "stuck.pdf"])
+        self.assertEqual(sorted(os.listdir(os.path.join(root, "done"))), ["a", "b"])
+        queue = JobQueue(os.path.join(root, "queue.sqlite3"))
+        self.assertEqual(queue.counts(), {QUEUED: 0, RUNNING: 0, DONE: 2, FAILED: 1})
+        self.assertIn("No space left on device", queue.jobs(FAILED)[0]["error"])
+        queue.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.engines import EngineConfig
+from src.ocr_poc import _PdfPageSource
+from src.result_cache import ResultCache, ensemble_cache_key, page_fingerprint
+
+
+class _FakeDocument:
+    def __init__(self, streams, pages, objects=None):
+        self.streams = streams
+        self.pages = pages
+        self.objects = objects or {}
+        self.raw_reads = 0
+        for page in pages:
+            page.parent = self
+
+    def xref_stream_raw(self, xref):
+        self.raw_reads += 1
+        return self.streams[xref]
+
+    def xref_get_key(self, xref, key):
+        value = self.objects[xref].get(key)
+        if value is None:
+            return ('null', 'null')
+        return ('xref', value) if value.endswith(' R') else ('name', value)
+
+    def load_page(self, index):
+        return self.pages[index]
+
+
+class _FakePage:
+    def __init__(self, contents, image_xrefs=(), rotation=0, annot_xrefs=()):
+        self.contents = contents
+        self.image_xrefs = image_xrefs
+        self.annot_xref_list = annot_xrefs
+        self.rect = (0.0, 0.0, 595.0, 842.0)
+        self.rotation = rotation
+        self.get_pixmap = MagicMock(side_effect=lambda **kwargs: ('pixmap', contents))
+
+    def read_contents(self):
+        return self.contents
+
+    def get_images(self, full=False):
+        return [(xref, 0, 100, 100, 8, 'DeviceRGB', '', f'Im{xref}', 'DCTDecode', 0)
+                for xref in self.image_xrefs]
+
+    def get_xobjects(self):
+        return []
+
+    def annot_xrefs(self):
+        return [(xref, 20, f'Stamp{xref}') for xref in self.annot_xref_list]
+
+
+def _row(page, text):
+    return {'page': page, 'block_id': 0, 'x0': 1.0, 'y0': 2.0, 'x1': 3.0, 'y1': 4.0,
+            'text': text, 'confidence': 0.9}
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tempdir.name, 'cache', 'results.sqlite3')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def test_get_renumbers_page_and_survives_reopen(self):
+        cache = ResultCache(self.cache_path)
+        cache.put('k', [_row(4, '精度')])
+        self.assertIsNone(cache.get('missing', 0))
+        cache.close()
+
+        reopened = ResultCache(self.cache_path)
+        self.assertEqual(reopened.get('k', 7), [_row(7, '精度')])
+        self.assertEqual((reopened.hits, reopened.misses), (1, 0))
+        reopened.close()
+
+    def test_least_recently_used_entries_are_evicted_over_size(self):
+        cache = ResultCache(self.cache_path, max_bytes=10 ** 6)
+        for key in ('a', 'b', 'c'):
+            cache.put(key, [_row(0, key * 50)])
+        entry_size = cache.size_bytes() // 3
+        cache.get('a', 0)  # 'b' is now the least recently used entry
+
+        cache.max_bytes = entry_size * 3
+        cache.put('d', [_row(0, 'd' * 50)])
+
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get('b', 0))
+        self.assertIsNotNone(cache.get('a', 0))
+        cache.close()
+
+    def test_fingerprint_depends_on_content_not_object_numbers(self):
+        doc = _FakeDocument(
+            {10: b'logo', 11: b'scan-v1', 20: b'logo', 21: b'scan-v2'},
+            [_FakePage(b'q 1 0 0 1 0 0 cm /Im Do Q', (10, 11)),
+             _FakePage(b'q 1 0 0 1 0 0 cm /Im Do Q', (10, 11)),
+             _FakePage(b'q 1 0 0 1 0 0 cm /Im Do Q', (20, 11)),
+             _FakePage(b'q 1 0 0 1 0 0 cm /Im Do Q', (10, 21)),
+             _FakePage(b'q 1 0 0 1 0 0 cm /Im Do Q', (10, 11), rotation=90)],
+        )
+        digests = {}
+        fingerprints = [page_fingerprint(page, digests) for page in doc.pages]
+
+        self.assertEqual(fingerprints[0], fingerprints[1])
+        self.assertEqual(fingerprints[0], fingerprints[2])
+        self.assertNotEqual(fingerprints[0], fingerprints[3])
+        self.assertNotEqual(fingerprints[0], fingerprints[4])
+        self.assertEqual(doc.raw_reads, 4)  # each image stream hashed once
+
+    def test_fingerprint_covers_annotation_appearances(self):
+        stamp = {'Subtype': '/Stamp', 'Rect': '[0 0 50 50]'}
+        doc = _FakeDocument(
+            {40: b'approved', 41: b'approved', 42: b'rejected'},
+            [_FakePage(b'BT (a) Tj ET'),
+             _FakePage(b'BT (a) Tj ET', annot_xrefs=(30,)),
+             _FakePage(b'BT (a) Tj ET', annot_xrefs=(31,)),
+             _FakePage(b'BT (a) Tj ET', annot_xrefs=(32,))],
+            objects={30: dict(stamp, **{'AP/N': '40 0 R'}),
+                     31: dict(stamp, **{'AP/N': '41 0 R'}),
+                     32: dict(stamp, **{'AP/N': '42 0 R'})},
+        )
+        fingerprints = [page_fingerprint(page) for page in doc.pages]
+
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+        self.assertEqual(fingerprints[1], fingerprints[2])
+        self.assertNotEqual(fingerprints[1], fingerprints[3])
+
+    def test_cached_pages_skip_render_and_ocr(self):
+        doc = _FakeDocument({}, [_FakePage(b'BT (a) Tj ET'), _FakePage(b'BT (a) Tj ET')])
+        cache = ResultCache(self.cache_path)
+        configs = [EngineConfig(name='paddleocr')]
+        ensemble = MagicMock(timeouts={})
+
+        with patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix), \
+                patch('src.ocr_poc.fitz'), \
+                patch('src.ocr_poc.ocr_page', side_effect=lambda n, image, e, **kwargs: [_row(n, 'a')]) as ocr_page:
+            source = _PdfPageSource(doc, 72, cache=cache, settings_key=ensemble_cache_key(configs, 72))
+            first = source.ocr(0, ensemble)
+            second = source.ocr(1, ensemble)
+
+        self.assertEqual(ocr_page.call_count, 1)
+        self.assertEqual(doc.pages[1].get_pixmap.call_count, 0)
+        self.assertEqual(second, [_row(1, 'a')])
+        self.assertEqual(first, [_row(0, 'a')])
+
+        other_key = ensemble_cache_key(configs, 144)
+        self.assertNotEqual(other_key, source.settings_key)
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
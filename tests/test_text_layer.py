@@ -0,0 +1,117 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.ocr_poc import ENGINE_POOL, default_csv_path, process_pdf
+from src.text_layer import ROUTE_MIXED, ROUTE_OCR, ROUTE_TEXT, classify_page
+
+_BODY = '本文は埋め込みテキストとして抽出されます'
+
+
+def _text_block(text, bbox):
+    return {'type': 0, 'lines': [{'bbox': bbox, 'spans': [{'text': text}]}]}
+
+
+class _Page:
+    rect = (0.0, 0.0, 600.0, 800.0)
+    rotation = 0
+
+    def __init__(self, index, blocks=(), images=()):
+        self.index = index
+        self.blocks = list(blocks)
+        self.images = list(images)
+
+    def get_text(self, option):
+        return {'blocks': self.blocks}
+
+    def get_image_info(self):
+        return [{'bbox': bbox} for bbox in self.images]
+
+    def get_pixmap(self, **kwargs):
+        return ('pixmap', self.index)
+
+
+class _Document:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __len__(self):
+        return len(self.pages)
+
+    def load_page(self, index):
+        return self.pages[index]
+
+    def close(self):
+        pass
+
+
+def _pages():
+    return [
+        _Page(0, [_text_block(_BODY, (50, 50, 400, 70))]),
+        _Page(1, images=[(0, 0, 600, 800)]),
+        _Page(2, [_text_block(_BODY, (50, 50, 400, 70))], images=[(50, 400, 550, 700)]),
+    ]
+
+
+def _scan_ocr(image, cls=True):
+    page_index = image[1]
+    return [[
+        [[[60, 100], [300, 100], [300, 120], [60, 120]], (f'p{page_index} header', 0.8)],
+        [[[60, 500], [300, 500], [300, 520], [60, 520]], (f'p{page_index} 手書き', 0.7)],
+    ]]
+
+
+class TestClassifyPage(unittest.TestCase):
+    def test_routes(self):
+        text, scan, mixed = (classify_page(page, page.index, dpi=144) for page in _pages())
+
+        self.assertEqual(text.route, ROUTE_TEXT)
+        self.assertEqual(text.lines[0]['bbox'][0], (100.0, 100.0))
+        self.assertEqual(scan.route, ROUTE_OCR)
+        self.assertEqual(mixed.route, ROUTE_MIXED)
+        self.assertEqual(mixed.ocr_regions, [(100.0, 800.0, 1100.0, 1400.0)])
+
+    def test_unreadable_text_layer_goes_to_ocr(self):
+        page = _Page(0, [_text_block('\ue000' * 30, (50, 50, 400, 70))])
+        self.assertEqual(classify_page(page, 0).route, ROUTE_OCR)
+
+
+class TestProcessPdfTextLayer(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.pdf_path = os.path.join(self.tempdir.name, 'mixed.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(b'%PDF-1.4 fake')
+        ENGINE_POOL.clear()
+
+    def tearDown(self):
+        ENGINE_POOL.clear()
+        self.tempdir.cleanup()
+
+    @patch('src.ocr_poc.pixmap_to_array', side_effect=lambda pix: pix)
+    @patch('src.ocr_poc.fitz')
+    @patch('src.ocr_poc.PaddleOCR')
+    def test_only_image_pages_and_regions_are_recognized(self, MockPaddleOCR, mock_fitz, _):
+        mock_fitz.open.side_effect = lambda path: _Document(_pages())
+        MockPaddleOCR.return_value.ocr.side_effect = _scan_ocr
+        report_path = os.path.join(self.tempdir.name, 'routes.csv')
+
+        process_pdf(self.pdf_path, route_report_path=report_path)
+
+        recognized = [call.args[0][1] for call in MockPaddleOCR.return_value.ocr.call_args_list]
+        self.assertEqual(sorted(set(recognized)), [1, 2])
+        with open(default_csv_path(self.pdf_path), encoding='utf-8') as f:
+            rows = [(r['page'], r['block_id'], r['text']) for r in csv.DictReader(f)]
+        self.assertEqual(rows, [
+            ('1', '0', _BODY),
+            ('2', '0', 'p1 header'), ('2', '1', 'p1 手書き'),
+            ('3', '0', _BODY), ('3', '1', 'p2 手書き'),
+        ])
+        with open(report_path, encoding='utf-8') as f:
+            self.assertEqual([r['route'] for r in csv.DictReader(f)], ['text', 'ocr', 'mixed'])
+
+
+if __name__ == '__main__':
+    unittest.main()
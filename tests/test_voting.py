@@ -0,0 +1,80 @@
+import random
+import unittest
+
+from src.voting import WeightedVotingAggregator, normalized_scores
+
+
+class _Engine:
+    def __init__(self, name, weight=1.0):
+        self.name = name
+        self.weight = weight
+
+
+def _line(y, text, confidence, x=10):
+    return {'bbox': ((x, y), (x + 200, y), (x + 200, y + 20), (x, y + 20)),
+            'text': text, 'confidence': confidence}
+
+
+class TestWeightedVotingAggregator(unittest.TestCase):
+    def test_lines_align_by_position_not_index(self):
+        a, b = _Engine('a'), _Engine('b', weight=2.0)
+        responses = [
+            (a, [_line(10, '上段A', 0.9), _line(50, '下段A', 0.5)]),
+            # Engine b lists the lines bottom-up and finds an extra one.
+            (b, [_line(52, '下段B', 0.6), _line(11, '上段B', 0.7), _line(400, '欄外', 0.8)]),
+        ]
+        voted = WeightedVotingAggregator().aggregate(responses)
+
+        self.assertEqual([line['text'] for line in voted], ['上段B', '下段B', '欄外'])
+        self.assertEqual(voted[0]['alternatives'], [{'text': '上段A', 'confidence': 0.9, 'engine': 'a'}])
+        self.assertEqual(voted[2]['alternatives'], [])
+
+    def test_weighted_normalized_scores_pick_winner(self):
+        self.assertEqual(normalized_scores([0.4, 0.4]), [0.5, 0.5])
+        self.assertEqual(normalized_scores([0.97]), [0.5])
+        low, high = normalized_scores([0.2, 0.8])
+        self.assertAlmostEqual(low + high, 1.0)
+        self.assertGreater(high, 0.7)
+
+        a, b = _Engine('a'), _Engine('b', weight=0.5)
+        voted = WeightedVotingAggregator().aggregate([
+            (a, [_line(10, 'x', 0.6)]),
+            (b, [_line(10, 'y', 0.9)]),
+        ])
+        self.assertEqual(voted[0]['text'], 'x')
+
+    def test_single_line_engine_votes_on_the_normalized_scale(self):
+        a, b = _Engine('a'), _Engine('b')
+        # b's lines score sigmoid(+1) and sigmoid(-1); a's only line scores
+        # 0.5 whatever its raw confidence, so it beats b's weaker line only.
+        b_lines = [_line(10, 'b-strong', 0.6), _line(50, 'b-weak', 0.5)]
+        for a_line, winner in ((_line(10, 'a', 0.99), 'b-strong'), (_line(50, 'a', 0.1), 'a')):
+            with self.subTest(winner=winner):
+                voted = WeightedVotingAggregator().aggregate([(a, [a_line]), (b, [dict(l) for l in b_lines])])
+                texts = [line['text'] for line in voted]
+                self.assertIn(winner, texts)
+                self.assertEqual(len(voted), 2)
+
+    def test_dense_page_clusters_every_line_once(self):
+        engines = [_Engine(name) for name in 'abc']
+        rng = random.Random(0)
+        responses = []
+        for engine in engines:
+            lines = [_line(25 * row + rng.uniform(-1, 1), f'{row}-{col}', 0.5 + rng.random() / 2, x=220 * col)
+                     for row in range(300) for col in range(10)]
+            rng.shuffle(lines)
+            responses.append((engine, lines))
+
+        voted = WeightedVotingAggregator().aggregate(responses)
+
+        self.assertEqual(len(voted), 3000)
+        self.assertTrue(all(len(line['alternatives']) == 2 for line in voted))
+        self.assertTrue(all(alt['text'] == line['text'] for line in voted for alt in line['alternatives']))
+
+    def test_empty_text_does_not_vote(self):
+        voted = WeightedVotingAggregator().aggregate([(_Engine('a'), [_line(10, '', 0.0)])])
+        self.assertEqual(voted, [])
+
+
+if __name__ == '__main__':
+    unittest.main()